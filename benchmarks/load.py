@@ -0,0 +1,362 @@
+"""load test of the HTTP API: runs internal.run:app in process against a
+freshly seeded database and drives every kitten and breed route.
+
+    python -m benchmarks.load --kittens 10000 --concurrency 10
+    python -m benchmarks.load --db-url postgresql+asyncpg://... \\
+        --output results.json --baseline benchmarks/baseline.json
+
+Each scenario sends --requests requests from --concurrency clients and
+reports throughput, p50/p95/p99 latency and DB statements per request.
+With --baseline the run fails (exit code 1) if a scenario issues more
+statements per request, or is slower than --tolerance allows. Latencies
+only compare on the same machine, statement counts compare anywhere.
+
+Needs the same environment (.env) as the app. The tables of --db-url are
+dropped and refilled, so point it at a scratch database; by default a
+temporary SQLite file is used.
+
+With --url the suite drives a running server over HTTP instead, e.g.
+`python -m internal.serve` with SERVER_WORKERS=4, after seeding the
+server's database (--db-url). Statement counts then come from the
+Server-Timing header, so start the server with QUERY_BUDGET_ENABLED=true
+to get them.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import AsyncExitStack
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from httpx import ASGITransport, AsyncClient, Limits, Response
+
+BULK_SIZE = 100
+
+_statements: ContextVar[list[int] | None] = ContextVar(
+    "_statements", default=None
+)
+_SERVER_STATEMENTS = re.compile(r'db;[^,]*desc="(\d+) statements"')
+
+
+@dataclass
+class State:
+    breeds: int
+    kittens: int
+    rnd: random.Random = field(default_factory=lambda: random.Random(42))
+    created: list[int] = field(default_factory=list)  # to be deleted
+    new_breeds: int = 0
+
+    def breed(self) -> str:
+        from .seed import breed_name
+
+        return breed_name(self.rnd.randrange(self.breeds))
+
+    def kitten_id(self) -> int:
+        return self.rnd.randint(1, self.kittens)
+
+    def take_created(self, n: int) -> list[int]:
+        """ids made by earlier create scenarios, [0] (a 404) if they
+        ran out because some creates failed"""
+        taken = [self.created.pop() for _ in range(min(n, len(self.created)))]
+        return taken or [0]
+
+
+Request = tuple[str, str, Any]  # method, url, json body
+
+
+@dataclass
+class Scenario:
+    name: str
+    request: Callable[[State], Request]
+    on_response: Callable[[State, Response], None] | None = None
+
+
+def _new_breed(state: State) -> Request:
+    state.new_breeds += 1
+    return "POST", "/breeds", {"breed_name": f"new breed {state.new_breeds}"}
+
+
+def _new_kittens(state: State) -> list[dict]:
+    return [
+        {"color": "white", "age": state.rnd.randrange(20),
+         "breed": state.breed()}
+        for _ in range(BULK_SIZE)
+    ]
+
+
+SCENARIOS = (
+    Scenario("breeds.list", lambda s: ("GET", "/breeds?limit=100", None)),
+    Scenario("kittens.list", lambda s: ("GET", "/kittens?limit=100", None)),
+    Scenario("kittens.list_by_breed", lambda s: (
+        "GET", f"/kittens?breed={s.breed()}&limit=100", None
+    )),
+    Scenario("kittens.list_filtered", lambda s: (
+        "GET",
+        f"/kittens?color=grey&age_min={s.rnd.randrange(10)}&age_max=15"
+        "&sort=-age&fields=id,color,age&limit=100",
+        None,
+    )),
+    Scenario("kittens.search", lambda s: (
+        "GET", f"/kittens?q=number {s.rnd.randrange(100)}&limit=50", None
+    )),
+    Scenario("kittens.stats", lambda s: ("GET", "/kittens/stats", None)),
+    Scenario("kittens.detail", lambda s: (
+        "GET", f"/kittens/{s.kitten_id()}", None
+    )),
+    Scenario("kittens.export", lambda s: (
+        "GET", f"/kittens/export?breed={s.breed()}", None
+    )),
+    Scenario(
+        "kittens.create",
+        lambda s: ("POST", "/kittens", {
+            "color": "black", "age": s.rnd.randrange(20), "breed": s.breed()
+        }),
+        lambda s, r: s.created.append(r.json()["instance_id"]),
+    ),
+    Scenario("kittens.update", lambda s: (
+        "PATCH", f"/kittens/{s.kitten_id()}", {"age": s.rnd.randrange(20)}
+    )),
+    Scenario("kittens.delete", lambda s: (
+        "DELETE", f"/kittens/{s.take_created(1)[0]}", None
+    )),
+    Scenario(
+        "kittens.bulk_create",
+        lambda s: ("POST", "/kittens/bulk", _new_kittens(s)),
+        lambda s, r: s.created.extend(r.json()["instance_ids"]),
+    ),
+    Scenario("kittens.bulk_update", lambda s: (
+        "PATCH", "/kittens/bulk",
+        [{"id": s.kitten_id(), "age": s.rnd.randrange(20)}
+         for _ in range(BULK_SIZE)],
+    )),
+    Scenario("kittens.bulk_delete", lambda s: (
+        "DELETE", "/kittens/bulk",
+        {"ids": s.take_created(BULK_SIZE)},
+    )),
+    Scenario("breeds.create", _new_breed),
+)
+
+
+def _count_statement(*args) -> None:
+    counter = _statements.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def _server_statements(response: Response | None) -> int | None:
+    """statement count of a remote server's Server-Timing header"""
+    if response is None:
+        return None
+    match = _SERVER_STATEMENTS.search(
+        response.headers.get("server-timing", "")
+    )
+    return int(match[1]) if match else None
+
+
+async def run_scenario(
+    client: AsyncClient,
+    scenario: Scenario,
+    state: State,
+    requests: int,
+    concurrency: int,
+    remote: bool,
+) -> dict:
+    latencies: list[float] = []
+    statements: list[int | None] = []
+    errors = 0
+    todo = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for _ in todo:  # shared by all workers
+            method, url, body = scenario.request(state)
+            counter = [0]
+            token = _statements.set(counter)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+            except Exception:
+                response = None
+            latencies.append(time.perf_counter() - started)
+            _statements.reset(token)
+            statements.append(
+                _server_statements(response) if remote else counter[0]
+            )
+            if (response is None or response.status_code >= 400
+                    or "bulk" in url and response.json()["errors"]):
+                errors += 1
+            if response is not None and response.is_success and (
+                scenario.on_response is not None
+            ):
+                scenario.on_response(state, response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput": round(requests / wall, 1),
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p95_ms": round(quantiles[94] * 1000, 2),
+        "p99_ms": round(quantiles[98] * 1000, 2),
+        "statements_per_request": (
+            None if None in statements
+            else round(statistics.fmean(statements), 2)
+        ),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """regressions of results against baseline, empty if there are none"""
+    setup = ("database", "breeds", "kittens", "requests", "concurrency",
+             "url")
+    differs = [
+        f"{key} {baseline['meta'].get(key)} -> {results['meta'].get(key)}"
+        for key in setup
+        if baseline["meta"].get(key) != results["meta"].get(key)
+    ]
+    if differs:
+        return [f"run is not comparable to the baseline: {', '.join(differs)}"]
+    regressions = []
+    for name, base in baseline["scenarios"].items():
+        current = results["scenarios"].get(name)
+        if current is None:
+            continue
+        checks = (
+            ("errors", current["errors"] > base["errors"]),
+            ("statements_per_request",
+             None not in (current["statements_per_request"],
+                          base["statements_per_request"])
+             and current["statements_per_request"]
+             > base["statements_per_request"]),
+            ("p95_ms", current["p95_ms"] > base["p95_ms"] * (1 + tolerance)),
+            ("throughput",
+             current["throughput"] < base["throughput"] * (1 - tolerance)),
+        )
+        regressions.extend(
+            f"{name}: {metric} {base[metric]} -> {current[metric]}"
+            for metric, failed in checks if failed
+        )
+    return regressions
+
+
+async def main(args: argparse.Namespace, db_url: str) -> dict:
+    # settings are read on import, so the app is imported after this
+    os.environ["DATABASE_URL"] = db_url
+    if db_url.startswith("sqlite"):
+        # sqlite has a single writer, concurrent write transactions only
+        # add lock waits and busy timeouts to the numbers
+        os.environ["DB_POOL_SIZE"] = "1"
+        os.environ["DB_MAX_OVERFLOW"] = "0"
+    from sqlalchemy import event
+
+    from internal.storage import get_db_client
+
+    from .seed import seed
+
+    db_client = get_db_client()
+    await seed(
+        engine=db_client.engine, breeds=args.breeds, kittens=args.kittens
+    )
+    event.listen(
+        db_client.engine.sync_engine, "before_cursor_execute",
+        _count_statement,
+    )
+    state = State(breeds=args.breeds, kittens=args.kittens)
+    results: dict = {
+        "meta": {
+            "database": db_client.engine.dialect.name,
+            "breeds": args.breeds,
+            "kittens": args.kittens,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "url": args.url,
+            "python": platform.python_version(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "scenarios": {},
+    }
+    print(f"{'scenario':<24} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'stmts':>6} {'errors':>6}")
+    stack = AsyncExitStack()
+    if args.url:
+        client = AsyncClient(
+            base_url=args.url,
+            limits=Limits(max_connections=args.concurrency),
+            timeout=60,
+        )
+    else:
+        from internal.run import app
+
+        # started and stopped like a server would
+        await stack.enter_async_context(app.router.lifespan_context(app))
+        client = AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://bench"
+        )
+    try:
+        async with stack, client:
+            for scenario in SCENARIOS:
+                res = await run_scenario(
+                    client=client,
+                    scenario=scenario,
+                    state=state,
+                    requests=args.requests,
+                    concurrency=args.concurrency,
+                    remote=args.url is not None,
+                )
+                results["scenarios"][scenario.name] = res
+                print(f"{scenario.name:<24} {res['throughput']:>8} "
+                      f"{res['p50_ms']:>8} {res['p95_ms']:>8} "
+                      f"{res['p99_ms']:>8} "
+                      f"{str(res['statements_per_request']):>6} "
+                      f"{res['errors']:>6}")
+    finally:
+        await db_client.dispose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--db-url", default=None)
+    parser.add_argument("--url", default=None,
+                        help="running server to test, e.g. "
+                             "http://127.0.0.1:8000")
+    parser.add_argument("--breeds", type=int, default=20)
+    parser.add_argument("--kittens", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--output", type=Path, default=Path("results.json"))
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed relative latency/throughput change")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = args.db_url or f"sqlite+aiosqlite:///{Path(tmp) / 'load.db'}"
+        results = asyncio.run(main(args=args, db_url=db_url))
+    args.output.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"results written to {args.output}")
+
+    if args.baseline is not None:
+        regressions = compare(
+            results=results,
+            baseline=json.loads(args.baseline.read_text()),
+            tolerance=args.tolerance,
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,147 @@
+"""event loop latency while the app logs bursts of errors, with records
+written on the loop thread (StreamHandler) and through the queue:
+
+  sync    StreamHandler with the JSON formatter, as LOG_QUEUE_SIZE=0
+  queue   DroppingQueueHandler + BatchingQueueListener, the default
+
+A 1 ms ticker measures how late the loop wakes it up while another task
+logs --burst records with a traceback every 10 ms, like handle_errors
+during an error storm. Each runs against a file and against a slow sink
+(a pipe whose reader lags, --sink-delay-us per write).
+
+    python -m benchmarks.logging_pipeline --seconds 3 --burst 200
+
+No database needed (but the same environment (.env) as the app).
+"""
+import argparse
+import asyncio
+import io
+import statistics
+import tempfile
+import time
+from logging import Handler, Logger, StreamHandler
+from queue import Queue
+
+from common.logger.setup import (
+    BatchingQueueListener,
+    DroppingQueueHandler,
+    json_log_formatter,
+)
+
+TICK = 0.001
+QUEUE_SIZE = 10_000
+
+
+class SlowStream(io.TextIOWrapper):
+    """a file that takes delay seconds per write"""
+
+    def __init__(self, buffer, delay: float):
+        super().__init__(buffer, encoding="utf-8")
+        self.delay = delay
+
+    def write(self, s: str) -> int:
+        time.sleep(self.delay)
+        return super().write(s)
+
+
+async def ticker(lags: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def error_storm(
+        logger: Logger, burst: int, seconds: float, calls: list[float],
+) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(burst):
+            try:
+                raise RuntimeError("db is gone")
+            except RuntimeError as e:
+                started = time.perf_counter()
+                logger.error(
+                    msg="something went wrong",
+                    exc_info=str(e),
+                    extra={"path": "/kittens/1"},
+                )
+                calls.append(time.perf_counter() - started)
+            await asyncio.sleep(0)  # the next request
+        await asyncio.sleep(0.01)
+
+
+async def measure(handler: Handler, burst: int, seconds: float) -> dict:
+    logger = Logger("benchmark")
+    logger.addHandler(handler)
+    lags: list[float] = []
+    calls: list[float] = []  # time the loop spent in logger.error
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(lags=lags, stop=stop))
+    await error_storm(
+        logger=logger, burst=burst, seconds=seconds, calls=calls
+    )
+    stop.set()
+    await tick
+    lags.sort()
+    return {
+        "logged": len(calls),
+        "call_us": statistics.fmean(calls) * 1e6,
+        "p50_ms": statistics.median(lags) * 1e3,
+        "p99_ms": lags[int(len(lags) * 0.99)] * 1e3,
+        "max_ms": lags[-1] * 1e3,
+    }
+
+
+async def run(
+        mode: str, slow: bool, burst: int, seconds: float, delay: float,
+) -> dict:
+    with tempfile.TemporaryFile() as file:
+        stream = SlowStream(file, delay=delay if slow else 0)
+        if mode == "sync":
+            handler = StreamHandler(stream)
+            handler.setFormatter(json_log_formatter)
+            result = await measure(handler, burst=burst, seconds=seconds)
+            result["dropped"] = 0
+        else:
+            queue = Queue(maxsize=QUEUE_SIZE)
+            handler = DroppingQueueHandler(queue=queue)
+            listener = BatchingQueueListener(
+                queue=queue, formatter=json_log_formatter, stream=stream
+            )
+            listener.start()
+            result = await measure(handler, burst=burst, seconds=seconds)
+            listener.stop()
+            result["dropped"] = handler.dropped
+        stream.flush()
+        stream.detach()
+    return result
+
+
+async def main(burst: int, seconds: float, delay: float) -> None:
+    print(f"{'handler':>8} {'sink':>5} {'logged':>8} {'dropped':>8} "
+          f"{'call us':>8} {'lag p50 ms':>11} {'p99 ms':>8} {'max ms':>8}")
+    for slow in (False, True):
+        for mode in ("sync", "queue"):
+            res = await run(
+                mode=mode, slow=slow, burst=burst, seconds=seconds,
+                delay=delay,
+            )
+            print(f"{mode:>8} {'slow' if slow else 'file':>5} "
+                  f"{res['logged']:>8} {res['dropped']:>8} "
+                  f"{res['call_us']:>8.1f} "
+                  f"{res['p50_ms']:>11.3f} {res['p99_ms']:>8.3f} "
+                  f"{res['max_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--sink-delay-us", type=float, default=1000.0)
+    args = parser.parse_args()
+    asyncio.run(main(
+        burst=args.burst,
+        seconds=args.seconds,
+        delay=args.sink_delay_us / 1e6,
+    ))
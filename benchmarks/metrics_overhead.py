@@ -0,0 +1,130 @@
+"""cost of the /metrics instrumentation, each part against the same code
+without it:
+
+  request   a FastAPI route called through MetricsMiddleware
+  query     a SELECT 1 on an engine with the cursor-execute timers
+  label     a repository method wrapped by metrics.labelled
+
+    python -m benchmarks.metrics_overhead --iterations 20000
+
+Runs in process on SQLite, no database needed (but the same environment
+(.env) as the app).
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+
+from internal.metrics import Histogram, MetricsMiddleware, labelled
+from internal.metrics.queries import instrument_engine
+
+Call = Callable[[], Awaitable]
+ROUNDS = 5
+
+
+async def per_call(plain: Call, instrumented: Call, iterations: int):
+    """microseconds per call of both, best of ROUNDS interleaved rounds
+    so that machine noise hits them alike"""
+    best = [float("inf"), float("inf")]
+    for _ in range(ROUNDS):
+        for i, call in enumerate((plain, instrumented)):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                await call()
+            elapsed = (time.perf_counter() - started) / iterations * 1e6
+            best[i] = min(best[i], elapsed)
+    return best[0], best[1]
+
+
+def asgi_call(app) -> Callable[[], Awaitable]:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/ping/1",
+        "raw_path": b"/ping/1", "root_path": "", "query_string": b"",
+        "headers": [], "client": ("127.0.0.1", 1), "server": ("b", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    return lambda: app(dict(scope), receive, send)
+
+
+async def request_overhead(iterations: int) -> tuple[float, float]:
+    def make_app(instrumented: bool) -> FastAPI:
+        app = FastAPI()
+
+        @app.get("/ping/{id}")
+        async def ping(id: int) -> dict:
+            return {"id": id}
+
+        if instrumented:
+            app.add_middleware(MetricsMiddleware)
+        return app
+
+    return await per_call(
+        plain=asgi_call(make_app(False)),
+        instrumented=asgi_call(make_app(True)),
+        iterations=iterations,
+    )
+
+
+async def query_overhead(iterations: int) -> tuple[float, float]:
+    """on sync engines: the listeners are the same, and without
+    aiosqlite's thread hop the few microseconds aren't lost in noise"""
+    plain = create_engine("sqlite://")
+    instrumented = create_engine("sqlite://")
+    instrument_engine(
+        engine=instrumented,
+        histogram=Histogram("q", "q", labels=("repo_method",)),
+    )
+    statement = text("SELECT 1")
+    with plain.connect() as conn, instrumented.connect() as i_conn:
+        async def run_plain():
+            conn.execute(statement)
+
+        async def run_instrumented():
+            i_conn.execute(statement)
+
+        return await per_call(
+            plain=run_plain,
+            instrumented=run_instrumented,
+            iterations=iterations,
+        )
+
+
+async def label_overhead(iterations: int) -> tuple[float, float]:
+    async def method() -> None:
+        pass
+
+    return await per_call(
+        plain=method,
+        instrumented=labelled("Repo.method")(method),
+        iterations=iterations,
+    )
+
+
+async def main(iterations: int) -> None:
+    print(f"{'part':>8} {'plain us':>9} {'metrics us':>11} "
+          f"{'overhead us':>12}")
+    for name, measure in (
+        ("request", request_overhead),
+        ("query", query_overhead),
+        ("label", label_overhead),
+    ):
+        plain, instrumented = await measure(iterations)
+        print(f"{name:>8} {plain:>9.2f} {instrumented:>11.2f} "
+              f"{instrumented - plain:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+    asyncio.run(main(iterations=args.iterations))
@@ -0,0 +1,107 @@
+"""compares the two ways of reading the kitten list:
+ORM objects with joinedload(Kitten.breed) against plain rows of
+KittenRepo.find_kittens, both mapped into ReturnKittenS.
+
+    python -m benchmarks.read_path --rows 10000 100000 1000000
+    python -m benchmarks.read_path --db-url postgresql+asyncpg://...
+
+Needs the same environment (.env) as the app. The kitten and breed
+tables of --db-url are dropped and refilled, so point it at a scratch
+database; by default a temporary SQLite file is used.
+"""
+import argparse
+import asyncio
+import gc
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from internal.orm_models import Kitten
+from internal.repositories import KittenRepo
+from internal.schemas import ReturnKittenS
+from internal.services import KittenService
+from internal.storage import UnitOfWork
+from internal.storage.app import PostgresClient
+
+from .seed import seed
+
+BREEDS = 20
+
+
+async def orm_path(client: PostgresClient) -> list[ReturnKittenS]:
+    stmt = select(Kitten).options(joinedload(Kitten.breed)).order_by(
+        Kitten.id
+    )
+    async with client.session as session:
+        kittens = (await session.scalars(stmt)).all()
+        return [
+            ReturnKittenS(
+                id=kitten.id,
+                color=kitten.color,
+                age=kitten.age,
+                description=kitten.description,
+                breed=getattr(kitten.breed, "name", None) or "",
+            )
+            for kitten in kittens
+        ]
+
+
+async def row_path(client: PostgresClient) -> list[ReturnKittenS]:
+    uow = UnitOfWork(client=client)
+    try:
+        rows = await KittenRepo(uow=uow).find_kittens()
+        return [KittenService._row_to_return_dto(row=row) for row in rows]
+    finally:
+        await uow.close()
+
+
+async def measure(
+    read: Callable[[PostgresClient], Awaitable[list]],
+    client: PostgresClient,
+) -> tuple[float, float]:
+    """returns (seconds, peak MiB), timed without tracemalloc running"""
+    gc.collect()
+    started = time.perf_counter()
+    await read(client)
+    seconds = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    await read(client)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 2**20
+
+
+async def main(db_url: str, sizes: list[int]) -> None:
+    client = PostgresClient(db_url=db_url, echo=False)
+    print(f"{'rows':>9} {'path':>5} {'seconds':>9} {'rows/s':>10} "
+          f"{'peak MiB':>9}")
+    try:
+        for rows in sizes:
+            await seed(engine=client.engine, breeds=BREEDS, kittens=rows)
+            for name, read in (("orm", orm_path), ("row", row_path)):
+                seconds, peak = await measure(read=read, client=client)
+                print(f"{rows:>9} {name:>5} {seconds:>9.3f} "
+                      f"{rows / seconds:>10.0f} {peak:>9.1f}")
+    finally:
+        await client.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--db-url", default=None)
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = args.db_url or (
+            f"sqlite+aiosqlite:///{Path(tmp) / 'read_path.db'}"
+        )
+        asyncio.run(main(db_url=db_url, sizes=args.rows))
@@ -0,0 +1,33 @@
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from internal.orm_models import Base, Breed, Kitten
+
+INSERT_BATCH = 10_000
+COLORS = ("white", "black", "grey", "ginger")
+
+
+def breed_name(i: int) -> str:
+    return f"breed {i}"
+
+
+async def seed(engine: AsyncEngine, breeds: int, kittens: int) -> None:
+    """recreates the tables with `breeds` breeds and `kittens` kittens,
+    every breeds + 1-th kitten has no breed"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        if breeds:
+            await conn.execute(
+                insert(Breed), [{"name": breed_name(i)} for i in range(breeds)]
+            )
+        for start in range(0, kittens, INSERT_BATCH):
+            await conn.execute(insert(Kitten), [
+                {
+                    "color": COLORS[i % len(COLORS)],
+                    "age": i % 20,
+                    "description": f"kitten number {i}",
+                    "breed_id": i % (breeds + 1) or None,
+                }
+                for i in range(start, min(start + INSERT_BATCH, kittens))
+            ])
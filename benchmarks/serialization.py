@@ -0,0 +1,89 @@
+"""compares ways of turning a kitten list into a response body:
+
+  model     response_model=list[ReturnKittenS] with the stdlib JSONResponse,
+            the way list handlers used to answer
+  orjson    the same, with ORJSONResponse as the response class
+  dumps     rows dumped straight to bytes, what the list handlers do now
+
+    python -m benchmarks.serialization --items 10000 --requests 200
+
+Runs in process through an ASGI transport, no database needed (but the
+same environment (.env) as the app).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi import FastAPI, Response
+from fastapi.responses import ORJSONResponse
+from httpx import ASGITransport, AsyncClient
+
+from internal.schemas import ReturnKittenS
+from internal.services.serialization import FAST_JSON, dumps
+
+
+def make_rows(items: int) -> list[dict]:
+    return [
+        {
+            "id": i,
+            "color": ("белый", "чёрный", "серый")[i % 3],
+            "age": i % 20,
+            "description": f"kitten number {i}",
+            "breed": "",
+        }
+        for i in range(items)
+    ]
+
+
+def make_app(rows: list[dict]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/model", response_model=list[ReturnKittenS])
+    async def model():
+        return [ReturnKittenS(**row) for row in rows]
+
+    @app.get(
+        "/orjson",
+        response_model=list[ReturnKittenS],
+        response_class=ORJSONResponse,
+    )
+    async def orjson():
+        return [ReturnKittenS(**row) for row in rows]
+
+    @app.get("/dumps")
+    async def dumped():
+        return Response(content=dumps(rows), media_type="application/json")
+
+    return app
+
+
+async def main(items: int, requests: int) -> None:
+    rows = make_rows(items=items)
+    transport = ASGITransport(app=make_app(rows=rows))
+    print(f"{items} items per response, fast json: {FAST_JSON}")
+    print(f"{'path':>7} {'req/s':>8} {'items/s':>11} {'p50 ms':>8} "
+          f"{'p99 ms':>8} {'KiB':>7}")
+    async with AsyncClient(transport=transport, base_url="http://b") as c:
+        for path in ("model", "orjson", "dumps"):
+            await c.get(f"/{path}")  # warm up
+            latencies = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                response = await c.get(f"/{path}")
+                latencies.append(time.perf_counter() - started)
+            assert response.json()[-1]["id"] == items - 1
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)]
+            per_second = requests / sum(latencies)
+            print(f"{path:>7} {per_second:>8.1f} {per_second * items:>11.0f} "
+                  f"{statistics.median(latencies) * 1000:>8.2f} "
+                  f"{p99 * 1000:>8.2f} {len(response.content) / 1024:>7.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(items=args.items, requests=args.requests))
@@ -0,0 +1,104 @@
+"""how quickly a worker is ready, which is what restarts and autoscaling
+wait for:
+
+  import   seconds to import internal.run in a fresh interpreter
+  first    seconds from starting python -m internal.serve to the first
+           answered request that reached the database
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --db-url postgresql+asyncpg://...
+
+Creates the tables with internal.migrate first, by default in a temporary
+SQLite file. Needs the same environment (.env) as the app.
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).parents[1]
+IMPORT = (
+    "import time; started = time.perf_counter(); import internal.run; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_time(env: dict) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return float(out.split()[-1])
+
+
+def first_request_time(env: dict, timeout: float = 60) -> float:
+    port = _free_port()
+    env = {**env, "SERVER_PORT": str(port), "SERVER_HOST": "127.0.0.1"}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "internal.serve"],
+        cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                # any answer will do, a 404 has looked the kitten up
+                httpx.get(f"http://127.0.0.1:{port}/kittens/1", timeout=5)
+                return time.perf_counter() - started
+            except httpx.TransportError:
+                if server.poll() is not None:
+                    raise RuntimeError("the server exited") from None
+                time.sleep(0.005)
+        raise TimeoutError(f"no answer within {timeout} s")
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main(runs: int, db_url: str) -> None:
+    env = {
+        **os.environ,
+        "DATABASE_URL": db_url,
+        "SERVER_WORKERS": "1",
+        "LOG_LEVEL": "WARNING",
+    }
+    subprocess.run(
+        [sys.executable, "-m", "internal.migrate"],
+        cwd=ROOT, env=env, check=True, capture_output=True,
+    )
+    print(f"{'':>8} {'median s':>9} {'min s':>7} {'max s':>7}")
+    for name, measure in (
+        ("import", import_time), ("first", first_request_time),
+    ):
+        times = [measure(env) for _ in range(runs)]
+        print(f"{name:>8} {statistics.median(times):>9.3f} "
+              f"{min(times):>7.3f} {max(times):>7.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--db-url", default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        main(
+            runs=args.runs,
+            db_url=args.db_url
+            or f"sqlite+aiosqlite:///{Path(tmp) / 'startup.db'}",
+        )
@@ -1,21 +1,95 @@
-from dotenv import load_dotenv
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing_extensions import Literal
 
-load_dotenv()
-
 
 class Settings(BaseSettings):
     LOG_LEVEL: Literal["DEBUG", "WARNING", "INFO", "ERROR"] = "DEBUG"
+    # records a background thread formats and writes; more are dropped,
+    # 0 writes them on the calling thread instead
+    LOG_QUEUE_SIZE: int = 10_000
+    LOG_BATCH_SIZE: int = 512  # records per write
 
     DB_USER: str
     DB_PASSWORD: str
     DB_SERVER: str
     DB_PORT: int
     DB_NAME: str
+    # full sqlalchemy url, takes precedence over the DB_* parts above
+    DATABASE_URL: str | None = None
+
+    DB_POOL_SIZE: int = 5  # per worker process
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds, -1 to keep connections forever
+    DB_POOL_PRE_PING: bool = True
+    DB_NULL_POOL: bool = False  # let pgbouncer do the pooling
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg, 0 behind pgbouncer
+    DB_COMMAND_TIMEOUT: float | None = 60.0  # seconds
+
+    # read-only queries go to these, e.g. '["postgresql+asyncpg://..."]'
+    DB_REPLICA_URLS: list[str] = []
+    DB_REPLICA_RETRY_AFTER: float = 5.0  # seconds a failed replica is skipped
+
+    BREED_CACHE_TTL: float = 60.0  # seconds
+    BREED_CACHE_MAX_SIZE: int = 1024
+
+    # memory is per worker process, writes clear only their worker's:
+    # python -m internal.serve refuses it with SERVER_WORKERS other than 1
+    CACHE_BACKEND: Literal["memory", "redis", "none"] = "memory"
+    CACHE_TTL: float = 30.0  # seconds
+    CACHE_MAX_ENTRIES: int = 10_000
+    REDIS_URL: str = "redis://localhost:6379/0"
+
+    # seconds before GET /kittens/stats recounts from the database, which
+    # picks up the writes of other workers
+    STATS_RECONCILE_INTERVAL: float = 60.0
+
+    # GET /kittens/changes: changes kept to replay to clients that resume,
+    # and how far a subscriber may fall behind before its stream is closed
+    CHANGE_FEED_BUFFER: int = 10_000
+    CHANGE_FEED_QUEUE: int = 1_000
+    CHANGE_FEED_KEEP_ALIVE: float = 15.0  # seconds between SSE comments
+    CHANGE_FEED_MAX_WAIT: float = 30.0  # seconds a long-poll may wait
+    # postgres LISTEN/NOTIFY between workers, off: this worker's only
+    CHANGE_FEED_FANOUT: bool = True
+
+    # side effects of writes, run after the commit by a background task
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL: float = 5.0  # seconds, for other workers' events
+    OUTBOX_LEASE: float = 60.0  # seconds before a claimed event runs again
+    OUTBOX_BACKOFF: float = 1.0  # seconds before the first retry, doubling
+    OUTBOX_MAX_BACKOFF: float = 300.0
+    OUTBOX_MAX_ATTEMPTS: int = 10  # then it stays in the table, see the log
+
+    FAST_JSON: bool = True  # orjson for responses, stdlib json if off
+
+    METRICS_ENABLED: bool = True  # request and query timings for /metrics
+
+    # per request statement counts, DB time and a Server-Timing header;
+    # requests over a limit are logged with their statements
+    QUERY_BUDGET_ENABLED: bool = False
+    QUERY_BUDGET_STATEMENTS: int = 10
+    QUERY_BUDGET_SECONDS: float = 0.5
+    QUERY_BUDGET_REPEATS: int = 5  # the same statement this often is N+1
+
+    # python -m internal.serve
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 1  # processes, 0 for one per CPU core
+    # auto picks uvloop and httptools if they are installed
+    SERVER_LOOP: Literal["auto", "asyncio", "uvloop"] = "auto"
+    SERVER_HTTP: Literal["auto", "h11", "httptools"] = "auto"
+    SERVER_BACKLOG: int = 2048  # connections waiting to be accepted
+    SERVER_KEEP_ALIVE: int = 5  # seconds an idle connection stays open
+    SERVER_LIMIT_CONCURRENCY: int | None = None  # per worker, 503 beyond
+    SERVER_GRACEFUL_TIMEOUT: int = 30  # seconds to finish requests on stop
+    SERVER_ACCESS_LOG: bool = False  # http_requests_total counts them
+    DB_WARM_UP: bool = True  # open the pool before taking requests
 
     @property
     def DB_URL(cls) -> str:  # noqa
+        if cls.DATABASE_URL:
+            return cls.DATABASE_URL
         return f"postgresql+asyncpg://{cls.DB_USER}:{cls.DB_PASSWORD}@{cls.DB_SERVER}:{cls.DB_PORT}/{cls.DB_NAME}"
 
     model_config = SettingsConfigDict(env_file=".env")
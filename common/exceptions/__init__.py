@@ -5,9 +5,23 @@ __all__ = (
     "ModelConversionError",
     "EntityNotFoundError",
     "BadRequestError",
-    "AlreadyExistsError"
+    "AlreadyExistsError",
+    "GoneError",
+    "PreconditionFailedError",
+    "VersionMismatchError",
 )
 
 from .different_exc import ModelConversionError
-from .http_exc import AlreadyExistsError, BadRequestError, EntityNotFoundError
-from .storage_exc import DBError, FailedToConnectError, NotFoundError
+from .http_exc import (
+    AlreadyExistsError,
+    BadRequestError,
+    EntityNotFoundError,
+    GoneError,
+    PreconditionFailedError,
+)
+from .storage_exc import (
+    DBError,
+    FailedToConnectError,
+    NotFoundError,
+    VersionMismatchError,
+)
@@ -21,3 +21,24 @@ class AlreadyExistsError(HTTPException):
         self._detail = detail
         super().__init__(detail=detail, status_code=status.HTTP_409_CONFLICT)
 
+
+class GoneError(HTTPException):
+    def __init__(self, detail: str):
+        self._detail = detail
+        super().__init__(detail=detail, status_code=status.HTTP_410_GONE)
+
+    def __str__(self):
+        return self._detail
+
+
+class PreconditionFailedError(HTTPException):
+    def __init__(self, detail: str, etag: str | None = None):
+        self._detail = detail
+        super().__init__(
+            detail=detail,
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            headers={"ETag": etag} if etag else None,
+        )
+
+    def __str__(self):
+        return self._detail
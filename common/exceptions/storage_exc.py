@@ -22,3 +22,12 @@ class NotFoundError(Exception):
         return f"{self._entity} wasn't found"
 
 
+
+
+class VersionMismatchError(Exception):
+    def __init__(self, entity: str, version: int):
+        self._entity = entity
+        self.version = version  # the current one
+
+    def __str__(self) -> str:
+        return f"{self._entity} was changed meanwhile"
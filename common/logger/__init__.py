@@ -1,2 +1,2 @@
-__all__ = ("logger",)
-from .setup import logger
+__all__ = ("logger", "log_handler")
+from .setup import log_handler, logger
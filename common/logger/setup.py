@@ -1,30 +1,154 @@
-from logging import StreamHandler, getLogger
-from datetime import datetime
+import atexit
+import copy
+import json
+import sys
+import time
+from logging import Formatter, LogRecord, StreamHandler, getLogger
+from logging.handlers import QueueHandler, QueueListener
+from queue import Empty, Full, Queue
+from typing import TextIO
 
 from pythonjsonlogger import jsonlogger
 
 from common.config import settings
 
-__all__ = ("logger",)
+__all__ = (
+    "logger",
+    "log_handler",
+    "DroppingQueueHandler",
+    "BatchingQueueListener",
+)
 
 logger = getLogger(__name__)
 logger.setLevel(settings.LOG_LEVEL)
 
 
 class CustomJsonFormatter(jsonlogger.JsonFormatter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._second: tuple[int, str] = (-1, "")  # last second, formatted
+
+    def _timestamp(self, created: float) -> str:
+        """the record's creation time, strftime once per second"""
+        second, prefix = self._second
+        if int(created) != second:
+            second = int(created)
+            prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._second = (second, prefix)
+        return f"{prefix}.{int((created - second) * 1e6):06d}Z"
+
     def add_fields(self, log_record, record, message_dict):
-        super(CustomJsonFormatter, self).add_fields(log_record, record, message_dict)
+        super(CustomJsonFormatter, self).add_fields(
+            log_record, record, message_dict
+        )
         if not log_record.get('timestamp'):
-            now = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-            log_record['timestamp'] = now
+            log_record['timestamp'] = self._timestamp(record.created)
         if log_record.get('level'):
             log_record['level'] = log_record['level'].upper()
         else:
             log_record['level'] = record.levelname
 
 
+class DroppingQueueHandler(QueueHandler):
+    """puts records on a bounded queue without blocking, drops and counts
+    them when it's full"""
+
+    def __init__(self, queue: Queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        # the message and traceback are formatted by the listener thread,
+        # only the args are merged now, they may change once we return
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+
+class BatchingQueueListener(QueueListener):
+    """formats the queued records on its own thread and writes all that
+    are waiting at once, one write and flush per batch"""
+
+    def __init__(
+        self,
+        queue: Queue,
+        formatter: Formatter,
+        stream: TextIO | None = None,
+        batch_size: int = 512,
+    ):
+        super().__init__(queue)
+        self.formatter = formatter
+        self.stream = stream
+        self.batch_size = batch_size
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)  # waits for room, unlike records
+
+    def _next_batch(self) -> list:
+        batch = [self.queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def _write(self, records: list[LogRecord]) -> None:
+        lines = []
+        for record in records:
+            # hand the GIL back after every record, otherwise a big batch
+            # keeps the event loop waiting for the 5 ms switch interval
+            time.sleep(0)
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception:
+                lines.append(json.dumps({
+                    "level": record.levelname,
+                    "message": f"unformattable record: {record.msg!r:.200}",
+                }))
+        stream = self.stream or sys.stderr  # like StreamHandler
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        except Exception:  # a broken stream shouldn't stop the thread
+            pass
+
+    def _monitor(self) -> None:
+        while True:
+            batch = self._next_batch()
+            records = [r for r in batch if r is not self._sentinel]
+            if records:
+                self._write(records)
+            for _ in batch:
+                self.queue.task_done()
+            if len(records) < len(batch):
+                return
+
+
+json_log_formatter = CustomJsonFormatter(
+    '%(timestamp)s %(level)s %(pathname)s: %(message)s'
+)
+
 # setup logger
-log_handler = StreamHandler()
-json_log_formatter = CustomJsonFormatter('%(timestamp)s %(level)s %(pathname)s: %(message)s')
-log_handler.setFormatter(fmt=json_log_formatter)
+if settings.LOG_QUEUE_SIZE > 0:
+    # formatting and writing happen off the event loop thread
+    log_queue: Queue = Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    log_handler = DroppingQueueHandler(queue=log_queue)
+    log_listener = BatchingQueueListener(
+        queue=log_queue,
+        formatter=json_log_formatter,
+        batch_size=settings.LOG_BATCH_SIZE,
+    )
+    log_listener.start()
+    atexit.register(log_listener.stop)  # writes what's still queued
+else:
+    log_handler = StreamHandler()
+    log_handler.setFormatter(fmt=json_log_formatter)
 logger.addHandler(hdlr=log_handler)
@@ -0,0 +1,14 @@
+__all__ = (
+    "CachedResponse",
+    "CacheBackend",
+    "InMemoryBackend",
+    "NullBackend",
+    "RedisBackend",
+    "ResponseCache",
+    "response_cache",
+    "get_response_cache",
+)
+
+from .app import get_response_cache, response_cache
+from .backends import CacheBackend, InMemoryBackend, NullBackend, RedisBackend
+from .response_cache import CachedResponse, ResponseCache
@@ -0,0 +1,25 @@
+from common.config import settings
+
+from .backends import CacheBackend, InMemoryBackend, NullBackend, RedisBackend
+from .response_cache import ResponseCache
+
+
+def _make_backend() -> CacheBackend:
+    if settings.CACHE_BACKEND == "redis":
+        try:
+            from redis import asyncio as redis  # optional dependency
+        except ImportError as e:
+            raise RuntimeError(
+                "CACHE_BACKEND=redis requires the redis package"
+            ) from e
+        return RedisBackend(client=redis.from_url(settings.REDIS_URL))
+    if settings.CACHE_BACKEND == "memory":
+        return InMemoryBackend(max_size=settings.CACHE_MAX_ENTRIES)
+    return NullBackend()
+
+
+response_cache = ResponseCache(backend=_make_backend(), ttl=settings.CACHE_TTL)
+
+
+def get_response_cache() -> ResponseCache:
+    return response_cache
@@ -0,0 +1,113 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Protocol
+
+__all__ = (
+    "CacheBackend",
+    "InMemoryBackend",
+    "NullBackend",
+    "RedisBackend",
+)
+
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    async def set(self, key: str, value: bytes, ttl: float | None) -> None:
+        ...
+
+    async def delete(self, *keys: str) -> None:
+        ...
+
+    async def incr(self, key: str) -> int:
+        ...
+
+
+class InMemoryBackend:
+    """process-local LRU with per-entry ttl. Counters are kept apart and
+    never evicted: a namespace version that fell out would start over
+    and match pages cached under an older one again"""
+
+    def __init__(
+        self,
+        max_size: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._max_size = max_size
+        self._clock = clock
+        # key -> (value, expires_at), least recently used first
+        self._entries: OrderedDict[str, tuple[bytes, float | None]] = \
+            OrderedDict()
+        self._counters: dict[str, int] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        if key in self._counters:
+            return str(self._counters[key]).encode()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float | None) -> None:
+        expires_at = None if ttl is None else self._clock() + ttl
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+            self._counters.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        value = self._counters.get(key, 0) + 1
+        self._counters[key] = value
+        return value
+
+
+class NullBackend:
+    """stores nothing, used when caching is switched off"""
+
+    async def get(self, key: str) -> bytes | None:
+        return None
+
+    async def set(self, key: str, value: bytes, ttl: float | None) -> None:
+        return None
+
+    async def delete(self, *keys: str) -> None:
+        return None
+
+    async def incr(self, key: str) -> int:
+        return 0
+
+
+class RedisBackend:
+    """works with redis.asyncio.Redis or anything with the same api"""
+
+    def __init__(self, client: Any, prefix: str = "cats:"):
+        self._client = client
+        self._prefix = prefix
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._client.get(self._prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float | None) -> None:
+        await self._client.set(
+            self._prefix + key,
+            value,
+            px=None if ttl is None else int(ttl * 1000),
+        )
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._client.delete(*(self._prefix + key for key in keys))
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(self._prefix + key)
@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeAlias
+
+from .backends import CacheBackend
+
+__all__ = ("CachedResponse", "ResponseCache")
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResponse:
+    body: bytes
+    etag: str  # strong validator, quoted
+    last_modified: int  # unix time when the body was rendered
+
+    @classmethod
+    def from_body(
+        cls, body: bytes, etag: str | None = None
+    ) -> "CachedResponse":
+        """etag defaults to a digest of the body"""
+        if etag is None:
+            digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+            etag = f'"{digest}"'
+        return cls(body=body, etag=etag, last_modified=int(time.time()))
+
+    def encode(self) -> bytes:
+        return f"{self.etag} {self.last_modified}\n".encode() + self.body
+
+    @classmethod
+    def decode(cls, raw: bytes) -> "CachedResponse":
+        header, _, body = raw.partition(b"\n")
+        etag, last_modified = header.decode().split(" ")
+        return cls(body=body, etag=etag, last_modified=int(last_modified))
+
+
+Loader: TypeAlias = Callable[[], Awaitable[bytes | CachedResponse]]
+
+
+class ResponseCache:
+    """read-through cache of serialized responses and their validators.
+
+    Concurrent misses on the same key share one load. List entries are
+    keyed by a namespace version, so a write invalidates every page of
+    a namespace with a single incr. A loader returns the body, or a
+    CachedResponse if it has a validator of its own.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self._backend = backend
+        self._ttl = ttl
+        self._inflight: dict[str, asyncio.Task[CachedResponse]] = {}
+        self._stale: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_load(
+        self, key: str, loader: Loader
+    ) -> CachedResponse:
+        value = await self._backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return CachedResponse.decode(raw=value)
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            # the load runs in its own task, so a caller that goes away
+            # doesn't cancel it for the others waiting on the same key
+            task = asyncio.ensure_future(self._load(key=key, loader=loader))
+            self._inflight[key] = task
+            task.add_done_callback(
+                lambda done: self._on_loaded(key=key, task=done)
+            )
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _load(
+        self, key: str, loader: Loader
+    ) -> CachedResponse:
+        loaded = await loader()
+        response = (
+            loaded if isinstance(loaded, CachedResponse)
+            else CachedResponse.from_body(body=loaded)
+        )
+        # key was invalidated while loading, the value may be outdated
+        if key in self._stale:
+            self._stale.discard(key)
+        else:
+            await self._backend.set(key, response.encode(), ttl=self._ttl)
+        return response
+
+    def _on_loaded(
+        self, key: str, task: asyncio.Task[CachedResponse]
+    ) -> None:
+        del self._inflight[key]
+        self._stale.discard(key)
+        if not task.cancelled():
+            task.exception()  # mark as retrieved if nobody awaited it
+
+    async def version(self, namespace: str) -> int:
+        return int(await self._backend.get(f"{namespace}:version") or 0)
+
+    async def bump(self, namespace: str) -> None:
+        await self._backend.incr(f"{namespace}:version")
+
+    async def invalidate(self, *keys: str) -> None:
+        self._stale.update(key for key in keys if key in self._inflight)
+        await self._backend.delete(*keys)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,13 @@
+__all__ = (
+    "Change",
+    "ChangeBus",
+    "ChangeType",
+    "PostgresRelay",
+    "Subscription",
+    "change_bus",
+    "get_change_bus",
+)
+
+from .app import change_bus, get_change_bus
+from .bus import Change, ChangeBus, ChangeType, Subscription
+from .relay import PostgresRelay
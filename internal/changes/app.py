@@ -0,0 +1,12 @@
+from common.config import settings
+
+from .bus import ChangeBus
+
+change_bus = ChangeBus(
+    buffer_size=settings.CHANGE_FEED_BUFFER,
+    queue_size=settings.CHANGE_FEED_QUEUE,
+)
+
+
+def get_change_bus() -> ChangeBus:
+    return change_bus
@@ -0,0 +1,179 @@
+import asyncio
+import itertools
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Iterable, Literal, TypeAlias
+
+__all__ = ("Change", "ChangeBus", "ChangeType", "Subscription")
+
+ChangeType: TypeAlias = Literal["created", "updated", "deleted"]
+# what a writer publishes: type, kitten id, version and the kitten after
+# the change, None for deletes and where the writer doesn't have it at hand.
+# The version is the kitten's after the change, a delete's is one more than
+# the deleted kitten's: seqs of different workers' changes to a kitten can
+# be out of commit order, the highest version is its latest change
+PendingChange: TypeAlias = tuple[ChangeType, int, int, dict | None]
+
+
+@dataclass(frozen=True, slots=True)
+class Change:
+    seq: int
+    type: ChangeType
+    id: int
+    version: int
+    kitten: dict | None
+
+    def as_dict(self) -> dict:
+        return {
+            "seq": self.seq,
+            "type": self.type,
+            "id": self.id,
+            "version": self.version,
+            "kitten": self.kitten,
+        }
+
+
+class Subscription:
+    """changes in order, first the replayed ones, then live ones.
+
+    Iteration ends when the subscriber falls queue_size changes behind
+    (lagged) or the bus is reset, the subscriber then resumes from the
+    last seq it got.
+    """
+
+    def __init__(self, replay: list[Change], queue_size: int):
+        # one slot more, for the None that ends the iteration
+        self._queue: asyncio.Queue[Change | None] = asyncio.Queue(
+            maxsize=queue_size + 1
+        )
+        self._replay = deque(replay)
+        self.closed: Literal["lagged", "reset"] | None = None
+
+    def _put(self, change: Change) -> bool:
+        """False if the subscriber has fallen too far behind"""
+        if self._queue.qsize() >= self._queue.maxsize - 1:
+            self._close(reason="lagged")
+            return False
+        self._queue.put_nowait(change)
+        return True
+
+    def _close(self, reason: Literal["lagged", "reset"]) -> None:
+        if self.closed is None:
+            self.closed = reason
+            self._queue.put_nowait(None)
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> Change:
+        if self._replay:
+            return self._replay.popleft()
+        change = await self._queue.get()
+        if change is None:
+            raise StopAsyncIteration
+        return change
+
+
+class ChangeBus:
+    """in-process pub/sub of kitten changes with a replay buffer of the
+    last buffer_size ones.
+
+    publish() numbers the changes itself, unless a relay takes them to
+    number and fan them out between workers and deliver() them back.
+    Subscribers get up to queue_size changes ahead of them, beyond that
+    their subscription ends rather than the bus holding on to more.
+    """
+
+    def __init__(self, buffer_size: int, queue_size: int):
+        self._buffer: deque[Change] = deque(maxlen=buffer_size)
+        self._queue_size = queue_size
+        self._subscribers: set[Subscription] = set()
+        self._seq = itertools.count(1)
+        # changes after this seq are all known, earlier ones may not be
+        self._horizon = 0
+        self._changed = asyncio.Event()
+        self.relay: Callable[[list[PendingChange]], None] | None = None
+        self.lagged = 0
+
+    @property
+    def last_seq(self) -> int:
+        return self._buffer[-1].seq if self._buffer else self._horizon
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, changes: Iterable[PendingChange]) -> None:
+        """called after the commit, never waits"""
+        changes = list(changes)
+        if not changes:
+            return
+        if self.relay is not None:
+            self.relay(changes)
+            return
+        for type, id, version, kitten in changes:
+            self.deliver(Change(
+                seq=next(self._seq), type=type, id=id, version=version,
+                kitten=kitten,
+            ))
+
+    def deliver(self, change: Change) -> None:
+        if len(self._buffer) == self._buffer.maxlen:
+            self._horizon = self._buffer[0].seq
+        self._buffer.append(change)
+        for subscription in list(self._subscribers):
+            if not subscription._put(change):
+                self._subscribers.discard(subscription)
+                self.lagged += 1
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def reset(self, horizon: int) -> None:
+        """forgets the buffer and ends every subscription, for when
+        changes may have been missed; seqs up to horizon are past"""
+        self._buffer.clear()
+        self._horizon = horizon
+        self._seq = itertools.count(horizon + 1)
+        for subscription in self._subscribers:
+            subscription._close(reason="reset")
+        self._subscribers.clear()
+
+    def since(self, seq: int) -> list[Change] | None:
+        """buffered changes after seq, None if some of them are gone or
+        seq isn't one of this bus's"""
+        if seq < self._horizon:
+            return None
+        if seq > self.last_seq and self.relay is None:
+            # numbered here, so the numbering started over since then (a
+            # restart) or seq is another worker's; with the relay a seq
+            # from the shared sequence just hasn't got here yet
+            return None
+        return [change for change in self._buffer if change.seq > seq]
+
+    def subscribe(self, since: int | None = None) -> Subscription | None:
+        """live changes, after the ones since seq since if given;
+        None if since is too old to replay from"""
+        replay = [] if since is None else self.since(since)
+        if replay is None:
+            return None
+        subscription = Subscription(replay=replay, queue_size=self._queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    async def wait(
+        self, since: int, timeout: float, limit: int
+    ) -> list[Change] | None:
+        """long-poll: changes after since, waiting up to timeout seconds
+        for the first one; None if since is too old"""
+        changes = self.since(since)
+        if changes == []:
+            changed = self._changed
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return []
+            changes = self.since(since)
+        return None if changes is None else changes[:limit]
@@ -0,0 +1,224 @@
+import asyncio
+import json
+from collections import deque
+
+import asyncpg
+from sqlalchemy import URL
+
+from common.logger import logger
+
+from .bus import Change, ChangeBus, PendingChange
+
+__all__ = ("PostgresRelay",)
+
+# pg_notify payloads are limited to 8000 bytes, bigger kittens go without
+# their body and subscribers fetch them by id
+MAX_KITTEN_BYTES = 7000
+
+# one transaction per batch under this lock, so that batches of different
+# workers take their seqs and commit, i.e. get delivered, one after another
+# and every worker sees the changes in seq order. Seqs are taken when the
+# batch is sent, not when the write commits: two workers' changes to one
+# kitten can get them in the other order, their versions tell
+NOTIFY_LOCK = 0x6B697474  # "kitt"
+
+# the connection is gone or the server is going away, connecting again
+# helps; any other error would come back every time
+_CONNECTION_ERRORS = (
+    OSError, asyncio.TimeoutError, asyncpg.InterfaceError,
+    asyncpg.PostgresConnectionError, asyncpg.AdminShutdownError,
+    asyncpg.CrashShutdownError, asyncpg.CannotConnectNowError,
+    asyncpg.TooManyConnectionsError,
+)
+
+NOTIFY = """
+SELECT pg_notify($1, json_build_object(
+    'seq', nextval('kitten_changes_seq'),
+    'type', c.type, 'id', c.id, 'version', c.version, 'kitten', c.kitten
+)::text)
+FROM json_to_recordset($2::json)
+    AS c(type text, id int, version int, kitten json)
+"""
+
+
+class PostgresRelay:
+    """fans the bus's changes out to every worker through LISTEN/NOTIFY
+    on the primary.
+
+    The bus hands published changes over without waiting; a background
+    task sends them in batches of batch_size with one pg_notify statement,
+    which numbers them by the kitten_changes_seq sequence. Every worker,
+    this one included, delivers what it hears to its bus. The connection
+    is its own, not the pool's. After it is lost notifications may have
+    been missed, so the bus is reset; up to max_pending changes wait for
+    it to come back, more are dropped. On any other error the relay
+    stops for good and the bus numbers its changes itself again.
+    """
+
+    def __init__(
+        self,
+        bus: ChangeBus,
+        url: URL,
+        channel: str = "kitten_changes",
+        batch_size: int = 200,
+        max_pending: int = 10_000,
+        retry_after: float = 1.0,
+    ):
+        self._bus = bus
+        self._dsn = url.set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+        self._channel = channel
+        self._batch_size = batch_size
+        self._pending: deque[dict] = deque()
+        self._max_pending = max_pending
+        self._retry_after = retry_after
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.dropped = 0
+
+    async def start(self) -> None:
+        """connects before returning, so that publishing works at once"""
+        connection = await self._connect()
+        self._bus.relay = self.send
+        self._task = asyncio.create_task(self._run(connection))
+
+    async def stop(self) -> None:
+        """sends what is pending, then disconnects"""
+        self._bus.relay = None
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def send(self, changes: list[PendingChange]) -> None:
+        dropped = 0
+        for type, id, version, kitten in changes:
+            if len(self._pending) >= self._max_pending:
+                dropped += 1
+                continue
+            if (
+                kitten is not None
+                and len(_dumps(kitten).encode()) > MAX_KITTEN_BYTES
+            ):
+                kitten = None
+            self._pending.append({
+                "type": type, "id": id, "version": version, "kitten": kitten
+            })
+        if dropped:
+            self.dropped += dropped
+            logger.warning(
+                msg="kitten changes dropped, the relay is behind",
+                extra={"dropped": dropped},
+            )
+        self._wake.set()
+
+    async def _connect(self) -> asyncpg.Connection:
+        connection = await asyncpg.connect(self._dsn)
+        try:
+            await connection.add_listener(self._channel, self._on_notify)
+            # LISTEN is in effect now, so nothing after this seq is missed
+            horizon = await connection.fetchval(
+                "SELECT CASE WHEN is_called THEN last_value ELSE 0 END"
+                " FROM kitten_changes_seq"
+            )
+        except BaseException:
+            await connection.close()
+            raise
+        self._bus.reset(horizon=horizon)
+        return connection
+
+    async def _run(self, connection: asyncpg.Connection) -> None:
+        try:
+            while True:
+                try:
+                    await self._flush(connection)
+                except _CONNECTION_ERRORS as e:
+                    logger.warning(
+                        msg="change relay lost its connection",
+                        exc_info=str(e),
+                    )
+                    connection.terminate()
+                    connection = await self._reconnect()
+                    self._wake.set()  # the batch that failed
+        except asyncio.CancelledError:
+            try:  # the pending changes of the requests just served
+                await asyncio.wait_for(self._send_pending(connection), 5)
+            except Exception as e:
+                logger.warning(
+                    msg="change relay stopped with unsent changes",
+                    exc_info=str(e),
+                    extra={"pending": len(self._pending)},
+                )
+            raise
+        except Exception as e:
+            logger.error(
+                msg="change relay failed, changes stay in this worker",
+                exc_info=str(e),
+                extra={"pending": len(self._pending)},
+            )
+            self._give_up()
+        finally:
+            await connection.close()
+
+    def _give_up(self) -> None:
+        self._bus.relay = None
+        self.dropped += len(self._pending)
+        self._pending.clear()
+        # the changes not sent are lost, a subscriber that is up to date
+        # resyncs to be sure
+        self._bus.reset(horizon=self._bus.last_seq + 1)
+
+    async def _reconnect(self) -> asyncpg.Connection:
+        while True:
+            await asyncio.sleep(self._retry_after)
+            try:
+                return await self._connect()
+            except _CONNECTION_ERRORS as e:
+                logger.warning(
+                    msg="change relay failed to reconnect",
+                    exc_info=str(e),
+                )
+
+    async def _flush(self, connection: asyncpg.Connection) -> None:
+        await self._wake.wait()
+        self._wake.clear()
+        await self._send_pending(connection)
+
+    async def _send_pending(self, connection: asyncpg.Connection) -> None:
+        while self._pending:
+            batch = [
+                self._pending[i]
+                for i in range(min(self._batch_size, len(self._pending)))
+            ]
+            async with connection.transaction():
+                await connection.execute(
+                    "SELECT pg_advisory_xact_lock($1)", NOTIFY_LOCK
+                )
+                await connection.execute(
+                    NOTIFY, self._channel, _dumps(batch)
+                )
+            for _ in batch:  # sent, a failure above sends them again
+                self._pending.popleft()
+
+    def _on_notify(
+        self, connection: asyncpg.Connection, pid: int, channel: str,
+        payload: str,
+    ) -> None:
+        change = json.loads(payload)
+        self._bus.deliver(Change(
+            seq=change["seq"],
+            type=change["type"],
+            id=change["id"],
+            version=change["version"],
+            kitten=change["kitten"],
+        ))
+
+
+def _dumps(value: dict | list) -> str:
+    # unescaped, postgres keeps json text as given and the limit is in bytes
+    return json.dumps(value, ensure_ascii=False)
@@ -1,3 +0,0 @@
-__all__ = ("KittenE",)
-
-from .kitten import KittenE
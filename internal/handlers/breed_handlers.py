@@ -1,17 +1,28 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, status
 
-from internal.schemas import BreedID, CreateBreedS, ReturnBreedS
+from internal.schemas import BreedID, BreedPageS, CreateBreedS
 from internal.services import BreedService
+from internal.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+from .conditional import conditional_response
 
 router = APIRouter(prefix="/breeds", tags=["Breeds"])
 
 
 @router.get(
     "",
-    response_model=list[ReturnBreedS],
+    response_model=BreedPageS,
     status_code=status.HTTP_200_OK)
-async def get_all_breeds(service: BreedService = Depends()):
-    return await service.get_breeds()
+async def get_all_breeds(
+        request: Request,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        after: str | None = Query(
+            None, description="next_cursor of the previous page"
+        ),
+        service: BreedService = Depends()
+):
+    cached = await service.get_breeds_json(limit=limit, after=after)
+    return conditional_response(request=request, cached=cached)
 
 
 @router.post(
@@ -0,0 +1,70 @@
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request, status
+from fastapi.responses import Response
+
+from internal.cache import CachedResponse
+
+__all__ = ("conditional_response", "if_match_etags")
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def _not_modified_since(if_modified_since: str, last_modified: int) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # whole seconds: a copy from the second this body was rendered in may
+    # have been rendered before a write of that same second, only the etag
+    # tells them apart
+    return last_modified < since
+
+
+def conditional_response(
+    request: Request, cached: CachedResponse
+) -> Response:
+    """answers with 304 if the client already has this representation"""
+    headers = {
+        "ETag": cached.etag,
+        "Last-Modified": formatdate(cached.last_modified, usegmt=True),
+        "Cache-Control": "no-cache",  # always revalidate, cheap with 304
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:  # takes precedence over If-Modified-Since
+        not_modified = _etag_matches(if_none_match, etag=cached.etag)
+    elif if_modified_since is not None:
+        not_modified = _not_modified_since(
+            if_modified_since, last_modified=cached.last_modified
+        )
+    else:
+        not_modified = False
+
+    if not_modified:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+        )
+    return Response(
+        content=cached.body, media_type="application/json", headers=headers
+    )
+
+
+def if_match_etags(request: Request) -> list[str] | None:
+    """the etags of If-Match, None without one or for * (any version)"""
+    if_match = request.headers.get("if-match")
+    if if_match is None or if_match.strip() == "*":
+        return None
+    # If-Match uses strong comparison, W/ etags are kept and never match
+    return [
+        candidate.strip() for candidate in if_match.split(",")
+        if candidate.strip()
+    ]
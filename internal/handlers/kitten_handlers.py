@@ -1,29 +1,206 @@
 from typing import TypeAlias
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Body, Depends, Query, Request, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
 
+from common.config import settings
 from internal.schemas import (
+    KITTEN_FIELDS,
+    MAX_BULK_ITEMS,
+    BulkDeleteKittenS,
+    BulkResultS,
+    BulkUpdateKittenS,
     CreateKittenS,
+    ExportFormat,
+    KittenChangesS,
+    KittenFilterS,
     KittenID,
+    KittenPageS,
+    KittenSort,
+    KittenStatsS,
     ReturnKittenS,
     UpdateKittenS,
 )
 from internal.services import KittenService
+from internal.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+from .conditional import conditional_response, if_match_etags
 
 router = APIRouter(prefix="/kittens", tags=["Kittens"])
 
 KittenId: TypeAlias = int
 
+EXPORT_MEDIA_TYPES: dict[ExportFormat, str] = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+FIELDS_PATTERN = "^({0})(,({0}))*$".format("|".join(KITTEN_FIELDS))
+
+
+def kitten_filters(
+    color: str | None = Query(None, min_length=1),
+    age_min: int | None = Query(None, ge=0),
+    age_max: int | None = Query(None, ge=0),
+    q: str | None = Query(
+        None, min_length=1, description="search in description"
+    ),
+    sort: KittenSort = Query("id", description="prefix with - to reverse"),
+    fields: str | None = Query(
+        None,
+        pattern=FIELDS_PATTERN,
+        description="comma separated fields to return, e.g. id,color",
+    ),
+) -> KittenFilterS:
+    try:
+        return KittenFilterS(
+            color=color,
+            age_min=age_min,
+            age_max=age_max,
+            q=q,
+            sort=sort,
+            fields=fields.split(",") if fields else KITTEN_FIELDS,
+        )
+    except ValidationError as e:
+        raise RequestValidationError(errors=[
+            {**error, "loc": ("query", *error["loc"])}
+            for error in e.errors(include_url=False, include_context=False)
+        ])
+
 
 @router.get("",
-            response_model=list[ReturnKittenS],
+            response_model=KittenPageS,
             status_code=status.HTTP_200_OK,
             description="Get all kittens")
 async def get_all_kittens(
+    request: Request,
+    breed: str = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = Query(
+        None, description="next_cursor of the previous page"
+    ),
+    filters: KittenFilterS = Depends(kitten_filters),
+    service: KittenService = Depends()
+):
+    cached = await service.get_all_kittens_json(
+        breed=breed, limit=limit, after=after, filters=filters
+    )
+    return conditional_response(request=request, cached=cached)
+
+
+@router.get(
+    "/stats",
+    response_model=KittenStatsS,
+    status_code=status.HTTP_200_OK,
+    description="Kitten counts per breed and age, and the most common "
+                "colors, up to STATS_RECONCILE_INTERVAL seconds behind "
+                "writes that went through other workers"
+)
+async def get_kitten_stats(
+    top_colors: int = Query(10, ge=1, le=100),
+    service: KittenService = Depends()
+):
+    return await service.get_stats(top_colors=top_colors)
+
+
+@router.get(
+    "/changes",
+    response_model=KittenChangesS,
+    status_code=status.HTTP_200_OK,
+    description="Created, updated and deleted kittens in order of seq. "
+                "With Accept: text/event-stream a stream of server-sent "
+                "events that resumes from Last-Event-ID, otherwise a "
+                "long-poll for the changes after since",
+    responses={status.HTTP_410_GONE: {
+        "description": "the changes after since are no longer kept"
+    }},
+)
+async def get_kitten_changes(
+    request: Request,
+    since: int | None = Query(
+        None, ge=0, description="last_seq of the previous poll"
+    ),
+    wait: float = Query(
+        settings.CHANGE_FEED_MAX_WAIT, ge=0, le=settings.CHANGE_FEED_MAX_WAIT,
+        description="seconds to wait for a change",
+    ),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    service: KittenService = Depends()
+):
+    if "text/event-stream" in request.headers.get("accept", ""):
+        last_event_id = request.headers.get("last-event-id", "")
+        if last_event_id.isdigit():
+            since = int(last_event_id)
+        return StreamingResponse(
+            content=service.watch_changes(
+                since=since, keep_alive=settings.CHANGE_FEED_KEEP_ALIVE
+            ),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    return await service.get_changes(since=since, wait=wait, limit=limit)
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    description="Stream the whole kitten catalogue as NDJSON or JSON array"
+)
+async def export_kittens(
     breed: str = Query(None),
+    format: ExportFormat = Query("ndjson"),
+    service: KittenService = Depends()
+):
+    chunks = await service.export_kittens(breed=breed, fmt=format)
+    return StreamingResponse(
+        content=chunks, media_type=EXPORT_MEDIA_TYPES[format]
+    )
+
+
+@router.post(
+    "/bulk",
+    response_model=BulkResultS,
+    status_code=status.HTTP_201_CREATED,
+    description="Add information about many kittens at once"
+)
+async def bulk_create_kittens(
+    create_dtos: list[CreateKittenS] = Body(
+        min_length=1, max_length=MAX_BULK_ITEMS
+    ),
+    service: KittenService = Depends()
+):
+    return await service.bulk_create_kittens(create_dtos=create_dtos)
+
+
+@router.patch(
+    "/bulk",
+    response_model=BulkResultS,
+    status_code=status.HTTP_200_OK,
+    description="Update information about many kittens at once"
+)
+async def bulk_update_kittens(
+    update_dtos: list[BulkUpdateKittenS] = Body(
+        min_length=1, max_length=MAX_BULK_ITEMS
+    ),
     service: KittenService = Depends()
 ):
-    return await service.get_all_kittens(breed=breed)
+    return await service.bulk_update_kittens(update_dtos=update_dtos)
+
+
+@router.delete(
+    "/bulk",
+    response_model=BulkResultS,
+    status_code=status.HTTP_200_OK,
+    description="Delete information about many kittens at once"
+)
+async def bulk_delete_kittens(
+    delete_dto: BulkDeleteKittenS,
+    service: KittenService = Depends()
+):
+    return await service.bulk_delete_kittens(ids=delete_dto.ids)
 
 
 @router.get(
@@ -32,8 +209,11 @@ async def get_all_kittens(
     status_code=status.HTTP_200_OK,
     description="Get kitten info"
 )
-async def get_kitten_info(id: int, service: KittenService = Depends()):
-    return await service.get_kitten(id=id)
+async def get_kitten_info(
+    id: int, request: Request, service: KittenService = Depends()
+):
+    cached = await service.get_kitten_json(id=id)
+    return conditional_response(request=request, cached=cached)
 
 
 @router.post(
@@ -52,14 +232,26 @@ async def create_kitten(
     "/{id}",
     response_model=ReturnKittenS,
     status_code=status.HTTP_200_OK,
-    description="Update information about kitten"
+    description="Update information about kitten, send the ETag it was "
+                "read with as If-Match to get 412 if someone changed it since",
+    responses={status.HTTP_412_PRECONDITION_FAILED: {
+        "description": "the kitten has changed, its ETag is the current one"
+    }},
 )
 async def update_kitten(
     id: int,
+    request: Request,
     update_dto: UpdateKittenS, service: KittenService = Depends()
 ):
-    return await service.update_kitten(
-        instance_id=id, update_dto=update_dto
+    updated = await service.update_kitten_json(
+        instance_id=id,
+        update_dto=update_dto,
+        if_match=if_match_etags(request=request),
+    )
+    return Response(
+        content=updated.body,
+        media_type="application/json",
+        headers={"ETag": updated.etag},
     )
 
 
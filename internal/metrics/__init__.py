@@ -0,0 +1,22 @@
+__all__ = (
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "Registry",
+    "registry",
+    "labelled",
+    "query_label",
+    "instrument_db",
+    "MetricsMiddleware",
+    "StatementBudgetMiddleware",
+    "StatementLog",
+    "track_statements",
+    "CONTENT_TYPE",
+)
+
+from .app import instrument_db, registry
+from .budget import StatementBudgetMiddleware
+from .middleware import MetricsMiddleware
+from .queries import labelled, query_label
+from .registry import CONTENT_TYPE, Counter, Gauge, Histogram, Registry
+from .statements import StatementLog, track_statements
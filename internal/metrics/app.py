@@ -0,0 +1,112 @@
+import os
+import time
+
+from common.config import settings
+from common.logger import log_handler
+from internal.cache import response_cache
+from internal.changes import change_bus
+from internal.outbox import outbox
+from internal.storage import get_db_client
+
+from .queries import instrument_engine
+from .registry import Registry
+
+# every worker process has a registry of its own and answers the scrapes
+# that reach it, pid tells their series apart and process_start_time
+# their restarts
+registry = Registry(labels={"pid": str(os.getpid())})
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total",
+    "HTTP requests by route template and status",
+    labels=("method", "route", "status"),
+)
+HTTP_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency, including streamed bodies",
+    labels=("method", "route", "status"),
+)
+HTTP_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "HTTP requests being served right now"
+)
+DB_QUERY_DURATION = registry.histogram(
+    "db_query_duration_seconds",
+    "duration of DB statements by the repository method that ran them",
+    labels=("repo_method",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+             0.5, 1.0, 2.5),
+)
+
+
+_started = time.time()
+registry.gauge(
+    "process_start_time_seconds", "when this worker process started",
+    callback=lambda: _started,
+)
+
+
+def _pool_stat(key: str):
+    return lambda: get_db_client().pool_stats().get(key, 0)
+
+
+for name, key, help in (
+    ("db_pool_size", "size", "connections the pool keeps open"),
+    ("db_pool_max_overflow", "max_overflow", "extra connections allowed"),
+    ("db_pool_checked_out", "checked_out", "connections in use"),
+    ("db_pool_idle", "idle", "connections waiting in the pool"),
+    ("db_pool_saturation", "saturation", "checked out / capacity"),
+    ("db_pool_checkout_wait_max_seconds", "wait_seconds_max",
+     "longest wait for a connection"),
+):
+    registry.gauge(name, f"primary pool: {help}", callback=_pool_stat(key))
+for name, key, help in (
+    ("db_pool_checkouts_total", "checkouts", "connection checkouts"),
+    ("db_pool_checkout_timeouts_total", "timeouts",
+     "checkouts that timed out"),
+    ("db_pool_checkout_wait_seconds_total", "wait_seconds_total",
+     "time spent waiting for connections"),
+):
+    registry.counter(name, f"primary pool: {help}", callback=_pool_stat(key))
+
+registry.counter(
+    "response_cache_hits_total", "response cache hits",
+    callback=lambda: response_cache.hits,
+)
+registry.counter(
+    "response_cache_misses_total", "response cache misses",
+    callback=lambda: response_cache.misses,
+)
+registry.gauge(
+    "kitten_change_subscribers", "open GET /kittens/changes streams",
+    callback=lambda: change_bus.subscribers,
+)
+registry.counter(
+    "kitten_change_subscribers_lagged_total",
+    "change streams closed for falling behind",
+    callback=lambda: change_bus.lagged,
+)
+registry.counter(
+    "outbox_events_handled_total", "outbox events whose handlers ran",
+    callback=lambda: outbox.handled,
+)
+registry.counter(
+    "outbox_event_failures_total", "outbox event handler failures",
+    callback=lambda: outbox.failed,
+)
+registry.counter(
+    "outbox_events_given_up_total",
+    "outbox events left in the table after OUTBOX_MAX_ATTEMPTS",
+    callback=lambda: outbox.given_up,
+)
+registry.counter(
+    "log_records_dropped_total", "log records dropped, the queue was full",
+    callback=lambda: getattr(log_handler, "dropped", 0),
+)
+
+
+def instrument_db() -> None:
+    """times the statements of the primary and every replica engine, for
+    /metrics if enabled and for statement logs"""
+    histogram = DB_QUERY_DURATION if settings.METRICS_ENABLED else None
+    for engine in get_db_client().engines:
+        instrument_engine(engine=engine, histogram=histogram)
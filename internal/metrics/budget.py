@@ -0,0 +1,86 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from common.logger import logger
+
+from .statements import StatementLog, statement_log
+
+
+def server_timing(log: StatementLog, seconds: float) -> str:
+    """Server-Timing header value: db, serialize and the rest of the app"""
+    app = max(seconds - log.db_seconds - log.serialize_seconds, 0.0)
+    return (
+        f'db;dur={log.db_seconds * 1e3:.3f};desc="{log.count} statements", '
+        f"serialize;dur={log.serialize_seconds * 1e3:.3f}, "
+        f"app;dur={app * 1e3:.3f}"
+    )
+
+
+class StatementBudgetMiddleware:
+    """counts the statements and DB time of every request, reports them in
+    Server-Timing and logs the requests that go over a limit"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_statements: int,
+        max_seconds: float,
+        max_repeats: int,
+    ):
+        self.app = app
+        self.max_statements = max_statements
+        self.max_seconds = max_seconds
+        self.max_repeats = max_repeats
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        log = StatementLog()
+        status = 500  # unless the app manages to start a response
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append(
+                    "Server-Timing",
+                    server_timing(log, time.perf_counter() - started),
+                )
+            await send(message)
+
+        token = statement_log.set(log)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            statement_log.reset(token)
+            self._check(scope, status, log, time.perf_counter() - started)
+
+    def _check(
+        self, scope: Scope, status: int, log: StatementLog, seconds: float
+    ) -> None:
+        summary = log.summary()
+        reasons = []
+        if log.count > self.max_statements:
+            reasons.append("statements")
+        if seconds > self.max_seconds:
+            reasons.append("duration")
+        if summary and summary[0]["count"] >= self.max_repeats:
+            reasons.append("repeated statement")  # likely N+1
+        if not reasons:
+            return
+        logger.warning(
+            msg=f"request over budget: {', '.join(reasons)}",
+            extra={
+                "method": scope["method"],
+                "route": getattr(scope.get("route"), "path", scope["path"]),
+                "status": status,
+                "duration_ms": round(seconds * 1e3, 3),
+                "db_ms": round(log.db_seconds * 1e3, 3),
+                "statement_count": log.count,
+                "statements": summary,
+            },
+        )
@@ -0,0 +1,42 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .app import HTTP_DURATION, HTTP_IN_FLIGHT, HTTP_REQUESTS
+
+
+class MetricsMiddleware:
+    """counts and times requests by route template, plain ASGI so it
+    doesn't add a task per request like BaseHTTPMiddleware"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500  # unless the app manages to start a response
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # the router puts the matched route into the scope, templates
+            # keep the label count bounded unlike raw paths
+            route = getattr(scope.get("route"), "path", "unmatched")
+            labels = {
+                "method": scope["method"],
+                "route": route,
+                "status": str(status),
+            }
+            HTTP_REQUESTS.inc(**labels)
+            HTTP_DURATION.observe(time.perf_counter() - started, **labels)
@@ -0,0 +1,94 @@
+import functools
+import inspect
+import time
+from contextvars import ContextVar
+from typing import Callable
+
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .registry import Histogram
+from .statements import statement_log
+
+__all__ = (
+    "query_label",
+    "labelled",
+    "instrument_engine",
+)
+
+# repository method the statements running now belong to
+query_label: ContextVar[str] = ContextVar("query_label", default="other")
+
+
+def labelled(label: str) -> Callable[[Callable], Callable]:
+    """decorates a coroutine or async generator function so the queries it
+    runs are labelled `label`"""
+    def decorator(func: Callable) -> Callable:
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def generator_wrapper(*args, **kwargs):
+                agen = func(*args, **kwargs)
+                try:
+                    while True:
+                        # set per step, the consumer runs between steps
+                        token = query_label.set(label)
+                        try:
+                            item = await agen.__anext__()
+                        except StopAsyncIteration:
+                            return
+                        finally:
+                            query_label.reset(token)
+                        yield item
+                finally:
+                    await agen.aclose()
+
+            return generator_wrapper
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = query_label.set(label)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                query_label.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_engine(
+    engine: AsyncEngine | Engine, histogram: Histogram | None = None
+) -> None:
+    """times every statement into the histogram by query_label, and adds
+    it to the current statement_log"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if getattr(sync_engine, "_statements_timed", False):
+        return  # already instrumented
+    sync_engine._statements_timed = True
+
+    # one do_execute hook that runs the dialect's own execute between two
+    # timers costs a third of a before/after_cursor_execute listener pair
+    def timed(execute: Callable) -> Callable:
+        def listener(cursor, statement, *args) -> bool:
+            started = time.perf_counter()
+            try:
+                execute(cursor, statement, *args)
+            finally:
+                elapsed = time.perf_counter() - started
+                if histogram is not None:
+                    histogram.observe(elapsed, repo_method=query_label.get())
+                log = statement_log.get()
+                if log is not None:
+                    log.add(statement, query_label.get(), elapsed)
+            return True  # executed, the dialect must not run it again
+
+        return listener
+
+    dialect = sync_engine.dialect
+    for name, execute in (
+        ("do_execute", dialect.do_execute),
+        ("do_executemany", dialect.do_executemany),
+        ("do_execute_no_params", dialect.do_execute_no_params),
+    ):
+        event.listen(sync_engine, name, timed(execute))
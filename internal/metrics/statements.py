@@ -0,0 +1,89 @@
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+__all__ = (
+    "StatementLog",
+    "statement_log",
+    "track_statements",
+    "normalize_sql",
+)
+
+_LITERAL = re.compile(
+    r"'(?:[^']|'')*'"  # strings
+    r"|\$\d+|%\(\w+\)s|(?<!:):\w+"  # bind parameters of any paramstyle
+    r"|\b\d+(?:\.\d+)?\b"  # numbers, identifiers like anon_1 are kept
+)
+_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def normalize_sql(statement: str) -> str:
+    """the statement with literals and parameters as ?, lists of them as
+    one, so that the same query with other values reads the same"""
+    statement = _LITERAL.sub("?", " ".join(statement.split()))
+    return _LIST.sub("?, ...", statement)
+
+
+class StatementLog:
+    """statements run while it is current and where the time went"""
+
+    def __init__(self):
+        # raw statement, repository method, seconds
+        self.statements: list[tuple[str, str, float]] = []
+        self.db_seconds: float = 0.0
+        self.serialize_seconds: float = 0.0
+
+    def add(self, statement: str, repo_method: str, seconds: float) -> None:
+        self.statements.append((statement, repo_method, seconds))
+        self.db_seconds += seconds
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def by_method(self) -> Counter[str]:
+        """statement counts by repository method"""
+        return Counter(method for _, method, _ in self.statements)
+
+    def summary(self) -> list[dict]:
+        """normalized statements with how often and how long they ran,
+        the most repeated first"""
+        groups: dict[tuple[str, str], dict] = {}
+        for statement, method, seconds in self.statements:
+            sql = normalize_sql(statement)
+            group = groups.setdefault((sql, method), {
+                "sql": sql, "repo_method": method, "count": 0, "ms": 0.0,
+            })
+            group["count"] += 1
+            group["ms"] += seconds * 1e3
+        for group in groups.values():
+            group["ms"] = round(group["ms"], 3)
+        return sorted(
+            groups.values(), key=lambda g: (-g["count"], -g["ms"])
+        )
+
+
+# the log of the request (or test block) running now, if any
+statement_log: ContextVar[StatementLog | None] = ContextVar(
+    "statement_log", default=None
+)
+
+
+@contextmanager
+def track_statements() -> Iterator[StatementLog]:
+    """collects the statements run inside the block, e.g.
+
+        with track_statements() as log:
+            await kitten_service.update_kitten(...)
+        assert log.count == 1
+
+    needs instrument_db(); nested blocks don't see each other's statements
+    """
+    log = StatementLog()
+    token = statement_log.set(log)
+    try:
+        yield log
+    finally:
+        statement_log.reset(token)
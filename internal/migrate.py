@@ -0,0 +1,73 @@
+"""migrates the database to the latest schema, run it before the server:
+
+    python -m internal.migrate
+    python -m internal.migrate --drop  # drops every table first, dev only
+
+A database whose tables create_all made before there were migrations is
+stamped with the initial revision first. The server itself doesn't touch
+the schema, so starting workers neither wipes data nor waits for DDL.
+New migrations: alembic revision --autogenerate -m "..."
+"""
+import argparse
+import asyncio
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+
+from common.logger import logger
+from internal.orm_models import Base
+from internal.storage import get_db_client
+
+ROOT = Path(__file__).parents[1]
+INITIAL_REVISION = "0001"
+# made by the migrations only where the database supports them (0002)
+OPTIONAL_INDEXES = {"ix_kittens_description_trgm"}
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    """leaves the optional indexes out of autogenerate's comparison"""
+    return not (type_ == "index" and name in OPTIONAL_INDEXES)
+
+
+def migration_config() -> Config:
+    return Config(str(ROOT / "alembic.ini"))
+
+
+async def _prepare(drop: bool) -> bool:
+    """drops the tables if asked to, tells whether the app's tables are
+    there without migration history"""
+    db_client = get_db_client()
+    try:
+        async with db_client.engine.begin() as con:
+            if drop:
+                await con.run_sync(Base.metadata.drop_all)
+                await con.execute(text("DROP TABLE IF EXISTS alembic_version"))
+            tables = await con.run_sync(
+                lambda sync_con: set(inspect(sync_con).get_table_names())
+            )
+    finally:
+        await db_client.dispose()
+    return "alembic_version" not in tables and bool(
+        tables & Base.metadata.tables.keys()
+    )
+
+
+def migrate(drop: bool = False) -> None:
+    config = migration_config()
+    if asyncio.run(_prepare(drop=drop)):
+        logger.info(
+            msg="stamping tables made without migrations",
+            extra={"revision": INITIAL_REVISION},
+        )
+        command.stamp(config, INITIAL_REVISION)
+    command.upgrade(config, "head")
+    logger.info(msg="database is migrated")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--drop", action="store_true")
+    args = parser.parse_args()
+    migrate(drop=args.drop)
@@ -0,0 +1,50 @@
+"""alembic environment: migrates the database of the app settings, or the
+connection handed in as config.attributes["connection"] (tests), which
+must not have begun a transaction: the revisions commit themselves"""
+import asyncio
+
+from alembic import context
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from common.config import settings
+from internal.migrate import include_object
+from internal.orm_models import Base
+
+
+def run_migrations(connection: Connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=Base.metadata,
+        include_object=include_object,
+        # autocommit blocks (CREATE INDEX CONCURRENTLY) commit what ran
+        # before them, so every revision commits on its own anyway
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    engine = create_async_engine(settings.DB_URL, poolclass=NullPool)
+    try:
+        async with engine.connect() as connection:
+            await connection.run_sync(run_migrations)
+    finally:
+        await engine.dispose()
+
+
+if context.is_offline_mode():  # alembic upgrade --sql
+    context.configure(
+        url=settings.DB_URL,
+        target_metadata=Base.metadata,
+        literal_binds=True,
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+elif (connection := context.config.attributes.get("connection")) is not None:
+    run_migrations(connection)
+else:
+    asyncio.run(run_async_migrations())
@@ -0,0 +1,78 @@
+"""operations for migrating tables that are in use: indexes built without
+locking out writes and backfills in short transactions"""
+import time
+from typing import Any, Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+__all__ = (
+    "create_index_concurrently",
+    "drop_index_concurrently",
+    "backfill",
+)
+
+
+def create_index_concurrently(
+    name: str, table: str, columns: Sequence[str], **kwargs: Any
+) -> None:
+    """CREATE INDEX CONCURRENTLY on postgres, writes go on while it builds.
+
+    It can't run in a transaction, so it runs in an autocommit block. A
+    build that failed half way leaves an invalid index behind, which is
+    dropped first so that running the migration again rebuilds it.
+    """
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            name, table_name=table, if_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            name, table, columns, postgresql_concurrently=True, **kwargs
+        )
+
+
+def drop_index_concurrently(name: str, table: str) -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            name, table_name=table, if_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def backfill(
+    table: sa.TableClause,
+    values: dict[str, Any],
+    where: sa.ColumnElement[bool] | None = None,
+    batch_size: int = 1000,
+    pause: float = 0.1,
+) -> int:
+    """UPDATE table SET values [WHERE where] in batches of batch_size rows
+    by id, each committed on its own, so that no batch holds its row locks
+    for long, with pause seconds between them for replicas and other
+    writers to keep up. Returns the number of rows updated.
+
+    table needs an id column, e.g. sa.table("kittens", sa.column("id"))
+    """
+    id_ = table.c.id
+    updated = 0
+    last = None
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        while True:
+            batch = sa.select(id_).order_by(id_).limit(batch_size)
+            if last is not None:
+                batch = batch.where(id_ > last)
+            upto = bind.execute(
+                sa.select(sa.func.max(batch.subquery().c.id))
+            ).scalar()
+            if upto is None:
+                return updated
+            stmt = sa.update(table).where(id_ <= upto).values(values)
+            if last is not None:
+                stmt = stmt.where(id_ > last)
+            if where is not None:
+                stmt = stmt.where(where)
+            updated += bind.execute(stmt).rowcount
+            last = upto
+            time.sleep(pause)
@@ -0,0 +1,44 @@
+"""initial schema, what create_all made before there were migrations
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00
+"""
+from typing import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0001"
+down_revision: str | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "breeds",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_table(
+        "kittens",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("color", sa.String(), nullable=False),
+        sa.Column("age", sa.Integer(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("breed_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["breed_id"], ["breeds.id"], ondelete="RESTRICT"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_kittens_breed_id", "kittens", ["breed_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_kittens_breed_id", table_name="kittens")
+    op.drop_table("kittens")
+    op.drop_table("breeds")
@@ -0,0 +1,57 @@
+"""indexes for sorting kittens by age and color and for description search,
+built concurrently
+
+(sort key, id) indexes let keyset pages read the next rows straight off
+the index, (color, id) also serves color filters sorted by id. The
+trigram index is only built where pg_trgm is available.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:30:00
+"""
+from typing import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+from internal.migrations.ops import (
+    create_index_concurrently,
+    drop_index_concurrently,
+)
+
+revision: str = "0002"
+down_revision: str | None = "0001"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def _has_pg_trgm() -> bool:
+    if op.get_context().dialect.name != "postgresql":
+        return False
+    if op.get_context().as_sql:
+        return True  # can't look, the script is run later
+    return op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+    )).scalar() is not None
+
+
+def upgrade() -> None:
+    create_index_concurrently("ix_kittens_age_id", "kittens", ["age", "id"])
+    create_index_concurrently(
+        "ix_kittens_color_id", "kittens", ["color", "id"]
+    )
+    # a prefix of it, made by create_all before there were migrations
+    drop_index_concurrently("ix_kittens_color", "kittens")
+    if _has_pg_trgm():
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        create_index_concurrently(
+            "ix_kittens_description_trgm", "kittens", ["description"],
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    drop_index_concurrently("ix_kittens_description_trgm", "kittens")
+    drop_index_concurrently("ix_kittens_color_id", "kittens")
+    drop_index_concurrently("ix_kittens_age_id", "kittens")
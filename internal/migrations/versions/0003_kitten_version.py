@@ -0,0 +1,34 @@
+"""kittens.version for optimistic locking
+
+A constant default makes adding the column a catalog-only change on
+postgres 11+, existing rows read it as 1 without being rewritten, so
+there is nothing to backfill.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 17:30:00
+"""
+from typing import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0003"
+down_revision: str | None = "0002"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "kittens",
+        sa.Column(
+            "version", sa.Integer(), server_default=sa.text("1"),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("kittens") as batch_op:
+        batch_op.drop_column("version")
@@ -0,0 +1,30 @@
+"""kitten_changes_seq for the change feed
+
+Postgres only, it numbers the LISTEN/NOTIFY fan-out of GET /kittens/changes
+between workers; with one worker on sqlite the feed numbers in memory.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 19:00:00
+"""
+from typing import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0004"
+down_revision: str | None = "0003"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+kitten_changes_seq = sa.Sequence("kitten_changes_seq")
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.supports_sequences:
+        op.execute(sa.schema.CreateSequence(kitten_changes_seq))
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.supports_sequences:
+        op.execute(sa.schema.DropSequence(kitten_changes_seq))
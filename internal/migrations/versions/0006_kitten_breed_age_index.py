@@ -0,0 +1,47 @@
+"""(breed_id, age) index in place of the breed_id one
+
+It also serves plain breed_id lookups and the foreign key. Databases
+that create_all made after the index was added to the model have it
+already, so it is only built where it is missing.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 22:00:00
+"""
+from typing import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+from internal.migrations.ops import (
+    create_index_concurrently,
+    drop_index_concurrently,
+)
+
+revision: str = "0006"
+down_revision: str | None = "0005"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def _has_index(name: str) -> bool:
+    if op.get_context().as_sql:
+        return False  # can't look, the script is run later on a new db
+    return name in {
+        index["name"] for index in sa.inspect(op.get_bind()).get_indexes(
+            "kittens"
+        )
+    }
+
+
+def upgrade() -> None:
+    if not _has_index("ix_kittens_breed_id_age"):
+        create_index_concurrently(
+            "ix_kittens_breed_id_age", "kittens", ["breed_id", "age"]
+        )
+    drop_index_concurrently("ix_kittens_breed_id", "kittens")
+
+
+def downgrade() -> None:
+    create_index_concurrently("ix_kittens_breed_id", "kittens", ["breed_id"])
+    drop_index_concurrently("ix_kittens_breed_id_age", "kittens")
@@ -1,9 +1,11 @@
 __all__ = (
     "Breed",
     "Kitten",
+    "OutboxEvent",
     "Base",
 )
 
 from .base import Base
 from .breed import Breed
 from .kitten import Kitten
+from .outbox import OutboxEvent
@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import DDL, ForeignKey, Index, Sequence, event, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -11,13 +11,22 @@ if TYPE_CHECKING:
 
 class Kitten(Base):
     __tablename__ = "kittens"
+    __table_args__ = (
+        # also serves plain breed_id lookups and the foreign key
+        Index("ix_kittens_breed_id_age", "breed_id", "age"),
+        # (sort key, id) for keyset pages, the color one for filters too
+        Index("ix_kittens_age_id", "age", "id"),
+        Index("ix_kittens_color_id", "color", "id"),
+    )
 
     color: Mapped[str]
     age: Mapped[int]
     description: Mapped[str | None]
     breed_id: Mapped[int | None] = mapped_column(
-        ForeignKey("breeds.id", ondelete="RESTRICT"), index=True
+        ForeignKey("breeds.id", ondelete="RESTRICT")
     )
+    # bumped by every update, the ETag that PATCH checks If-Match against
+    version: Mapped[int] = mapped_column(server_default=text("1"))
 
     # relationships
     breed: Mapped["Breed"] = relationship(back_populates="kittens")
@@ -25,4 +34,31 @@ class Kitten(Base):
     def __repr__(self):
         return f"Kitten(\
         id={self.id}, color={self.color}, age={self.age},\
-         description={self.description}, breed_id={self.breed_id})"
+         description={self.description}, breed_id={self.breed_id},\
+         version={self.version})"
+
+
+# trigram index for ILIKE '%...%' description search. pg_trgm is a contrib
+# extension, so without it the search still works, just by a sequential scan.
+# Migration 0002 makes it the same way, for create_all (tests, benchmarks)
+event.listen(
+    Kitten.__table__,
+    "after_create",
+    DDL("""
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'
+    ) THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS ix_kittens_description_trgm
+            ON kittens USING gin (description gin_trgm_ops);
+    END IF;
+END $$
+""").execute_if(dialect="postgresql"),
+)
+
+# numbers the changes of GET /kittens/changes across workers, see
+# internal.changes.PostgresRelay; create_all skips it where there are no
+# sequences, as migration 0004 does
+kitten_changes_seq = Sequence("kitten_changes_seq", metadata=Base.metadata)
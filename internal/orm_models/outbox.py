@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime, Index, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+# a side effect of a committed write, written in its transaction and run
+# by internal.outbox.OutboxWorker
+class OutboxEvent(Base):
+    __tablename__ = "outbox"
+    __table_args__ = (
+        Index("ix_outbox_available_at", "available_at"),
+    )
+
+    topic: Mapped[str]  # e.g. kitten.updated
+    payload: Mapped[dict] = mapped_column(JSON)
+    # claims so far, the event is given up on at the worker's max_attempts
+    attempts: Mapped[int] = mapped_column(server_default=text("0"))
+    # not before, pushed back by claims (a lease) and failures (a backoff)
+    available_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    last_error: Mapped[str | None]
+
+    def __repr__(self):
+        return f"OutboxEvent(id={self.id}, topic={self.topic},\
+         attempts={self.attempts})"
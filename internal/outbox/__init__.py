@@ -0,0 +1,8 @@
+__all__ = (
+    "Handler",
+    "OutboxWorker",
+    "outbox",
+)
+
+from .app import outbox
+from .worker import Handler, OutboxWorker
@@ -0,0 +1,14 @@
+from common.config import settings
+
+from .worker import OutboxWorker
+
+# handlers are registered on it here; the repos only write the events of
+# topics that have one
+outbox = OutboxWorker(
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    poll_interval=settings.OUTBOX_POLL_INTERVAL,
+    lease=settings.OUTBOX_LEASE,
+    backoff=settings.OUTBOX_BACKOFF,
+    max_backoff=settings.OUTBOX_MAX_BACKOFF,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+)
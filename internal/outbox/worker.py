@@ -0,0 +1,194 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, TypeAlias
+
+from sqlalchemy import delete, select, update
+
+from common.logger import logger
+from internal.orm_models import OutboxEvent
+from internal.storage import PostgresClient
+
+__all__ = ("OutboxWorker",)
+
+# gets the topic and payload of an event, runs again if it raises
+Handler: TypeAlias = Callable[[str, dict], Awaitable[None]]
+
+
+class OutboxWorker:
+    """runs the handlers of committed outbox events in the background.
+
+    Events are claimed batch_size at a time, in id order, by pushing
+    their available_at lease seconds ahead, so a worker that dies
+    mid-batch leaves them to be claimed again once the lease is over;
+    with several workers SKIP LOCKED keeps them from claiming the same
+    events. Handled events are deleted. A failed one is retried after
+    backoff seconds, doubling up to max_backoff, and is left in the table
+    after max_attempts. Delivery is at least once, handlers must be
+    idempotent.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        poll_interval: float = 5.0,
+        lease: float = 60.0,
+        backoff: float = 1.0,
+        max_backoff: float = 300.0,
+        max_attempts: int = 10,
+    ):
+        self._handlers: defaultdict[str, list[Handler]] = defaultdict(list)
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._lease = lease
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._max_attempts = max_attempts
+        self._wake = asyncio.Event()
+        self._retry_in: float | None = None  # seconds, the soonest retry
+        self._task: asyncio.Task | None = None
+        self.handled = 0
+        self.failed = 0
+        self.given_up = 0
+
+    def register(self, topic: str, handler: Handler) -> None:
+        self._handlers[topic].append(handler)
+
+    def handles(self, topic: str) -> bool:
+        """whether events of topic have a handler, others aren't written"""
+        return bool(self._handlers.get(topic))
+
+    def notify(self) -> None:
+        """there are new events, called after commits that wrote some"""
+        self._wake.set()
+
+    async def start(self, client: PostgresClient) -> None:
+        """does nothing without handlers: no events are written then, and
+        polling for them would only cost a query every poll_interval"""
+        if not any(self._handlers.values()):
+            return
+        self._task = asyncio.create_task(self._run(client=client))
+
+    async def stop(self) -> None:
+        """events it didn't get to stay in the table for the next start"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self, client: PostgresClient) -> None:
+        errors = 0  # in a row
+        while True:
+            self._wake.clear()
+            try:
+                claimed = await self.drain(client=client)
+            except Exception as e:
+                # whatever it was, the task must outlive it: a dead one
+                # leaves every later event in the table until a restart
+                errors += 1
+                delay = self._delay(attempts=errors)
+                logger.error(
+                    msg="failed to drain outbox",
+                    exc_info=str(e),
+                    extra={"retry_in": delay},
+                )
+                await asyncio.sleep(delay)
+                continue
+            errors = 0
+            if claimed < self._batch_size:  # caught up
+                timeout = self._poll_interval
+                if self._retry_in is not None:
+                    timeout = min(timeout, self._retry_in)
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain(self, client: PostgresClient) -> int:
+        """handles one batch of due events, returns how many there were"""
+        self._retry_in = None
+        async with client.session as session:
+            events = (await session.execute(self._claim())).all()
+            await session.commit()
+            if not events:
+                return 0
+
+            done, failures = [], []
+            for event in sorted(events, key=lambda event: event.id):
+                try:
+                    for handler in self._handlers.get(event.topic, ()):
+                        await handler(event.topic, event.payload)
+                except Exception as e:
+                    failures.append(self._failure(event=event, error=e))
+                else:
+                    done.append(event.id)
+
+            if done:
+                await session.execute(
+                    delete(OutboxEvent).where(OutboxEvent.id.in_(done))
+                )
+            if failures:
+                await session.execute(update(OutboxEvent), failures)
+            await session.commit()
+        self.handled += len(done)
+        self.failed += len(failures)
+        return len(events)
+
+    def _claim(self):
+        now = datetime.now(timezone.utc)
+        due = (
+            select(OutboxEvent.id)
+            .where(
+                OutboxEvent.available_at <= now,
+                OutboxEvent.attempts < self._max_attempts,
+            )
+            .order_by(OutboxEvent.id)
+            .limit(self._batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        return (
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_(due.scalar_subquery()))
+            .values(
+                available_at=now + timedelta(seconds=self._lease),
+                attempts=OutboxEvent.attempts + 1,
+            )
+            .returning(
+                OutboxEvent.id,
+                OutboxEvent.topic,
+                OutboxEvent.payload,
+                OutboxEvent.attempts,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def _delay(self, attempts: int) -> float:
+        return min(self._max_backoff, self._backoff * 2 ** (attempts - 1))
+
+    def _failure(self, event, error: Exception) -> dict:
+        delay = self._delay(attempts=event.attempts)
+        extra = {"id": event.id, "topic": event.topic}
+        if event.attempts >= self._max_attempts:
+            self.given_up += 1
+            logger.error(
+                msg="outbox event given up on", exc_info=str(error), extra=extra
+            )
+        else:
+            logger.warning(
+                msg="outbox event failed, retrying",
+                exc_info=str(error),
+                extra=extra,
+            )
+            if self._retry_in is None or delay < self._retry_in:
+                self._retry_in = delay
+        return {
+            "id": event.id,
+            "available_at": (
+                datetime.now(timezone.utc) + timedelta(seconds=delay)
+            ),
+            "last_error": str(error),
+        }
@@ -1,9 +1,12 @@
 __all__ = (
+    "BreedCache",
+    "breed_cache",
     "BreedRepo",
     "KittenRepo",
     "SqlAlchemyRepo",
 )
 
+from .breed_cache import BreedCache, breed_cache
 from .breed_repo import BreedRepo
 from .kitten_repo import KittenRepo
 from .sqlalchemy_repo import SqlAlchemyRepo
@@ -0,0 +1,74 @@
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from common.config import settings
+
+__all__ = ("BreedCache", "breed_cache")
+
+
+class BreedCache:
+    """process-local breed name <-> id map, bounded by ttl and max size"""
+
+    def __init__(
+        self,
+        ttl: float,
+        max_size: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._ttl = ttl
+        self._max_size = max_size
+        self._clock = clock
+        # name -> (id, expires_at), least recently used first
+        self._by_name: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._by_id: dict[int, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_id(self, name: str) -> int | None:
+        entry = self._by_name.get(name)
+        if entry is None or entry[1] <= self._clock():
+            if entry is not None:
+                self._evict(name=name)
+            self.misses += 1
+            return None
+        self._by_name.move_to_end(name)
+        self.hits += 1
+        return entry[0]
+
+    def get_name(self, id: int) -> str | None:
+        name = self._by_id.get(id)
+        if name is None:
+            self.misses += 1
+            return None
+        if self.get_id(name=name) is None:  # expired, counted as a miss
+            return None
+        return name
+
+    def put(self, id: int, name: str) -> None:
+        if name in self._by_name:
+            self._evict(name=name)
+        self._by_name[name] = (id, self._clock() + self._ttl)
+        self._by_id[id] = name
+        while len(self._by_name) > self._max_size:
+            self._evict(name=next(iter(self._by_name)))
+
+    def invalidate(self) -> None:
+        self._by_name.clear()
+        self._by_id.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._by_name),
+        }
+
+    def _evict(self, name: str) -> None:
+        id, _ = self._by_name.pop(name)
+        self._by_id.pop(id, None)
+
+
+breed_cache = BreedCache(
+    ttl=settings.BREED_CACHE_TTL, max_size=settings.BREED_CACHE_MAX_SIZE
+)
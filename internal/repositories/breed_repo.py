@@ -1,27 +1,59 @@
+from fastapi import Depends
 from sqlalchemy import select
-from typing_extensions import Union
+from sqlalchemy.exc import SQLAlchemyError
 
-from common.exceptions import NotFoundError
+from common.exceptions import DBError, NotFoundError
 from internal.orm_models.breed import Breed
 
-from ..storage import db_client
+from ..storage import UnitOfWork, get_uow
+from .breed_cache import breed_cache
 from .sqlalchemy_repo import SqlAlchemyRepo
 
 
 class BreedRepo(SqlAlchemyRepo):
-    def __init__(self):
-        super().__init__(model=Breed)
-
-    async def get_breed_by_name(
-        self, name: str
-    ) -> Breed:
-        async with db_client.session as session:
-            stmt = select(Breed).where(Breed.name == name)
-
-            breed: Union[Breed, None] = (
-                await session.execute(stmt)
-            ).scalar_one_or_none()
-
-            if not breed:
-                raise NotFoundError(entity="Breed")
-            return breed
+    topic = "breed"
+
+    def __init__(self, uow: UnitOfWork = Depends(get_uow)):
+        super().__init__(model=Breed, uow=uow)
+
+    def get_cached_breed_id(self, name: str) -> int | None:
+        """the id if the breed cache has it, without a query"""
+        return breed_cache.get_id(name=name)
+
+    async def get_breed_id_by_name(self, name: str) -> int:
+        breed_id = breed_cache.get_id(name=name)
+        if breed_id is not None:
+            return breed_id
+        breed_ids = await self._load_breed_ids(names={name})
+        if name not in breed_ids:
+            raise NotFoundError(entity="Breed")
+        return breed_ids[name]
+
+    async def get_breed_ids_by_names(
+        self, names: set[str]
+    ) -> dict[str, int]:
+        breed_ids: dict[str, int] = {}
+        for name in names:
+            breed_id = breed_cache.get_id(name=name)
+            if breed_id is not None:
+                breed_ids[name] = breed_id
+        missing = names - breed_ids.keys()
+        if missing:
+            breed_ids.update(await self._load_breed_ids(names=missing))
+        return breed_ids
+
+    async def _load_breed_ids(self, names: set[str]) -> dict[str, int]:
+        stmt = select(Breed.name, Breed.id).where(Breed.name.in_(names))
+        try:
+            # primary: these ids feed writes, which a lagging replica
+            # could fail with "breed wasn't found"
+            session = await self._uow.session()
+            rows = (await session.execute(stmt)).all()
+        except SQLAlchemyError as e:
+            raise DBError(detail=str(e))
+        for name, id in rows:
+            breed_cache.put(id=id, name=name)
+        return {name: id for name, id in rows}
+
+    def invalidate_cache(self) -> None:
+        breed_cache.invalidate()
@@ -1,52 +1,390 @@
-from sqlalchemy import select
+import re
+from operator import itemgetter
+from typing import Any, AsyncIterator, Collection, Iterable
+
+from fastapi import Depends
+from sqlalchemy import (
+    ColumnElement,
+    Row,
+    ScalarSelect,
+    Select,
+    and_,
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+    tuple_,
+    update,
+)
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import joinedload
 
-from common.exceptions import DBError, NotFoundError
+from common.exceptions import DBError, NotFoundError, VersionMismatchError
 from internal.orm_models.breed import Breed
 from internal.orm_models.kitten import Kitten
-from internal.storage import db_client
+from internal.storage import UnitOfWork, get_db_client, get_uow
 
 from .sqlalchemy_repo import SqlAlchemyRepo
 
+KITTEN_COLUMNS = {
+    "id": Kitten.id,
+    "color": Kitten.color,
+    "age": Kitten.age,
+    "description": Kitten.description,
+    "breed": Breed.name,
+}
+
+
+def _select_rows(names: Iterable[str]) -> Select:
+    """plain column select of kittens, joins breeds only if it is needed"""
+    stmt = select(*(KITTEN_COLUMNS[name].label(name) for name in names))
+    if "breed" in names:
+        stmt = stmt.select_from(Kitten).outerjoin(Kitten.breed)
+    return stmt
+
+
+def _breed_name(breed_id: ColumnElement[int]) -> ScalarSelect:
+    return select(Breed.name).where(Breed.id == breed_id).scalar_subquery()
+
 
 class KittenRepo(SqlAlchemyRepo):
-    def __init__(self):
-        super().__init__(model=Kitten)
+    topic = "kitten"
 
-    async def get_kittens_by_breed(
-        self, breed_name: str
-    ) -> list[Kitten]:
-        stmt = (
-            select(Kitten, Breed)
-            .join(Breed, Kitten.breed_id == Breed.id)
-            .where(Breed.name == breed_name)
-        ).options(
-            joinedload(Kitten.breed)
+    def __init__(self, uow: UnitOfWork = Depends(get_uow)):
+        super().__init__(model=Kitten, uow=uow)
+
+    async def find_kittens(
+        self,
+        fields: Iterable[str] = KITTEN_COLUMNS,
+        breed_id: int | None = None,
+        breed_name: str | None = None,
+        color: str | None = None,
+        age_min: int | None = None,
+        age_max: int | None = None,
+        description: str | None = None,
+        sort: str = "id",
+        limit: int | None = None,
+        after: tuple[Any, int] | None = None,
+    ) -> list[Row]:
+        """filters, sorts and pages kittens in one statement, fetching
+        only the requested columns (plus id and the sort key).
+
+        sort is a column name, "-" prefixed for descending order; after is
+        the (sort key, id) of the last row of the previous page.
+
+        breed_name filters by a breed that isn't known to exist yet: the
+        kittens are left joined to it, so the same statement raises
+        NotFoundError for a missing breed and returns [] for a breed
+        without (matching) kittens.
+        """
+        key, descending = sort.removeprefix("-"), sort.startswith("-")
+        names = dict.fromkeys(("id", key, *fields))
+        conditions = []
+
+        if breed_id is not None:
+            conditions.append(Kitten.breed_id == breed_id)
+        if color is not None:
+            conditions.append(Kitten.color == color)
+        if age_min is not None:
+            conditions.append(Kitten.age >= age_min)
+        if age_max is not None:
+            conditions.append(Kitten.age <= age_max)
+        if description:
+            pattern = re.sub(r"([\\%_])", r"\\\1", description)
+            conditions.append(
+                Kitten.description.ilike(f"%{pattern}%", escape="\\")
+            )
+
+        if key == "id":
+            order = [Kitten.id]
+        else:
+            order = [KITTEN_COLUMNS[key], Kitten.id]
+        if after is not None:
+            # a row value comparison keeps (key, id) pages on the index
+            position, last = (
+                (Kitten.id, after[1]) if key == "id"
+                else (tuple_(*order), tuple_(*after))
+            )
+            conditions.append(
+                position < last if descending else position > last
+            )
+
+        if breed_name is None:
+            stmt = _select_rows(names).where(*conditions)
+        else:
+            # the kitten filters belong to the join, so that a breed row
+            # is left even if no kitten matches
+            stmt = (
+                select(*(KITTEN_COLUMNS[name].label(name) for name in names))
+                .select_from(Breed)
+                .outerjoin(
+                    Kitten, and_(Kitten.breed_id == Breed.id, *conditions)
+                )
+                .where(Breed.name == breed_name)
+            )
+        stmt = stmt.order_by(
+            *(col.desc() if descending else col.asc() for col in order)
         )
-        async with db_client.session as session:
-            kittens = (await session.scalars(stmt)).all()
-            return list(kittens)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        session = await self._uow.read_session()
+        try:
+            rows = list((await session.execute(stmt)).all())
+        except SQLAlchemyError as e:
+            raise DBError(detail=str(e))
+        if breed_name is not None:
+            if not rows:
+                raise NotFoundError(entity="Breed")
+            if rows[0].id is None:  # the breed, joined to no kitten
+                return []
+        return rows
+
+    async def stream_kittens(
+        self, breed_name: str | None, batch_size: int
+    ) -> AsyncIterator[list[Row]]:
+        """yields kitten rows in batches from a server-side cursor.
 
-    async def get_all_kittens(self):
-        stmt = select(self._orm_model).options(
-            joinedload(Kitten.breed)
+        Uses its own session: the response is streamed after the request
+        scoped unit of work has already been closed.
+        """
+        stmt = (
+            _select_rows(KITTEN_COLUMNS)
+            .order_by(Kitten.id)
+            .execution_options(yield_per=batch_size)
         )
-        async with db_client.session as session:
+        if breed_name:
+            stmt = stmt.where(Breed.name == breed_name)
+
+        async with get_db_client().read_session() as session:
             try:
-                res = (await session.scalars(stmt)).all()
+                res = await session.stream(stmt)
+                async for batch in res.partitions(batch_size):
+                    yield list(batch)
             except SQLAlchemyError as e:
                 raise DBError(detail=str(e))
-            return list(res)
 
-    async def get_kitten_by_id(self, id: int) -> Kitten:
-        stmt = select(Kitten).where(Kitten.id == id).options(
-            joinedload(Kitten.breed)
+    async def get_kitten_by_id(self, id: int) -> Row:
+        """the kitten's columns and its version"""
+        stmt = _select_rows(KITTEN_COLUMNS).add_columns(
+            Kitten.version.label("version")
+        ).where(Kitten.id == id)
+
+        session = await self._uow.read_session()
+        kitten = (await session.execute(stmt)).one_or_none()
+        if not kitten:
+            raise NotFoundError(entity="Kitten")
+
+        return kitten
+
+    async def update(
+        self,
+        instance_id: int,
+        data: dict,
+        expected_versions: Collection[int] | None = None,
+    ) -> Row:
+        """UPDATE ... RETURNING the kitten as get_kitten_by_id reads it, in
+        one statement that also bumps its version.
+
+        With expected_versions the kitten is only updated if its version
+        is one of them, VersionMismatchError otherwise. Telling that apart
+        from a missing kitten takes a second statement, on failure only.
+
+        old_breed, old_age and old_color are the values before the update,
+        read from the row locked by the same statement.
+        """
+        old = (
+            select(Kitten.id, Kitten.age, Kitten.color, Kitten.breed_id)
+            .where(Kitten.id == instance_id)
+            .with_for_update()
+            .subquery("old")
+        )
+        returning = {
+            **KITTEN_COLUMNS,
+            "breed": _breed_name(Kitten.breed_id),
+            "version": Kitten.version,
+            "old_breed": _breed_name(old.c.breed_id),
+            "old_age": old.c.age,
+            "old_color": old.c.color,
+        }
+        stmt = (
+            update(Kitten)
+            .where(Kitten.id == old.c.id)
+            .values(**data, version=Kitten.version + 1)
+            .returning(
+                *(column.label(name) for name, column in returning.items())
+            )
+            .execution_options(synchronize_session=False)
         )
+        if expected_versions is not None:
+            stmt = stmt.where(Kitten.version.in_(expected_versions))
 
-        async with db_client.session as session:
-            kitten = (await session.execute(stmt)).scalar_one_or_none()
-            if not kitten:
+        session = await self._uow.session()
+        try:
+            kitten = (await session.execute(stmt)).one_or_none()
+            if kitten is None:
+                version = await session.scalar(
+                    select(Kitten.version).where(Kitten.id == instance_id)
+                )
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise DBError(detail=str(e))
+        if kitten is None:
+            await session.rollback()
+            if version is None:
                 raise NotFoundError(entity="Kitten")
+            raise VersionMismatchError(entity="Kitten", version=version)
+        await self.commit(session=session, events=[
+            self._event("updated", {
+                name: kitten._mapping[name] for name in (
+                    *KITTEN_COLUMNS, "version"
+                )
+            }),
+        ])
+        return kitten
 
-            return kitten
+    async def delete(self, id: int) -> Row:
+        """DELETE ... RETURNING the breed name, age, color and version of
+        the kitten"""
+        stmt = delete(Kitten).where(Kitten.id == id).returning(
+            _breed_name(Kitten.breed_id).label("breed"),
+            Kitten.age.label("age"),
+            Kitten.color.label("color"),
+            Kitten.version.label("version"),
+        )
+
+        session = await self._uow.session()
+        try:
+            kitten = (await session.execute(stmt)).one_or_none()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise DBError(detail=str(e))
+        if kitten is None:
+            raise NotFoundError(entity="Kitten")
+        await self.commit(session=session, events=[
+            self._event("deleted", {"id": id}),
+        ])
+        return kitten
+
+    async def count_kittens(self) -> list[Row]:
+        """(breed name, age, color, count) for every combination in use,
+        a single GROUP BY that KittenStats sums up per breed, age and
+        color. The breed name is None for kittens without a breed."""
+        stmt = (
+            select(Breed.name, Kitten.age, Kitten.color, func.count())
+            .select_from(Kitten)
+            .outerjoin(Kitten.breed)
+            .group_by(Breed.name, Kitten.age, Kitten.color)
+        )
+
+        session = await self._uow.read_session()
+        try:
+            return list((await session.execute(stmt)).all())
+        except SQLAlchemyError as e:
+            raise DBError(detail=str(e))
+
+    async def create_with_breed(self, data: dict, breed_name: str) -> int:
+        """resolves breed id inside the insert itself:
+        INSERT ... SELECT ..., breeds.id FROM breeds WHERE name = ...
+        RETURNING id"""
+        columns = Kitten.__table__.c
+        values = select(
+            *(literal(value, type_=columns[key].type)
+              for key, value in data.items()),
+            Breed.id,
+        ).where(Breed.name == breed_name)
+        stmt = insert(Kitten).from_select(
+            [*data, "breed_id"], values
+        ).returning(Kitten.id)
+
+        session = await self._uow.session()
+        try:
+            instance_id = (await session.execute(stmt)).scalar_one_or_none()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise DBError(detail=str(e))
+        if instance_id is None:
+            raise NotFoundError(entity="Breed")
+        await self.commit(session=session, events=[
+            self._event("created", {
+                "id": instance_id, **data, "breed": breed_name
+            }),
+        ])
+        return instance_id
+
+    async def bulk_create(self, rows: list[dict]) -> list[int]:
+        """inserts all rows with one multi-row INSERT ... RETURNING"""
+        stmt = (
+            insert(Kitten)
+            .returning(Kitten.id, sort_by_parameter_order=True)
+            # the orm leaves None values out and splits the rows into an
+            # INSERT per set of keys
+            .execution_options(render_nulls=True)
+        )
+        session = await self._uow.session()
+        try:
+            ids = (await session.scalars(stmt, rows)).all()
+        except SQLAlchemyError as e:
+            await session.rollback()  # the next batch starts clean
+            raise DBError(detail=str(e))
+        await self.commit(session=session, events=(
+            self._event("created", {"id": id, **row})
+            for id, row in zip(ids, rows)
+        ))
+        return list(ids)
+
+    async def bulk_update(self, rows: list[dict]) -> dict[int, int]:
+        """updates rows by primary key in one transaction,
+        returns the new versions of the rows that exist by id"""
+        ids = {row["id"] for row in rows}
+        versions: dict[int, int] = {}
+        session = await self._uow.session()
+        try:
+            existing_ids = set(
+                (
+                    await session.scalars(
+                        select(Kitten.id).where(Kitten.id.in_(ids))
+                    )
+                ).all()
+            )
+            rows = [row for row in rows if row["id"] in existing_ids]
+            if rows:
+                # same lock order in every transaction, so concurrent
+                # bulk updates of overlapping ids can't deadlock
+                await session.execute(
+                    update(Kitten), sorted(rows, key=itemgetter("id"))
+                )
+                # the by-primary-key form takes values only, not the
+                # version + 1 expression
+                versions = dict((
+                    await session.execute(
+                        update(Kitten)
+                        .where(Kitten.id.in_(existing_ids))
+                        .values(version=Kitten.version + 1)
+                        .returning(Kitten.id, Kitten.version)
+                        .execution_options(synchronize_session=False)
+                    )
+                ).all())
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise DBError(detail=str(e))
+        await self.commit(session=session, events=(
+            self._event("updated", {"id": row["id"]}) for row in rows
+        ))
+        return {row["id"]: versions[row["id"]] for row in rows}
+
+    async def bulk_delete(self, ids: list[int]) -> dict[int, int]:
+        """returns the versions of the deleted rows by id"""
+        stmt = delete(Kitten).where(Kitten.id.in_(ids)).returning(
+            Kitten.id, Kitten.version
+        )
+        session = await self._uow.session()
+        try:
+            versions = dict((await session.execute(stmt)).all())
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise DBError(detail=str(e))
+        await self.commit(session=session, events=(
+            self._event("deleted", {"id": id}) for id in versions
+        ))
+        return versions
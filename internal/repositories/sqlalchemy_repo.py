@@ -1,12 +1,15 @@
-from typing import Generic, Type, TypeVar
+import inspect
+from typing import Generic, Iterable, Type, TypeVar
 
-from sqlalchemy import select, update
+from sqlalchemy import Select, delete, insert, select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from common.exceptions import DBError, ModelConversionError, NotFoundError
-from internal.orm_models import Breed, Kitten
-from internal.storage import db_client
+from internal.metrics import labelled
+from internal.orm_models import Breed, Kitten, OutboxEvent
+from internal.outbox import outbox
+from internal.storage import UnitOfWork
 
 __all__ = "SqlAlchemyRepo"
 
@@ -15,65 +18,108 @@ ModelDataT = TypeVar("ModelDataT", Kitten, Breed)
 
 
 class SqlAlchemyRepo(Generic[ModelDataT]):
-    def __init__(self, model: Type[ModelDataT]):
+    topic: str  # outbox events are "<topic>.created" and so on
+
+    def __init_subclass__(cls, **kwargs):
+        """labels the queries of every public method, inherited ones
+        included, with e.g. "KittenRepo.find_kittens" for the metrics"""
+        super().__init_subclass__(**kwargs)
+        for name, method in inspect.getmembers(cls, inspect.isfunction):
+            method = inspect.unwrap(method)
+            if not name.startswith("_") and (
+                inspect.iscoroutinefunction(method)
+                or inspect.isasyncgenfunction(method)
+            ):
+                setattr(cls, name, labelled(f"{cls.__name__}.{name}")(method))
+
+    def __init__(self, model: Type[ModelDataT], uow: UnitOfWork):
         self._orm_model = model
-
-    async def get_all(self) -> list[ModelDataT]:
-        async with db_client.session as session:
-            stmt = select(self._orm_model)
-            try:
-                res = (await session.scalars(stmt)).all()
-            except SQLAlchemyError as e:
-                raise DBError(
-                    detail=str(e)
-                )
-            return list(res)
-
-    async def __get_by_id(self, id: int) -> ModelDataT:
-        async with db_client.session as session:
-            stmt = select(self._orm_model).where(self._orm_model.id == id)
-            res = (await session.execute(stmt)).scalar_one_or_none()
-            if res is None:
-                raise NotFoundError(entity="Kitten")
-            return res
+        self._uow = uow
+
+    async def get_all(
+        self, limit: int | None = None, after_id: int | None = None
+    ) -> list[ModelDataT]:
+        session = await self._uow.read_session()
+        stmt = self._keyset(
+            select(self._orm_model), limit=limit, after_id=after_id
+        )
+        try:
+            res = (await session.scalars(stmt)).all()
+        except SQLAlchemyError as e:
+            raise DBError(
+                detail=str(e)
+            )
+        return list(res)
+
+    def _keyset(
+        self, stmt: Select, limit: int | None, after_id: int | None
+    ) -> Select:
+        """orders by id and seeks past after_id instead of using offset"""
+        stmt = stmt.order_by(self._orm_model.id)
+        if after_id is not None:
+            stmt = stmt.where(self._orm_model.id > after_id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return stmt
 
     async def create(self, data: dict) -> int:
-        async with db_client.session as session:
-            try:
-                model = self._orm_model(**data)
-            except Exception as e:
-                raise ModelConversionError(detail=str(e))
-
-            session.add(model)
-            await self.commit(session=session)
-            return model.id
-
-    async def update(self, instance_id: int, data: dict) -> ModelDataT:
-        stmt = update(self._orm_model).where(
-            self._orm_model.id == instance_id
-        ).values(**data)
-
-        async with db_client.session as session:
-            _ = await session.execute(stmt)
-            await self.commit(session=session)
-            session.expire_all()
-
-            select_stmt = select(self._orm_model).where(
-                self._orm_model.id == instance_id
-            )
-            return (await session.execute(select_stmt)).scalar_one_or_none()
+        session = await self._uow.session()
+        try:
+            model = self._orm_model(**data)
+        except Exception as e:
+            raise ModelConversionError(detail=str(e))
 
-    async def delete(self, id: int) -> None:
-        obj = await self.__get_by_id(
-            id=id
-        )  # raises exc if obj doesn't exist
+        session.add(model)
+        try:
+            await session.flush()  # for the id
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise DBError(detail=str(e))
+        await self.commit(session=session, events=[
+            self._event("created", {"id": model.id, **data}),
+        ])
+        return model.id
 
-        async with db_client.session as session:
-            await session.delete(obj)
-            await self.commit(session=session)
+    async def delete(self, id: int) -> None:
+        stmt = delete(self._orm_model).where(
+            self._orm_model.id == id
+        ).returning(self._orm_model.id)
 
-    async def commit(self, session: AsyncSession):
+        session = await self._uow.session()
         try:
+            deleted_id = (await session.execute(stmt)).scalar_one_or_none()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise DBError(detail=str(e))
+        if deleted_id is None:
+            raise NotFoundError(entity="Kitten")
+        await self.commit(session=session, events=[
+            self._event("deleted", {"id": id}),
+        ])
+
+    def _event(self, change: str, payload: dict) -> dict:
+        return {"topic": f"{self.topic}.{change}", "payload": payload}
+
+    async def commit(
+        self, session: AsyncSession, events: Iterable[dict] = ()
+    ):
+        """commits, together with the outbox events of the write, which
+        OutboxWorker runs once it's committed; events of topics without
+        a handler aren't written"""
+        self._uow.mark_written()  # following reads must see this write
+        events = [event for event in events if outbox.handles(event["topic"])]
+        try:
+            if events:
+                # core, the orm's insert would return the ids
+                await session.execute(
+                    insert(OutboxEvent.__table__), events
+                )
             await session.commit()
         except SQLAlchemyError as e:
+            await session.rollback()
             raise DBError(detail=str(e))
+        if events:
+            outbox.notify()
+        # the session lives for the whole request, later reads in it
+        # must not be served stale objects from the identity map
+        session.expunge_all()
@@ -3,24 +3,53 @@ from contextlib import asynccontextmanager
 import uvicorn
 from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from common.config import settings
 from common.logger import logger
+from internal.changes import PostgresRelay, change_bus
 from internal.handlers import breeds_router, kittens_router
-from internal.orm_models import Base
-from internal.storage import db_client
+from internal.metrics import (
+    CONTENT_TYPE,
+    MetricsMiddleware,
+    StatementBudgetMiddleware,
+    instrument_db,
+    registry,
+)
+from internal.outbox import outbox
+from internal.services.serialization import default_response_class
+from internal.storage import get_db_client
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with db_client._engine.begin() as con:  # create tables
-        await con.run_sync(Base.metadata.drop_all)
-        await con.run_sync(Base.metadata.create_all)
-        logger.info(msg="tables have been created")
+    # the schema is python -m internal.migrate's job
+    db_client = get_db_client()  # creates the engines
+    if settings.METRICS_ENABLED or settings.QUERY_BUDGET_ENABLED:
+        instrument_db()
+    if settings.DB_WARM_UP:
+        await db_client.warm_up()  # the server listens only after this
+    relay = None
+    if (
+        settings.CHANGE_FEED_FANOUT
+        and db_client.engine.dialect.name == "postgresql"
+    ):
+        # every worker's kitten changes in every worker's GET /kittens/changes
+        relay = PostgresRelay(bus=change_bus, url=db_client.engine.url)
+        await relay.start()
+    # side effects of writes, also those a previous run didn't get to;
+    # only if a handler is registered
+    await outbox.start(client=db_client)
     yield
+    await outbox.stop()
+    if relay is not None:
+        await relay.stop()
+    await db_client.dispose()
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(
+    lifespan=lifespan, default_response_class=default_response_class()
+)
 
 for router in (kittens_router, breeds_router):
     app.include_router(router)
@@ -31,6 +60,18 @@ def home() -> dict:
     return {"message": "hello"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """prometheus metrics of this worker"""
+    return PlainTextResponse(content=registry.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/metrics/pool")
+def pool_metrics() -> dict:
+    """connection pool saturation and checkout waits of this worker"""
+    return get_db_client().pool_stats()
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -59,5 +100,16 @@ async def handle_errors(request: Request, call_next):
     return response
 
 
-if __name__ == "__main__":
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)  # outermost, sees the 500s too
+if settings.QUERY_BUDGET_ENABLED:
+    app.add_middleware(
+        StatementBudgetMiddleware,
+        max_statements=settings.QUERY_BUDGET_STATEMENTS,
+        max_seconds=settings.QUERY_BUDGET_SECONDS,
+        max_repeats=settings.QUERY_BUDGET_REPEATS,
+    )
+
+
+if __name__ == "__main__":  # development server, see internal.serve
     uvicorn.run("internal.run:app", reload=True)
@@ -3,7 +3,42 @@ __all__ = (
     "UpdateKittenS", "UpdateBreedS",
     "CreateBreedS", "ReturnBreedS",
     "KittenID", "BreedID",
+    "KittenPageS", "BreedPageS",
+    "ExportFormat", "MAX_BULK_ITEMS",
+    "BulkUpdateKittenS", "BulkDeleteKittenS",
+    "BulkItemErrorS", "BulkResultS",
+    "KittenFilterS", "KittenField", "KittenSort", "KITTEN_FIELDS",
+    "KittenStatsS", "BreedCountS", "AgeCountS", "ColorCountS",
+    "KittenChangeS", "KittenChangesS",
 )
 
-from .breed import BreedID, CreateBreedS, ReturnBreedS, UpdateBreedS
-from .kitten import CreateKittenS, KittenID, ReturnKittenS, UpdateKittenS
+from .breed import (
+    BreedID,
+    BreedPageS,
+    CreateBreedS,
+    ReturnBreedS,
+    UpdateBreedS,
+)
+from .kitten import (
+    KITTEN_FIELDS,
+    MAX_BULK_ITEMS,
+    AgeCountS,
+    BreedCountS,
+    BulkDeleteKittenS,
+    BulkItemErrorS,
+    BulkResultS,
+    BulkUpdateKittenS,
+    ColorCountS,
+    CreateKittenS,
+    ExportFormat,
+    KittenChangeS,
+    KittenChangesS,
+    KittenField,
+    KittenFilterS,
+    KittenID,
+    KittenPageS,
+    KittenSort,
+    KittenStatsS,
+    ReturnKittenS,
+    UpdateKittenS,
+)
@@ -17,3 +17,7 @@ class ReturnBreedS(BaseModel):
 class BreedID(BaseModel):
     instance_id: int
 
+
+class BreedPageS(BaseModel):
+    items: list[ReturnBreedS]
+    next_cursor: str | None = None
@@ -1,4 +1,15 @@
-from pydantic import BaseModel, ConfigDict, Field
+from typing import Literal, TypeAlias, get_args
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+ExportFormat: TypeAlias = Literal["ndjson", "json"]
+KittenField: TypeAlias = Literal["id", "color", "age", "description", "breed"]
+KittenSort: TypeAlias = Literal["id", "-id", "age", "-age", "color", "-color"]
+ChangeType: TypeAlias = Literal["created", "updated", "deleted"]
+
+KITTEN_FIELDS: tuple[KittenField, ...] = get_args(KittenField)
+
+MAX_BULK_ITEMS = 10_000
 
 
 class CreateKittenS(BaseModel):
@@ -26,3 +37,81 @@ class KittenID(BaseModel):
 
 class UpdateKittenS(CreateKittenS):
     pass
+
+
+class KittenFilterS(BaseModel):
+    color: str | None = None
+    age_min: int | None = Field(default=None, ge=0)
+    age_max: int | None = Field(default=None, ge=0)
+    q: str | None = Field(default=None, min_length=1)  # description search
+    sort: KittenSort = "id"
+    fields: tuple[KittenField, ...] = KITTEN_FIELDS
+
+    @model_validator(mode="after")
+    def check_age_range(self) -> "KittenFilterS":
+        if (self.age_min is not None and self.age_max is not None
+                and self.age_min > self.age_max):
+            raise ValueError("age_min must not be greater than age_max")
+        return self
+
+
+class KittenPageS(BaseModel):
+    items: list[ReturnKittenS]
+    next_cursor: str | None = None
+
+
+class BulkUpdateKittenS(UpdateKittenS):
+    id: int = Field(ge=0)
+
+
+class BulkDeleteKittenS(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class BulkItemErrorS(BaseModel):
+    index: int
+    detail: str
+
+
+class BulkResultS(BaseModel):
+    instance_ids: list[int]
+    errors: list[BulkItemErrorS]
+
+
+class BreedCountS(BaseModel):
+    breed: str  # "" for kittens without a breed
+    count: int
+
+
+class AgeCountS(BaseModel):
+    age: int
+    count: int
+
+
+class ColorCountS(BaseModel):
+    color: str
+    count: int
+
+
+class KittenStatsS(BaseModel):
+    total: int
+    breeds: list[BreedCountS]
+    ages: list[AgeCountS]
+    top_colors: list[ColorCountS]  # most common first
+
+
+class KittenChangeS(BaseModel):
+    seq: int
+    type: ChangeType
+    id: int
+    # the kitten's after the change, one more than the last for deletes;
+    # seqs of one kitten's changes can be out of order across workers,
+    # a change with a lower version than one already seen is older
+    version: int
+    # after the change; null for deletes, bulk updates and big kittens
+    kitten: ReturnKittenS | None
+
+
+class KittenChangesS(BaseModel):
+    changes: list[KittenChangeS]
+    last_seq: int  # since of the next poll
@@ -0,0 +1,52 @@
+"""production server:
+
+    python -m internal.serve
+
+runs SERVER_WORKERS uvicorn processes on one listening socket, each with
+its own event loop, DB pool, caches and /metrics. SIGTERM or SIGINT stop
+them taking connections and give the requests in flight
+SERVER_GRACEFUL_TIMEOUT seconds. A worker takes requests once its pool
+is warm (DB_WARM_UP), the supervisor restarts workers that die. More
+than one worker needs a shared response cache, CACHE_BACKEND=redis or
+none: a write only clears the memory cache of the worker that took it.
+
+Migrate the database with python -m internal.migrate first.
+"""
+import os
+
+import uvicorn
+
+from common.config import settings
+
+
+def worker_count() -> int:
+    return settings.SERVER_WORKERS or os.cpu_count() or 1
+
+
+def check_settings(workers: int) -> None:
+    if workers != 1 and settings.CACHE_BACKEND == "memory":
+        raise RuntimeError(
+            f"CACHE_BACKEND=memory with {workers} workers would serve what"
+            " other workers' writes changed until CACHE_TTL, use redis"
+        )
+
+
+def main() -> None:
+    check_settings(workers=worker_count())
+    uvicorn.run(
+        "internal.run:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=worker_count(),
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEP_ALIVE,
+        limit_concurrency=settings.SERVER_LIMIT_CONCURRENCY,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+        access_log=settings.SERVER_ACCESS_LOG,
+    )
+
+
+if __name__ == "__main__":
+    main()
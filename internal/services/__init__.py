@@ -1,6 +1,10 @@
 __all__ = (
     "BreedService",
     "KittenService",
+    "KittenStats",
+    "kitten_stats",
+    "get_kitten_stats",
 )
 from .breed import BreedService
 from .kitten import KittenService
+from .stats import KittenStats, get_kitten_stats, kitten_stats
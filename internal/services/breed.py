@@ -1,30 +1,98 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import Depends
 
 from common.exceptions import AlreadyExistsError, BadRequestError, DBError
 from common.logger import logger
+from internal.cache import CachedResponse, ResponseCache, get_response_cache
+from internal.orm_models import Breed
 from internal.repositories import BreedRepo
-from internal.schemas import BreedID, CreateBreedS, ReturnBreedS
+from internal.schemas import BreedID, BreedPageS, CreateBreedS, ReturnBreedS
+from internal.storage import UnitOfWork, get_db_client
+
+from .pagination import DEFAULT_PAGE_SIZE, decode_cursor, paginate
+from .serialization import dumps
+
+BREED_LISTS = "breeds:lists"  # cache namespace of all list pages
 
 
 class BreedService:
-    def __init__(self, breed_repo: BreedRepo = Depends()):
+    def __init__(
+            self,
+            breed_repo: BreedRepo = Depends(),
+            cache: ResponseCache = Depends(get_response_cache),
+    ):
         self._breed_repo: BreedRepo = breed_repo
+        self._cache: ResponseCache = cache
 
-    async def get_breeds(self) -> list[ReturnBreedS]:
+    @asynccontextmanager
+    async def _loading(self) -> AsyncIterator["BreedService"]:
+        """this service on a unit of work of its own and reading from the
+        primary, for cache loads, see KittenService._loading"""
+        uow = UnitOfWork(client=get_db_client(), primary_reads=True)
         try:
-            breeds = await self._breed_repo.get_all()
-            return [
+            yield BreedService(breed_repo=BreedRepo(uow=uow), cache=self._cache)
+        finally:
+            await uow.close()
+
+    async def get_breeds_json(
+            self,
+            limit: int = DEFAULT_PAGE_SIZE,
+            after: str | None = None,
+    ) -> CachedResponse:
+        """cached, already serialized get_breeds"""
+        version = await self._cache.version(namespace=BREED_LISTS)
+
+        async def render() -> bytes:
+            async with self._loading() as service:
+                breeds, next_cursor = await service._find_page(
+                    limit=limit, after=after
+                )
+            return dumps({
+                "items": [
+                    {"instance_id": breed.id, "name": breed.name}
+                    for breed in breeds
+                ],
+                "next_cursor": next_cursor,
+            })
+
+        return await self._cache.get_or_load(
+            key=f"{BREED_LISTS}:{version}:{limit}:{after or ''}",
+            loader=render,
+        )
+
+    async def get_breeds(
+            self,
+            limit: int = DEFAULT_PAGE_SIZE,
+            after: str | None = None,
+    ) -> BreedPageS:
+        breeds, next_cursor = await self._find_page(limit=limit, after=after)
+        return BreedPageS(
+            items=[
                 ReturnBreedS(
                     instance_id=breed.id,
                     name=breed.name
                 ) for breed in breeds
-            ]
+            ],
+            next_cursor=next_cursor,
+        )
+
+    async def _find_page(
+            self, limit: int, after: str | None
+    ) -> tuple[list[Breed], str | None]:
+        after_id: int | None = decode_cursor(after)
+        try:
+            breeds = await self._breed_repo.get_all(
+                limit=limit + 1, after_id=after_id
+            )
         except DBError as e:
             logger.error(
                 msg="failed to get breeds",
                 exc_info=str(e),
             )
             raise e
+        return paginate(rows=breeds, limit=limit)
 
     async def create(self, create_dto: CreateBreedS) -> BreedID:
         create_data: dict = create_dto.model_dump(
@@ -38,11 +106,14 @@ class BreedService:
             instance_id: int = await self._breed_repo.create(
                 data=create_data
             )
-            return BreedID(
-                instance_id=instance_id
-            )
-        except (Exception, DBError) as e:
+        except DBError as e:
             logger.error(msg="failed to create breed", exc_info=str(e))
             raise AlreadyExistsError(
                 detail="Breed already exists"
-            )
\ No newline at end of file
+            )
+        # committed, a cache that fails now mustn't make it a 409
+        self._breed_repo.invalidate_cache()
+        await self._cache.bump(namespace=BREED_LISTS)
+        return BreedID(
+            instance_id=instance_id
+        )
\ No newline at end of file
@@ -1,104 +1,357 @@
-from typing import TypeAlias
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Collection, Iterable, TypeAlias
 
 from fastapi import Depends
+from sqlalchemy import Row
 
 from common.exceptions import (
     BadRequestError,
     DBError,
     EntityNotFoundError,
+    GoneError,
     NotFoundError,
+    PreconditionFailedError,
+    VersionMismatchError,
 )
 from common.logger import logger
-from internal.entities import KittenE
-from internal.orm_models import Breed
-from internal.orm_models.kitten import Kitten
+from internal.cache import CachedResponse, ResponseCache, get_response_cache
+from internal.changes import ChangeBus, Subscription, get_change_bus
 from internal.repositories import BreedRepo, KittenRepo
 from internal.schemas import (
+    KITTEN_FIELDS,
+    BulkItemErrorS,
+    BulkResultS,
+    BulkUpdateKittenS,
     CreateKittenS,
+    ExportFormat,
+    KittenChangesS,
+    KittenFilterS,
     KittenID,
+    KittenPageS,
+    KittenStatsS,
     ReturnKittenS,
     UpdateKittenS,
 )
+from internal.storage import UnitOfWork, get_db_client
+
+from .pagination import DEFAULT_PAGE_SIZE, decode_keyset_cursor, paginate
+from .serialization import dumps
+from .stats import KittenStats, get_kitten_stats
 
 KittenId: TypeAlias = int
 
+EXPORT_BATCH_SIZE = 500
+BULK_BATCH_SIZE = 1000
+
+KITTEN_LISTS = "kittens:lists"  # cache namespace of all list pages
+SORT_KEY_TYPES = {"id": int, "age": int, "color": str}
+FIRST_VERSION = 1  # of a new kitten, the server default of its column
+
+
+def kitten_cache_key(id: int) -> str:
+    return f"kittens:{id}"
+
+
+def kitten_etag(version: int) -> str:
+    return f'"v{version}"'
+
+
+def sse_event(id: int, event: str, data: bytes) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (id, event.encode(), data)
+
+
+def kitten_version(etag: str) -> int | None:
+    """the version in a kitten_etag, None for any other etag"""
+    if etag.startswith('"v') and etag.endswith('"') and etag[2:-1].isdigit():
+        return int(etag[2:-1])
+    return None
+
 
 class KittenService:
     def __init__(
             self,
             kitten_repo: KittenRepo = Depends(),
             breed_repo: BreedRepo = Depends(),
+            cache: ResponseCache = Depends(get_response_cache),
+            stats: KittenStats = Depends(get_kitten_stats),
+            changes: ChangeBus = Depends(get_change_bus),
     ):
         self._kitten_repo: KittenRepo = kitten_repo
         self._breed_repo: BreedRepo = breed_repo
+        self._cache: ResponseCache = cache
+        self._stats: KittenStats = stats
+        self._changes: ChangeBus = changes
 
-    async def get_all_kittens(self, breed: str | None) -> list[ReturnKittenS]:
-        if breed:
-            return await self.get_kittens_by_breed(breed_name=breed)
+    @staticmethod
+    def _row_to_dict(
+            row: Row, fields: Iterable[str] = KITTEN_FIELDS
+    ) -> dict:
+        kitten = row._mapping
+        values = {name: kitten[name] for name in fields}
+        if "breed" in values:
+            values["breed"] = values["breed"] or ""
+        return values
+
+    @staticmethod
+    def _dto_to_dict(id: int, dto: CreateKittenS) -> dict:
+        return {
+            "id": id,
+            "color": dto.color,
+            "age": dto.age,
+            "description": dto.description,
+            "breed": dto.breed or "",
+        }
+
+    @classmethod
+    def _row_to_return_dto(cls, row: Row) -> ReturnKittenS:
+        values = dict.fromkeys(KITTEN_FIELDS)
+        values.update(cls._row_to_dict(row=row, fields=row._fields))
+        return ReturnKittenS(**values)
+
+    async def _invalidate(self, *ids: int) -> None:
+        await self._cache.invalidate(*(kitten_cache_key(id=id) for id in ids))
+        await self._cache.bump(namespace=KITTEN_LISTS)
+
+    @asynccontextmanager
+    async def _loading(self) -> AsyncIterator["KittenService"]:
+        """this service on a unit of work of its own, for cache loads:
+        other requests wait on a load too, so it can't use the sessions
+        of the request that started it, which close if that one goes.
+        It reads from the primary, what it loads is served for CACHE_TTL
+        and must not come from a replica that hasn't got the last write
+        yet"""
+        uow = UnitOfWork(client=get_db_client(), primary_reads=True)
+        try:
+            yield KittenService(
+                kitten_repo=KittenRepo(uow=uow),
+                breed_repo=BreedRepo(uow=uow),
+                cache=self._cache,
+                stats=self._stats,
+                changes=self._changes,
+            )
+        finally:
+            await uow.close()
+
+    async def get_all_kittens_json(
+            self,
+            breed: str | None,
+            limit: int = DEFAULT_PAGE_SIZE,
+            after: str | None = None,
+            filters: KittenFilterS | None = None,
+    ) -> CachedResponse:
+        """cached, already serialized get_all_kittens,
+        items carry only the requested fields"""
+        filters = filters or KittenFilterS()
+        version = await self._cache.version(namespace=KITTEN_LISTS)
+        key = (
+            f"{KITTEN_LISTS}:{version}:{limit}:{after or ''}:{breed or ''}:"
+            f"{filters.model_dump_json()}"
+        )
+
+        async def render() -> bytes:
+            async with self._loading() as service:
+                rows, next_cursor = await service._find_page(
+                    breed=breed, limit=limit, after=after, filters=filters
+                )
+            return dumps({
+                "items": [
+                    self._row_to_dict(row=row, fields=filters.fields)
+                    for row in rows
+                ],
+                "next_cursor": next_cursor,
+            })
+
+        return await self._cache.get_or_load(key=key, loader=render)
+
+    async def get_kitten_json(self, id: int) -> CachedResponse:
+        """cached, already serialized get_kitten, its version is the etag"""
+        async def render() -> CachedResponse:
+            async with self._loading() as service:
+                row = await service._get_row(id=id)
+            return CachedResponse.from_body(
+                body=dumps(self._row_to_dict(row=row)),
+                etag=kitten_etag(version=row.version),
+            )
+
+        return await self._cache.get_or_load(
+            key=kitten_cache_key(id=id), loader=render
+        )
+
+    async def get_all_kittens(
+            self,
+            breed: str | None,
+            limit: int = DEFAULT_PAGE_SIZE,
+            after: str | None = None,
+            filters: KittenFilterS | None = None,
+    ) -> KittenPageS:
+        """fields left out of filters.fields are None in the items"""
+        rows, next_cursor = await self._find_page(
+            breed=breed, limit=limit, after=after,
+            filters=filters or KittenFilterS(),
+        )
+        res = [self._row_to_return_dto(row=row) for row in rows]
+        return KittenPageS(items=res, next_cursor=next_cursor)
+
+    async def _find_page(
+            self,
+            breed: str | None,
+            limit: int,
+            after: str | None,
+            filters: KittenFilterS,
+    ) -> tuple[list[Row], str | None]:
+        key = filters.sort.removeprefix("-")
+        position = decode_keyset_cursor(
+            after, key=key, type_=SORT_KEY_TYPES[key]
+        )
+        # a cached breed id spares the join, otherwise the listing itself
+        # finds out whether the breed exists
+        breed_id = (
+            self._breed_repo.get_cached_breed_id(name=breed) if breed else None
+        )
 
         try:
-            kittens = await self._kitten_repo.get_all_kittens()
+            rows = await self._kitten_repo.find_kittens(
+                fields=filters.fields,
+                breed_id=breed_id,
+                breed_name=breed if breed and breed_id is None else None,
+                color=filters.color,
+                age_min=filters.age_min,
+                age_max=filters.age_max,
+                description=filters.q,
+                sort=filters.sort,
+                limit=limit + 1,
+                after=position,
+            )
+        except NotFoundError as e:
+            raise EntityNotFoundError(detail=str(e))
         except DBError as e:
             logger.error(
                 msg="failed to get all kittens",
                 exc_info=str(e),
             )
             raise e
+        return paginate(rows=rows, limit=limit, key=key)
 
-        res = [
-            ReturnKittenS(
-                id=kitten.id,
-                color=kitten.color,
-                age=kitten.age,
-                description=kitten.description,
-                breed=getattr(kitten.breed, "name", None) or "",
+    async def get_stats(self, top_colors: int) -> KittenStatsS:
+        try:
+            summary = await self._stats.summary(
+                loader=self._kitten_repo.count_kittens, top_colors=top_colors
             )
-            for kitten in kittens
-        ]
-        return res
+        except DBError as e:
+            logger.error(msg="failed to count kittens", exc_info=str(e))
+            raise e
+        return KittenStatsS(**summary)
 
-    async def get_kittens_by_breed(
-            self, breed_name: str
-    ) -> list[ReturnKittenS]:
-        try:
-            await self._breed_repo.get_breed_by_name(
-                name=breed_name
+    async def get_changes(
+            self, since: int | None, wait: float, limit: int
+    ) -> KittenChangesS:
+        """long-poll: the changes after since, waiting up to wait seconds
+        for the first one; without since only the seq to start from"""
+        if since is None:
+            return KittenChangesS(changes=[], last_seq=self._changes.last_seq)
+        changes = await self._changes.wait(
+            since=since, timeout=wait, limit=limit
+        )
+        if changes is None:
+            raise GoneError(
+                detail=f"Changes since {since} are no longer kept, "
+                       "reload the kittens and poll without since"
             )
-        except NotFoundError as e:
-            raise EntityNotFoundError(detail=str(e))
-        try:
-            kittens = await self._kitten_repo.get_kittens_by_breed(
-                breed_name=breed_name
+        return KittenChangesS(
+            changes=[change.as_dict() for change in changes],
+            last_seq=changes[-1].seq if changes else since,
+        )
+
+    def watch_changes(
+            self, since: int | None, keep_alive: float
+    ) -> AsyncIterator[bytes]:
+        """server-sent events of the changes after since, or from now on.
+
+        A since that is too old gets a resync event first, the client
+        reloads the kittens and goes on with the stream. The stream ends
+        when the client falls behind, EventSource then reconnects with
+        the Last-Event-ID it got and is replayed what it missed.
+        """
+        subscription = self._changes.subscribe(since=since)
+        return self._change_events(
+            subscription=subscription, keep_alive=keep_alive
+        )
+
+    async def _change_events(
+            self, subscription: Subscription | None, keep_alive: float
+    ) -> AsyncIterator[bytes]:
+        if subscription is None:
+            subscription = self._changes.subscribe()
+            last_seq = self._changes.last_seq
+            yield sse_event(
+                id=last_seq, event="resync", data=dumps({"last_seq": last_seq})
             )
+        try:
+            while True:
+                try:
+                    change = await asyncio.wait_for(
+                        subscription.__anext__(), timeout=keep_alive
+                    )
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"  # through idle-closing proxies
+                    continue
+                except StopAsyncIteration:
+                    return
+                yield sse_event(
+                    id=change.seq, event=change.type,
+                    data=dumps(change.as_dict()),
+                )
+        finally:
+            self._changes.unsubscribe(subscription)
+
+    async def export_kittens(
+            self, breed: str | None, fmt: ExportFormat
+    ) -> AsyncIterator[bytes]:
+        """checks the breed up front, because once streaming has started
+        the status code can't be changed anymore"""
+        if breed:
+            try:
+                await self._breed_repo.get_breed_id_by_name(name=breed)
+            except NotFoundError as e:
+                raise EntityNotFoundError(detail=str(e))
+        return self._export_chunks(breed=breed, fmt=fmt)
+
+    async def _export_chunks(
+            self, breed: str | None, fmt: ExportFormat
+    ) -> AsyncIterator[bytes]:
+        separator = b"\n" if fmt == "ndjson" else b","
+        if fmt == "json":
+            yield b"["
+        first_batch = True
+        try:
+            async for rows in self._kitten_repo.stream_kittens(
+                breed_name=breed, batch_size=EXPORT_BATCH_SIZE
+            ):
+                chunk = separator.join(
+                    dumps(self._row_to_dict(row=row)) for row in rows
+                )
+                if fmt == "ndjson":
+                    chunk += separator
+                elif not first_batch:
+                    chunk = separator + chunk
+                first_batch = False
+                yield chunk
         except DBError as e:
             logger.error(
-                msg="failed to get kittens by breed",
+                msg="failed to export kittens",
                 exc_info=str(e),
             )
             raise e
-        return [
-            ReturnKittenS(
-                id=kitten.id,
-                color=kitten.color,
-                age=kitten.age,
-                description=kitten.description,
-                breed=getattr(kitten.breed, "name", None) or "",
-            )
-            for kitten in kittens
-        ]
+        if fmt == "json":
+            yield b"]"
 
     async def get_kitten(self, id: int) -> ReturnKittenS:
+        return self._row_to_return_dto(row=await self._get_row(id=id))
+
+    async def _get_row(self, id: int) -> Row:
         try:
-            kitten: Kitten = await self._kitten_repo.get_kitten_by_id(
-            id=id
-            )
-            return ReturnKittenS(
-                id=kitten.id,
-                color=kitten.color,
-                age=kitten.age,
-                description=kitten.description,
-                breed=getattr(kitten.breed, "name", None) or ""
-            )
+            return await self._kitten_repo.get_kitten_by_id(id=id)
         except (NotFoundError, DBError, Exception) as e:
             if type(e) is NotFoundError:
                 raise EntityNotFoundError(detail=str(e))
@@ -115,72 +368,82 @@ class KittenService:
         create_data: dict = create_dto.model_dump(
             exclude_unset=True, exclude_none=True
         )
-        if breed_name:
-            # create a kitten, then update its breed (if breed exists)
-            try:
-                breed: Breed = await self._breed_repo.get_breed_by_name(
-                    name=breed_name
-                )
-            except NotFoundError:
-                raise BadRequestError(
-                    detail=f"Can't add kitten info: breed {create_dto.breed} wasn't found"  # noqa
+        create_data.pop("breed", None)
+        try:
+            if breed_name:
+                # breed id is resolved by the insert itself
+                instance_id: int = await self._kitten_repo.create_with_breed(
+                    data=create_data, breed_name=breed_name
                 )
-            del create_data["breed"]
-            try:
-                instance_id: int = await self._kitten_repo.create(
+            else:
+                instance_id = await self._kitten_repo.create(
                     data=create_data
                 )
-            except DBError as e:
-                    logger.error(
-                        msg="failed to create kitten",
-                        exc_info=str(e),
-                        extra={"create_dto": create_dto},
-                    )
-                    raise e
-
-            kitten_entity = KittenE(id=instance_id, breed_id=breed.id)
-            update_data: dict = kitten_entity.model_dump(
-                exclude_none=True, exclude_unset=True
+        except NotFoundError:
+            raise BadRequestError(
+                detail=f"Can't add kitten info: breed {create_dto.breed} wasn't found"  # noqa
             )
-            try:
-                await self._kitten_repo.update(
-                    data=update_data,
-                    instance_id=instance_id
-                )  # update breed
-            except DBError as e:
-                logger.error(msg="failed to update kitten", exc_info=str(e))
-                raise e
-            return KittenID(
-                instance_id=instance_id
+        except DBError as e:
+            logger.error(
+                msg="failed to create kitten",
+                exc_info=str(e),
+                extra={"create_dto": create_dto},
             )
-        else:
-            try:
-                instance_id = await self._kitten_repo.create(
-                    data=create_data
-                )
-                return KittenID(
-                    instance_id=instance_id
-                )
-            except DBError as e:
-                logger.error(
-                    msg="failed to create kitten",
-                    exc_info=str(e),
-                    extra={"create_dto": create_dto},
-                )
-                raise e
+            raise e
+        self._stats.add(
+            breed=breed_name, age=create_dto.age, color=create_dto.color
+        )
+        await self._invalidate()
+        self._changes.publish([
+            ("created", instance_id, FIRST_VERSION, self._dto_to_dict(
+                id=instance_id, dto=create_dto
+            )),
+        ])
+        return KittenID(
+            instance_id=instance_id
+        )
 
     async def update_kitten(
             self,
             instance_id: int,
-            update_dto: UpdateKittenS
+            update_dto: UpdateKittenS,
+            if_match: Collection[str] | None = None,
     ) -> ReturnKittenS:
+        return self._row_to_return_dto(row=await self._update_row(
+            instance_id=instance_id, update_dto=update_dto, if_match=if_match
+        ))
+
+    async def update_kitten_json(
+            self,
+            instance_id: int,
+            update_dto: UpdateKittenS,
+            if_match: Collection[str] | None = None,
+    ) -> CachedResponse:
+        """update_kitten, serialized, with the new version as its etag"""
+        row = await self._update_row(
+            instance_id=instance_id, update_dto=update_dto, if_match=if_match
+        )
+        return CachedResponse.from_body(
+            body=dumps(self._row_to_dict(row=row)),
+            etag=kitten_etag(version=row.version),
+        )
+
+    async def _update_row(
+            self,
+            instance_id: int,
+            update_dto: UpdateKittenS,
+            if_match: Collection[str] | None,
+    ) -> Row:
+        """if_match are the etags of If-Match, None updates any version"""
         update_data: dict = update_dto.model_dump(
             exclude_unset=True, exclude_none=True
         )
+        if not update_data:
+            raise BadRequestError(detail="Invalid update data")
         if update_dto.breed:
             # if breed doesn't exist, we won't update the kitten
             try:
-                breed: Breed = await self._breed_repo.get_breed_by_name(
+                breed_id: int = await self._breed_repo.get_breed_id_by_name(
                     name=update_dto.breed
                 )  # if not breed, http_exc will be raised
             except NotFoundError:
@@ -189,18 +452,38 @@ class KittenService:
                            " In order to add breed, create it first"  # noqa
                 )
             del update_data["breed"]
-            update_data["breed_id"] = breed.id  # add id of found breed to \
+            update_data["breed_id"] = breed_id  # add id of found breed to \
             # kitten update dict
+        expected_versions = None
+        if if_match is not None:
+            expected_versions = {
+                version for version in map(kitten_version, if_match)
+                if version is not None
+            }
 
         try:
-            updated_kitten: Kitten = await self._kitten_repo.update(
+            row = await self._kitten_repo.update(
                 data=update_data,
-                instance_id=instance_id
+                instance_id=instance_id,
+                expected_versions=expected_versions,
             )
-            return await self.get_kitten(id=updated_kitten.id)
-        except (NotFoundError, DBError, Exception) as e:
+            self._stats.remove(
+                breed=row.old_breed, age=row.old_age, color=row.old_color
+            )
+            self._stats.add(breed=row.breed, age=row.age, color=row.color)
+            await self._invalidate(instance_id)
+            self._changes.publish([
+                ("updated", instance_id, row.version,
+                 self._row_to_dict(row=row)),
+            ])
+            return row
+        except (NotFoundError, VersionMismatchError, DBError, Exception) as e:
             if type(e) is NotFoundError:
                 raise EntityNotFoundError(detail=str(e))
+            elif type(e) is VersionMismatchError:
+                raise PreconditionFailedError(
+                    detail=str(e), etag=kitten_etag(version=e.version)
+                )
             else:
                 logger.error(
                     msg="failed to update kitten",
@@ -211,7 +494,12 @@ class KittenService:
 
     async def delete_kitten(self, id: int) -> None:
         try:
-            await self._kitten_repo.delete(id=id)
+            kitten = await self._kitten_repo.delete(id=id)
+            self._stats.remove(
+                breed=kitten.breed, age=kitten.age, color=kitten.color
+            )
+            await self._invalidate(id)
+            self._changes.publish([("deleted", id, kitten.version + 1, None)])
         except (NotFoundError, DBError, Exception) as e:
             if type(e) is NotFoundError:
                 raise EntityNotFoundError(detail=str(e))
@@ -221,4 +509,159 @@ class KittenService:
                     exc_info=str(e),
                     extra={"id": id},
                 )
-                raise e
\ No newline at end of file
+                raise e
+
+    async def bulk_create_kittens(
+            self, create_dtos: list[CreateKittenS]
+    ) -> BulkResultS:
+        instance_ids: list[int] = []
+        errors: list[BulkItemErrorS] = []
+        for offset in range(0, len(create_dtos), BULK_BATCH_SIZE):
+            batch = create_dtos[offset:offset + BULK_BATCH_SIZE]
+            breed_ids: dict[str, int] = \
+                await self._breed_repo.get_breed_ids_by_names(
+                    names={dto.breed for dto in batch if dto.breed}
+                )  # one lookup per batch instead of one per kitten
+
+            indexes, rows = [], []
+            for index, dto in enumerate(batch, start=offset):
+                if dto.color is None or dto.age is None:
+                    errors.append(BulkItemErrorS(
+                        index=index, detail="color and age are required"
+                    ))
+                elif dto.breed and dto.breed not in breed_ids:
+                    errors.append(BulkItemErrorS(
+                        index=index, detail=f"breed {dto.breed} wasn't found"
+                    ))
+                else:
+                    indexes.append(index)
+                    rows.append({
+                        "color": dto.color,
+                        "age": dto.age,
+                        "description": dto.description,
+                        "breed_id": breed_ids.get(dto.breed),
+                    })
+            if not rows:
+                continue
+            try:
+                created_ids = await self._kitten_repo.bulk_create(rows=rows)
+                instance_ids.extend(created_ids)
+                self._stats.invalidate()  # recounted rather than adjusted
+                await self._invalidate()
+                self._changes.publish(
+                    ("created", id, FIRST_VERSION, self._dto_to_dict(
+                        id=id, dto=create_dtos[index]
+                    ))
+                    for id, index in zip(created_ids, indexes)
+                )
+            except DBError as e:
+                logger.error(msg="failed to create kittens", exc_info=str(e))
+                errors.extend(
+                    BulkItemErrorS(index=index, detail="failed to save")
+                    for index in indexes
+                )
+        errors.sort(key=lambda error: error.index)
+        return BulkResultS(instance_ids=instance_ids, errors=errors)
+
+    async def bulk_update_kittens(
+            self, update_dtos: list[BulkUpdateKittenS]
+    ) -> BulkResultS:
+        instance_ids: list[int] = []
+        errors: list[BulkItemErrorS] = []
+        for offset in range(0, len(update_dtos), BULK_BATCH_SIZE):
+            batch = update_dtos[offset:offset + BULK_BATCH_SIZE]
+            breed_ids: dict[str, int] = \
+                await self._breed_repo.get_breed_ids_by_names(
+                    names={dto.breed for dto in batch if dto.breed}
+                )
+
+            indexes, rows = [], []
+            for index, dto in enumerate(batch, start=offset):
+                row: dict = dto.model_dump(
+                    exclude_unset=True, exclude_none=True, exclude={"breed"}
+                )
+                if dto.breed:
+                    if dto.breed not in breed_ids:
+                        errors.append(BulkItemErrorS(
+                            index=index,
+                            detail=f"breed {dto.breed} wasn't found"
+                        ))
+                        continue
+                    row["breed_id"] = breed_ids[dto.breed]
+                if len(row) == 1:  # nothing but id
+                    errors.append(BulkItemErrorS(
+                        index=index, detail="Invalid update data"
+                    ))
+                    continue
+                indexes.append(index)
+                rows.append(row)
+            if not rows:
+                continue
+            try:
+                versions = await self._kitten_repo.bulk_update(rows=rows)
+                self._stats.invalidate()
+                await self._invalidate(*versions)
+                self._changes.publish(
+                    ("updated", id, versions[id], None)
+                    for id in sorted(versions)
+                )
+            except DBError as e:
+                logger.error(msg="failed to update kittens", exc_info=str(e))
+                errors.extend(
+                    BulkItemErrorS(index=index, detail="failed to save")
+                    for index in indexes
+                )
+                continue
+            for index, row in zip(indexes, rows):
+                if row["id"] in versions:
+                    instance_ids.append(row["id"])
+                else:
+                    errors.append(BulkItemErrorS(
+                        index=index, detail="Kitten wasn't found"
+                    ))
+        errors.sort(key=lambda error: error.index)
+        return BulkResultS(instance_ids=instance_ids, errors=errors)
+
+    async def bulk_delete_kittens(self, ids: list[int]) -> BulkResultS:
+        instance_ids: list[int] = []
+        errors: list[BulkItemErrorS] = []
+        seen: set[int] = set()
+        for offset in range(0, len(ids), BULK_BATCH_SIZE):
+            indexes, batch = [], []
+            for index, id in enumerate(
+                ids[offset:offset + BULK_BATCH_SIZE], start=offset
+            ):
+                if id in seen:  # only one of them deletes the row
+                    errors.append(BulkItemErrorS(
+                        index=index, detail=f"duplicate id {id}"
+                    ))
+                    continue
+                seen.add(id)
+                indexes.append(index)
+                batch.append(id)
+            if not batch:
+                continue
+            try:
+                versions = await self._kitten_repo.bulk_delete(ids=batch)
+                self._stats.invalidate()
+                await self._invalidate(*versions)
+                self._changes.publish(
+                    ("deleted", id, versions[id] + 1, None)
+                    for id in sorted(versions)
+                )
+            except DBError as e:
+                logger.error(msg="failed to delete kittens", exc_info=str(e))
+                errors.extend(
+                    BulkItemErrorS(index=index, detail="failed to delete")
+                    for index in indexes
+                )
+                continue
+            for index, id in zip(indexes, batch):
+                if id in versions:
+                    instance_ids.append(id)
+                else:
+                    errors.append(BulkItemErrorS(
+                        index=index, detail="Kitten wasn't found"
+                    ))
+        errors.sort(key=lambda error: error.index)
+        return BulkResultS(instance_ids=instance_ids, errors=errors)
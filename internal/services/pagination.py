@@ -0,0 +1,83 @@
+import base64
+import binascii
+import json
+
+from common.exceptions import BadRequestError
+
+__all__ = (
+    "DEFAULT_PAGE_SIZE",
+    "MAX_PAGE_SIZE",
+    "encode_cursor",
+    "decode_cursor",
+    "decode_keyset_cursor",
+    "paginate",
+)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# the integer columns are 32 bit, a bigger value fails in the query
+_INT_MIN, _INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def _is_valid(value, type_: type[int] | type[str]) -> bool:
+    if type_ is int:
+        return (
+            isinstance(value, int) and not isinstance(value, bool)
+            and _INT_MIN <= value <= _INT_MAX
+        )
+    return isinstance(value, str) and "\x00" not in value
+
+
+def encode_cursor(last_id: int, **position) -> str:
+    """turns the id (and sort key) of the last row of a page
+    into an opaque cursor"""
+    raw = json.dumps(
+        {"id": last_id, **position}, separators=(",", ":")
+    ).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _decode(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded))
+        last_id = position["id"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise BadRequestError(detail="Invalid cursor")
+    if not _is_valid(last_id, type_=int):
+        raise BadRequestError(detail="Invalid cursor")
+    return position
+
+
+def decode_cursor(cursor: str | None) -> int | None:
+    if cursor is None:
+        return None
+    return _decode(cursor)["id"]
+
+
+def decode_keyset_cursor(
+    cursor: str | None, key: str, type_: type[int] | type[str] = int
+) -> tuple[int | str, int] | None:
+    """returns (sort key value, id) of the last row of the previous page,
+    type_ is the type of the sort key's column"""
+    if cursor is None:
+        return None
+    position = _decode(cursor)
+    value = position.get(key)
+    if not _is_valid(value, type_=type_):
+        raise BadRequestError(detail="Invalid cursor")
+    return value, position["id"]
+
+
+def paginate(
+    rows: list, limit: int, key: str = "id"
+) -> tuple[list, str | None]:
+    """rows must be fetched with limit + 1 to know if there is a next page,
+    key is the column the rows are sorted by (ties broken by id)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    position = {} if key == "id" else {key: getattr(last, key)}
+    return rows, encode_cursor(last_id=last.id, **position)
@@ -0,0 +1,61 @@
+import json
+import time
+from typing import Any, Callable
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from common.config import settings
+from internal.metrics.statements import statement_log
+
+try:
+    import orjson  # comes with fastapi[all]
+except ImportError:
+    orjson = None
+
+__all__ = (
+    "FAST_JSON",
+    "dumps",
+    "default_response_class",
+)
+
+FAST_JSON: bool = settings.FAST_JSON and orjson is not None
+
+
+def _timed(render: Callable[[Any], bytes], content: Any) -> bytes:
+    """renders, adding the time to the serialize phase of the request"""
+    log = statement_log.get()
+    if log is None:
+        return render(content)
+    started = time.perf_counter()
+    try:
+        return render(content)
+    finally:
+        log.serialize_seconds += time.perf_counter() - started
+
+
+def _dumps(content: Any) -> bytes:
+    if FAST_JSON:
+        return orjson.dumps(content)
+    return json.dumps(
+        content, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+def dumps(content: Any) -> bytes:
+    """compact utf-8 json, the same bytes pydantic's model_dump_json makes
+    for plain dicts, lists, strings and numbers"""
+    return _timed(_dumps, content)
+
+
+class _ORJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return _timed(super().render, content)
+
+
+class _JSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return _timed(super().render, content)
+
+
+def default_response_class() -> type[JSONResponse]:
+    return _ORJSONResponse if FAST_JSON else _JSONResponse
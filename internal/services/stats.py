@@ -0,0 +1,121 @@
+import asyncio
+import heapq
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Iterable, TypeAlias
+
+from common.config import settings
+
+__all__ = ("KittenStats", "kitten_stats", "get_kitten_stats")
+
+# (breed name, "" without one, age, color) -> number of such kittens
+GroupCounts: TypeAlias = Iterable[tuple[str | None, int, str, int]]
+
+
+class KittenStats:
+    """process-local kitten counts per breed, age and color.
+
+    This worker's writes adjust them as they happen. The other workers'
+    writes are picked up by recounting from the database, at the first
+    read after reconcile_interval seconds or after invalidate(), so
+    reads cost O(breeds + ages + colors) instead of a scan of kittens.
+    A write that lands during a recount may be missed until the next.
+    """
+
+    def __init__(
+        self,
+        reconcile_interval: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._interval = reconcile_interval
+        self._clock = clock
+        self._breeds: Counter[str] = Counter()
+        self._ages: Counter[int] = Counter()
+        self._colors: Counter[str] = Counter()
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()  # one recount at a time
+        self.reconciliations = 0
+        self.drift = 0  # sum of the differences the last recount fixed
+
+    def add(self, breed: str | None, age: int, color: str, n: int = 1) -> None:
+        """counts n more (or, negative, fewer) such kittens"""
+        for counter, key in (
+            (self._breeds, breed or ""),
+            (self._ages, age),
+            (self._colors, color),
+        ):
+            counter[key] += n
+            if counter[key] <= 0:
+                del counter[key]
+
+    def remove(self, breed: str | None, age: int, color: str) -> None:
+        self.add(breed=breed, age=age, color=color, n=-1)
+
+    def invalidate(self) -> None:
+        """recount at the next read, e.g. after a bulk write"""
+        self._loaded_at = None
+
+    async def summary(
+        self, loader: Callable[[], Awaitable[GroupCounts]], top_colors: int
+    ) -> dict:
+        """reconciles with loader's counts if they are due"""
+        if self._stale():
+            async with self._lock:
+                if self._stale():  # unless a concurrent read just did
+                    self._reconcile(rows=await loader())
+        return {
+            "total": sum(self._ages.values()),
+            "breeds": [
+                {"breed": breed, "count": count}
+                for breed, count in sorted(self._breeds.items())
+            ],
+            "ages": [
+                {"age": age, "count": count}
+                for age, count in sorted(self._ages.items())
+            ],
+            "top_colors": [
+                {"color": color, "count": count}
+                for color, count in heapq.nsmallest(
+                    top_colors,
+                    self._colors.items(),
+                    key=lambda item: (-item[1], item[0]),  # ties by name
+                )
+            ],
+        }
+
+    def _stale(self) -> bool:
+        return (
+            self._loaded_at is None
+            or self._clock() - self._loaded_at >= self._interval
+        )
+
+    def _reconcile(self, rows: GroupCounts) -> None:
+        breeds: Counter[str] = Counter()
+        ages: Counter[int] = Counter()
+        colors: Counter[str] = Counter()
+        for breed, age, color, count in rows:
+            breeds[breed or ""] += count
+            ages[age] += count
+            colors[color] += count
+        if self.reconciliations:  # not the first count
+            self.drift = sum(
+                abs(new[key] - old[key])
+                for new, old in (
+                    (breeds, self._breeds),
+                    (ages, self._ages),
+                    (colors, self._colors),
+                )
+                for key in new.keys() | old.keys()
+            )
+        self._breeds, self._ages, self._colors = breeds, ages, colors
+        self._loaded_at = self._clock()
+        self.reconciliations += 1
+
+
+kitten_stats = KittenStats(
+    reconcile_interval=settings.STATS_RECONCILE_INTERVAL
+)
+
+
+def get_kitten_stats() -> KittenStats:
+    return kitten_stats
@@ -1,3 +1,4 @@
-__all__ = ("db_client",)
+__all__ = ("get_db_client", "PostgresClient", "UnitOfWork", "get_uow")
 
-from .app import db_client
+from .app import PostgresClient, get_db_client
+from .uow import UnitOfWork, get_uow
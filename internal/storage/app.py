@@ -1,24 +1,90 @@
+import asyncio
+import functools
+import itertools
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator
+
+from sqlalchemy import make_url
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import NullPool
 
 from common.config import settings
 from common.exceptions import FailedToConnectError
 from common.logger import logger
 
+from .pool import InstrumentedQueuePool
+
+# set once the current request has written to the primary, so that its
+# later reads see its own writes instead of a lagging replica
+_wrote_to_primary: ContextVar[bool] = ContextVar(
+    "wrote_to_primary", default=False
+)
+
+
+class _Replica:
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.session = async_sessionmaker(
+            bind=engine, class_=AsyncSession, expire_on_commit=False
+        )
+        self.down_until = 0.0
+
 
 class PostgresClient:
     """creates connection session to db"""
 
-    def __init__(self, db_url: str, echo: bool):
+    def __init__(
+        self,
+        db_url: str,
+        echo: bool,
+        replica_urls: list[str] | None = None,
+        replica_retry_after: float = 5.0,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        pool_recycle: int = -1,
+        pool_pre_ping: bool = False,
+        null_pool: bool = False,
+        statement_cache_size: int | None = None,
+        command_timeout: float | None = None,
+    ):
+        engine_options: dict = {"pool_pre_ping": pool_pre_ping}
+        if null_pool:
+            engine_options["poolclass"] = NullPool
+        else:
+            engine_options.update(
+                poolclass=InstrumentedQueuePool,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_timeout=pool_timeout,
+                pool_recycle=pool_recycle,
+            )
+        if make_url(db_url).get_driver_name() == "asyncpg":
+            connect_args: dict = {"command_timeout": command_timeout}
+            if statement_cache_size is not None:
+                connect_args["statement_cache_size"] = statement_cache_size
+            engine_options["connect_args"] = connect_args
+
         try:
             self._engine = create_async_engine(
                 url=db_url,
                 echo=echo,
+                **engine_options,
             )
+            self._replicas = [
+                _Replica(engine=create_async_engine(
+                    url=replica_url, echo=echo, **engine_options
+                ))
+                for replica_url in replica_urls or ()
+            ]
             logger.info("successful connection to postgres")
         except Exception as e:
             logger.error(
@@ -29,14 +95,96 @@ class PostgresClient:
         self._session = async_sessionmaker(
             bind=self._engine, class_=AsyncSession, expire_on_commit=False
         )
+        self._replica_retry_after = replica_retry_after
+        self._next_replica = itertools.count()
 
     @property
     def engine(self) -> AsyncEngine:
         return self._engine
 
+    @property
+    def engines(self) -> list[AsyncEngine]:
+        """the primary engine followed by the replica ones"""
+        return [self._engine, *(r.engine for r in self._replicas)]
+
     @property
     def session(self) -> AsyncSession:
         return self._session()
 
+    @asynccontextmanager
+    async def read_session(self) -> AsyncIterator[AsyncSession]:
+        """session for read-only queries: a replica if one is up and the
+        current request hasn't written yet, the primary otherwise"""
+        async with await self.replica_session() or self.session as session:
+            yield session
+
+    def mark_written(self) -> None:
+        _wrote_to_primary.set(True)
+
+    async def replica_session(self) -> AsyncSession | None:
+        """connected session of a healthy replica, None if reads
+        have to go to the primary"""
+        if not self._replicas or _wrote_to_primary.get():
+            return None
+        start = next(self._next_replica)
+        now = time.monotonic()
+        for i in range(len(self._replicas)):
+            replica = self._replicas[(start + i) % len(self._replicas)]
+            if replica.down_until > now:
+                continue
+            session = replica.session()
+            try:
+                await session.connection()  # fail over now, not mid-query
+            except (SQLAlchemyError, OSError) as e:
+                await session.close()
+                replica.down_until = now + self._replica_retry_after
+                logger.warning(
+                    msg="replica is unavailable",
+                    exc_info=str(e),
+                    extra={"replica": replica.engine.url.render_as_string()},
+                )
+                continue
+            return session
+        return None
+
+    async def warm_up(self) -> None:
+        """opens every engine's pool_size connections now, so the first
+        requests don't pay for connecting"""
+        for engine in self.engines:
+            size = getattr(engine.pool, "size", lambda: 0)()  # 0: NullPool
+            connections = [engine.connect() for _ in range(size)]
+            try:
+                await asyncio.gather(*(c.start() for c in connections))
+            finally:
+                await asyncio.gather(*(c.close() for c in connections))
+
+    async def dispose(self) -> None:
+        for engine in self.engines:
+            await engine.dispose()
+
+    def pool_stats(self) -> dict[str, float]:
+        """checkout wait times and saturation, empty with NullPool"""
+        pool = self._engine.pool
+        if isinstance(pool, InstrumentedQueuePool):
+            return pool.snapshot()
+        return {}
+
 
-db_client = PostgresClient(db_url=settings.DB_URL, echo=False)
+@functools.cache
+def get_db_client() -> PostgresClient:
+    """the client of this process, made on first use rather than on
+    import so that importing the app doesn't create engines"""
+    return PostgresClient(
+        db_url=settings.DB_URL,
+        echo=False,
+        replica_urls=settings.DB_REPLICA_URLS,
+        replica_retry_after=settings.DB_REPLICA_RETRY_AFTER,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        null_pool=settings.DB_NULL_POOL,
+        statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+        command_timeout=settings.DB_COMMAND_TIMEOUT,
+    )
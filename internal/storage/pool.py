@@ -0,0 +1,60 @@
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+__all__ = ("InstrumentedQueuePool", "PoolStats")
+
+
+class PoolStats:
+    """checkout counters of one pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def observe_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        if seconds > self.wait_seconds_max:
+            self.wait_seconds_max = seconds
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """queue pool that measures how long checkouts wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.timeouts += 1
+            raise
+        self.stats.observe_wait(time.perf_counter() - started)
+        return connection
+
+    def snapshot(self) -> dict[str, float]:
+        """saturation is 0 with unlimited overflow (max_overflow -1)"""
+        capacity = self.size() + self._max_overflow
+        checked_out = self.checkedout()
+        unlimited = self._max_overflow < 0
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": checked_out,
+            "idle": self.checkedin(),
+            "saturation": (
+                checked_out / capacity if capacity > 0 and not unlimited
+                else 0.0
+            ),
+            "checkouts": self.stats.checkouts,
+            "timeouts": self.stats.timeouts,
+            "wait_seconds_total": self.stats.wait_seconds_total,
+            "wait_seconds_max": self.stats.wait_seconds_max,
+        }
@@ -0,0 +1,63 @@
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from .app import PostgresClient, get_db_client
+
+__all__ = ("UnitOfWork", "get_uow")
+
+
+class UnitOfWork:
+    """sessions shared by all repositories of one request.
+
+    The primary session and the replica session are opened on first
+    use and keep their connection until close(), so a request checks out
+    at most one connection of each kind however often it commits.
+    With primary_reads every read goes to the primary as well.
+    """
+
+    def __init__(self, client: PostgresClient, primary_reads: bool = False):
+        self._client = client
+        self._connection: AsyncConnection | None = None
+        self._session: AsyncSession | None = None
+        self._read_session: AsyncSession | None = None
+        self._written = primary_reads  # reads go to the primary once set
+
+    async def session(self) -> AsyncSession:
+        if self._session is None:
+            self._connection = await self._client.engine.connect()
+            self._session = AsyncSession(
+                bind=self._connection, expire_on_commit=False
+            )
+        return self._session
+
+    async def read_session(self) -> AsyncSession:
+        if self._read_session is None and not self._written:
+            self._read_session = await self._client.replica_session()
+        if self._read_session is not None and not self._written:
+            return self._read_session
+        return await self.session()  # no replica or must see own writes
+
+    def mark_written(self) -> None:
+        self._written = True
+        self._client.mark_written()
+
+    async def rollback(self) -> None:
+        if self._session is not None:
+            await self._session.rollback()
+
+    async def close(self) -> None:
+        for session in (self._session, self._read_session):
+            if session is not None:
+                await session.close()
+        if self._connection is not None:
+            await self._connection.close()
+        self._connection = self._session = self._read_session = None
+
+
+async def get_uow() -> AsyncIterator[UnitOfWork]:
+    uow = UnitOfWork(client=get_db_client())
+    try:
+        yield uow
+    finally:
+        await uow.close()  # rolls back whatever wasn't committed
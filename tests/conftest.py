@@ -2,38 +2,74 @@ import asyncio
 
 import pytest
 import pytest_asyncio
+from sqlalchemy import event
 
+from internal.cache import response_cache
+from internal.changes import change_bus
+from internal.metrics import instrument_db
 from internal.orm_models import Base
 from internal.repositories import BreedRepo, KittenRepo
-from internal.services import BreedService, KittenService
-from internal.storage import db_client
+from internal.services import BreedService, KittenService, kitten_stats
+from internal.storage import UnitOfWork, get_db_client
 
 
-@pytest.fixture(scope="session")
-def kitten_service() -> KittenService:
-    kitten_repo = KittenRepo()
-    breed_repo = BreedRepo()
+@pytest_asyncio.fixture
+async def uow() -> UnitOfWork:
+    """what get_uow gives every request"""
+    uow = UnitOfWork(client=get_db_client())
+    yield uow
+    await uow.close()
+
+
+@pytest.fixture
+def kitten_service(uow: UnitOfWork) -> KittenService:
+    kitten_repo = KittenRepo(uow=uow)
+    breed_repo = BreedRepo(uow=uow)
     return KittenService(
         kitten_repo=kitten_repo,
-        breed_repo=breed_repo
+        breed_repo=breed_repo,
+        cache=response_cache,
+        stats=kitten_stats,
+        changes=change_bus,
     )
 
 
-@pytest.fixture(scope="session")
-def breed_service() -> BreedService:
-    breed_repo = BreedRepo()
+@pytest.fixture
+def breed_service(uow: UnitOfWork) -> BreedService:
+    breed_repo = BreedRepo(uow=uow)
     return BreedService(
-        breed_repo=breed_repo
+        breed_repo=breed_repo,
+        cache=response_cache,
     )
 
 
 @pytest_asyncio.fixture(scope="session", autouse=True)
 async def prepare_database():
-    async with db_client.engine.begin() as con:
+    instrument_db()  # for track_statements
+    async with get_db_client().engine.begin() as con:
         await con.run_sync(Base.metadata.drop_all)
         await con.run_sync(Base.metadata.create_all)
 
 
+@pytest.fixture
+def statements() -> list[str]:
+    """collects every statement sent to the db (and COMMIT markers)"""
+    executed: list[str] = []
+
+    def on_execute(conn, cursor, statement, parameters, context, many):
+        executed.append(statement)
+
+    def on_commit(conn):
+        executed.append("COMMIT")
+
+    engine = get_db_client().engine.sync_engine
+    event.listen(engine, "before_cursor_execute", on_execute)
+    event.listen(engine, "commit", on_commit)
+    yield executed
+    event.remove(engine, "before_cursor_execute", on_execute)
+    event.remove(engine, "commit", on_commit)
+
+
 @pytest.fixture(scope="session", autouse=True)
 def event_loop():
     loop = asyncio.new_event_loop()
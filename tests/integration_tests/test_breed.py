@@ -1,8 +1,14 @@
+import asyncio
+import json
+
 import pytest
 
 from common.exceptions import AlreadyExistsError
+from internal.cache import ResponseCache
+from internal.repositories import BreedCache, BreedRepo, breed_cache
 from internal.schemas import CreateBreedS, ReturnBreedS
 from internal.services import BreedService
+from internal.storage import UnitOfWork, get_db_client
 
 
 @pytest.mark.asyncio(scope="module")
@@ -18,7 +24,7 @@ async def test_get_all_breeds(breed_service: BreedService):
             create_dto=breed
         )
 
-    breeds = await breed_service.get_breeds()
+    breeds = (await breed_service.get_breeds()).items
 
     assert breeds == [
         ReturnBreedS(instance_id=1, name='сиамская'),
@@ -35,5 +41,78 @@ async def test_create_duplicate_breed(breed_service: BreedService):
     assert "409: Breed already exists" == str(excinfo.value)
 
 
+def test_breed_cache_ttl_and_size():
+    now = [0.0]
+    cache = BreedCache(ttl=10, max_size=2, clock=lambda: now[0])
+
+    cache.put(id=1, name="a")
+    cache.put(id=2, name="b")
+    assert cache.get_name(id=2) == "b"
+    assert cache.get_id(name="a") == 1
+
+    cache.put(id=3, name="c")  # "b" is the least recently used one
+    assert cache.get_id(name="b") is None
+    assert cache.get_name(id=2) is None
+
+    now[0] = 10
+    assert cache.get_id(name="a") is None
+    assert cache.stats() == {"hits": 2, "misses": 3, "size": 1}
+
+
+@pytest.mark.asyncio(scope="module")
+async def test_breed_cache_lookups(
+        breed_service: BreedService,
+        statements: list[str],
+        uow: UnitOfWork,
+):
+    breed_repo = BreedRepo(uow=uow)
+    breed_cache.invalidate()
+
+    breed_id = await breed_repo.get_breed_id_by_name(name="сиамская")
+    assert len(statements) == 1
+    hits = breed_cache.hits
+    assert await breed_repo.get_breed_id_by_name(name="сиамская") == breed_id
+    assert breed_cache.hits == hits + 1
+    assert len(statements) == 1  # served from the cache
+
+    await breed_service.create(create_dto=CreateBreedS(breed_name="мейн-кун"))
+    assert breed_cache.stats()["size"] == 0
 
 
+
+@pytest.mark.asyncio(scope="module")
+async def test_cache_load_outlives_the_request_that_started_it(
+        breed_service: BreedService, uow: UnitOfWork
+):
+    await breed_service.create(create_dto=CreateBreedS(breed_name="девон-рекс"))
+    await uow.close()
+    checked_out = get_db_client().pool_stats()["checked_out"]
+    first = asyncio.ensure_future(breed_service.get_breeds_json())
+    await asyncio.sleep(0)  # loading
+    second = asyncio.ensure_future(breed_service.get_breeds_json())
+    await asyncio.sleep(0)  # waiting on the same load
+    first.cancel()  # the client that started it went away
+    await uow.close()  # as get_uow does then
+    breeds = json.loads((await second).body)["items"]
+    assert breeds[-1]["name"] == "девон-рекс"
+    assert get_db_client().pool_stats()["checked_out"] == checked_out
+
+
+class _DownBackend:
+    async def incr(self, key: str) -> int:
+        raise ConnectionError("redis is down")
+
+
+@pytest.mark.asyncio(scope="module")
+async def test_create_breed_with_the_cache_down(uow: UnitOfWork):
+    breed_service = BreedService(
+        breed_repo=BreedRepo(uow=uow),
+        cache=ResponseCache(backend=_DownBackend(), ttl=30),
+    )
+    with pytest.raises(ConnectionError):  # a 500, not "already exists"
+        await breed_service.create(
+            create_dto=CreateBreedS(breed_name="корниш-рекс")
+        )
+    assert await BreedRepo(uow=uow).get_breed_id_by_name(
+        name="корниш-рекс"
+    )
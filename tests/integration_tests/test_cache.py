@@ -0,0 +1,177 @@
+import asyncio
+from email.utils import formatdate
+
+import pytest
+from fastapi import Request
+
+from internal.cache import (
+    CachedResponse,
+    InMemoryBackend,
+    RedisBackend,
+    ResponseCache,
+)
+from internal.handlers.conditional import conditional_response
+
+
+class FakeRedis:
+    """the subset of redis.asyncio.Redis used by RedisBackend"""
+
+    def __init__(self):
+        self.data: dict[str, bytes] = {}
+        self.px: dict[str, int | None] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        return self.data.get(key)
+
+    async def set(self, key: str, value: bytes, px: int | None = None):
+        self.data[key] = value
+        self.px[key] = px
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    async def incr(self, key: str) -> int:
+        value = int(self.data.get(key, 0)) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+
+async def test_in_memory_backend_ttl_and_size():
+    now = [0.0]
+    backend = InMemoryBackend(max_size=2, clock=lambda: now[0])
+
+    await backend.set("a", b"1", ttl=10)
+    await backend.set("b", b"2", ttl=None)
+    assert await backend.get("a") == b"1"
+    await backend.set("c", b"3", ttl=None)  # evicts "b"
+    assert await backend.get("b") is None
+
+    now[0] = 10
+    assert await backend.get("a") is None
+    assert await backend.get("c") == b"3"
+    assert await backend.incr("v") == 1
+
+    for key in ("d", "e", "f"):  # counters aren't evicted
+        await backend.set(key, b"4", ttl=None)
+    assert await backend.get("v") == b"1"
+    assert await backend.incr("v") == 2
+
+
+async def test_redis_backend():
+    redis = FakeRedis()
+    cache = ResponseCache(backend=RedisBackend(client=redis), ttl=1.5)
+
+    async def loader() -> bytes:
+        return b"[]"
+
+    cached = await cache.get_or_load(key="k", loader=loader)
+    assert cached.body == b"[]"
+    assert CachedResponse.decode(redis.data["cats:k"]) == cached
+    assert redis.px["cats:k"] == 1500
+
+    assert await cache.version(namespace="ns") == 0
+    await cache.bump(namespace="ns")
+    assert await cache.version(namespace="ns") == 1
+
+    await cache.invalidate("k")
+    assert "cats:k" not in redis.data
+
+
+async def test_cold_key_is_loaded_once():
+    cache = ResponseCache(backend=InMemoryBackend(max_size=10), ttl=60)
+    calls = 0
+
+    async def loader() -> bytes:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b"{}"
+
+    responses = await asyncio.gather(
+        *(cache.get_or_load(key="k", loader=loader) for _ in range(10))
+    )
+    assert {response.body for response in responses} == {b"{}"}
+    assert calls == 1
+    assert cache.stats() == {"hits": 0, "misses": 1, "coalesced": 9}
+
+    assert (await cache.get_or_load(key="k", loader=loader)).body == b"{}"
+    assert cache.hits == 1
+
+
+async def test_failed_load_is_not_cached():
+    cache = ResponseCache(backend=InMemoryBackend(max_size=10), ttl=60)
+
+    async def loader() -> bytes:
+        raise LookupError("nope")
+
+    with pytest.raises(LookupError):
+        await cache.get_or_load(key="k", loader=loader)
+    cached = await cache.get_or_load(
+        key="k", loader=lambda: asyncio.sleep(0, result=b"ok")
+    )
+    assert cached.body == b"ok"
+
+
+async def test_invalidated_while_loading_is_not_stored():
+    backend = InMemoryBackend(max_size=10)
+    cache = ResponseCache(backend=backend, ttl=60)
+    loading = asyncio.Event()
+    release = asyncio.Event()
+
+    async def loader() -> bytes:
+        loading.set()
+        await release.wait()
+        return b"old"
+
+    task = asyncio.ensure_future(cache.get_or_load(key="k", loader=loader))
+    await loading.wait()
+    await cache.invalidate("k")
+    release.set()
+
+    assert (await task).body == b"old"
+    assert await backend.get("k") is None
+
+
+def test_conditional_response():
+    cached = CachedResponse.from_body(body=b'{"items": []}')
+
+    def request(**headers: str) -> Request:
+        return Request({"type": "http", "headers": [
+            (name.replace("_", "-").encode(), value.encode())
+            for name, value in headers.items()
+        ]})
+
+    response = conditional_response(request=request(), cached=cached)
+    assert response.status_code == 200
+    assert response.body == cached.body
+    assert response.headers["etag"] == cached.etag
+
+    for if_none_match in (cached.etag, f'"x", W/{cached.etag}', "*"):
+        response = conditional_response(
+            request=request(if_none_match=if_none_match), cached=cached
+        )
+        assert response.status_code == 304
+        assert response.body == b""
+
+    response = conditional_response(
+        request=request(if_none_match='"x"'), cached=cached
+    )
+    assert response.status_code == 200
+
+    last_modified = response.headers["last-modified"]
+    response = conditional_response(
+        request=request(if_modified_since=last_modified), cached=cached
+    )
+    assert response.status_code == 200  # may be another body of that second
+    response = conditional_response(
+        request=request(
+            if_modified_since=formatdate(cached.last_modified + 1, usegmt=True)
+        ),
+        cached=cached,
+    )
+    assert response.status_code == 304
+    response = conditional_response(
+        request=request(if_modified_since="Thu, 01 Jan 1970 00:00:00 GMT"),
+        cached=cached,
+    )
+    assert response.status_code == 200
@@ -1,14 +1,28 @@
+import asyncio
+import json
+import time
+
 import pytest
+from httpx import ASGITransport, AsyncClient
 
 from common.exceptions import BadRequestError, EntityNotFoundError
+from internal.cache import response_cache
+from internal.metrics import track_statements
+from internal.run import app
 from internal.schemas import (
+    BulkItemErrorS,
+    BulkUpdateKittenS,
     CreateBreedS,
     CreateKittenS,
+    KittenFilterS,
     KittenID,
     ReturnKittenS,
     UpdateKittenS,
 )
-from internal.services import BreedService, KittenService
+from internal.services import BreedService, KittenService, serialization
+from internal.services.kitten import KITTEN_LISTS, kitten_cache_key
+from internal.services.pagination import encode_cursor
+from internal.storage import UnitOfWork, get_db_client
 
 
 @pytest.mark.asyncio(scope="session")
@@ -47,9 +61,9 @@ async def test_create_kitten_without_breed(
 
     assert kitten_id.instance_id == res.id
 
-    kittens: list[ReturnKittenS] = await kitten_service.get_all_kittens(
-        breed=None
-    )
+    kittens: list[ReturnKittenS] = (
+        await kitten_service.get_all_kittens(breed=None)
+    ).items
 
     if res not in kittens:
         pytest.fail(msg="No kitten in the result list")
@@ -96,9 +110,9 @@ async def test_create_kitten_with_breed_success(
         create_dto=kitten_dto
     )
 
-    kittens: list[ReturnKittenS] = await kitten_service.get_all_kittens(
-        breed=None
-    )
+    kittens: list[ReturnKittenS] = (
+        await kitten_service.get_all_kittens(breed=None)
+    ).items
 
     if ReturnKittenS(
             id=3,
@@ -145,13 +159,9 @@ async def test_update_kitten(
 
 @pytest.mark.asyncio(scope="session")
 async def test_get_all_kittens(kitten_service: KittenService):
-    kittens = await kitten_service.get_all_kittens(breed=None)
+    kittens = (await kitten_service.get_all_kittens(breed=None)).items
 
     assert kittens == [
-        ReturnKittenS(
-            id=3, color='серый', age=2,
-            description='', breed='британский'
-        ),
         ReturnKittenS(
             id=1, color='серый', age=2,
             description='', breed='британский'
@@ -159,20 +169,145 @@ async def test_get_all_kittens(kitten_service: KittenService):
         ReturnKittenS(
             id=2, color='белый', age=5,
             description='любит играть', breed=''
-        )
-    ]
-
-    kittens_by_breed = await kitten_service.get_all_kittens(breed="британский")
-    assert kittens_by_breed == [
+        ),
         ReturnKittenS(
             id=3, color='серый', age=2,
             description='', breed='британский'
         ),
+    ]
+
+    kittens_by_breed = (
+        await kitten_service.get_all_kittens(breed="британский")
+    ).items
+    assert kittens_by_breed == [
         ReturnKittenS(
             id=1, color='серый', age=2, description='',
             breed='британский'
+        ),
+        ReturnKittenS(
+            id=3, color='серый', age=2,
+            description='', breed='британский'
+        ),
+    ]
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_get_all_kittens_pagination(kitten_service: KittenService):
+    first_page = await kitten_service.get_all_kittens(breed=None, limit=2)
+    assert [kitten.id for kitten in first_page.items] == [1, 2]
+    assert first_page.next_cursor is not None
+
+    last_page = await kitten_service.get_all_kittens(
+        breed=None, limit=2, after=first_page.next_cursor
+    )
+    assert [kitten.id for kitten in last_page.items] == [3]
+    assert last_page.next_cursor is None
+
+    by_breed = await kitten_service.get_all_kittens(
+        breed="британский", limit=1, after=first_page.next_cursor
+    )
+    assert [kitten.id for kitten in by_breed.items] == [3]
+
+    with pytest.raises(BadRequestError) as excinfo:
+        await kitten_service.get_all_kittens(breed=None, after="not-a-cursor")
+    assert "Invalid cursor" == str(excinfo.value)
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_get_all_kittens_filtered(kitten_service: KittenService):
+    async def ids(**filters) -> list[int]:
+        page = await kitten_service.get_all_kittens(
+            breed=None, filters=KittenFilterS(**filters)
         )
+        return [kitten.id for kitten in page.items]
+
+    assert await ids(color="серый") == [1, 3]
+    assert await ids(age_min=3) == [2]
+    assert await ids(age_max=2, sort="-id") == [3, 1]
+    assert await ids(q="игра") == [2]
+    assert await ids(q="%") == []  # wildcards are matched literally
+    assert await ids(sort="-age") == [2, 3, 1]
+
+    page = await kitten_service.get_all_kittens(
+        breed=None, limit=1, filters=KittenFilterS(sort="-age")
+    )
+    page = await kitten_service.get_all_kittens(
+        breed=None, limit=1, after=page.next_cursor,
+        filters=KittenFilterS(sort="-age"),
+    )
+    assert [kitten.id for kitten in page.items] == [3]
+    with pytest.raises(BadRequestError):  # cursor of another sort key
+        await kitten_service.get_all_kittens(
+            breed=None, after=page.next_cursor,
+            filters=KittenFilterS(sort="color"),
+        )
+    for sort, cursor in (  # well-formed, but values the query can't take
+        ("age", encode_cursor(last_id=1, age="3")),
+        ("color", encode_cursor(last_id=1, color=3)),
+        ("color", encode_cursor(last_id=1, color="серый\x00")),
+        ("id", encode_cursor(last_id=2 ** 40)),
+    ):
+        with pytest.raises(BadRequestError):
+            await kitten_service.get_all_kittens(
+                breed=None, after=cursor, filters=KittenFilterS(sort=sort)
+            )
+
+    with pytest.raises(ValueError):
+        KittenFilterS(age_min=3, age_max=2)
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_get_all_kittens_projection(
+        kitten_service: KittenService,
+        statements: list[str],
+):
+    filters = KittenFilterS(fields=("color",), sort="age")
+    page = await kitten_service.get_all_kittens_json(
+        breed="британский", filters=filters
+    )
+    assert json.loads(page.body)["items"] == [
+        {"color": "серый"}, {"color": "серый"}
+    ]
+    select_ = next(s for s in statements if s.startswith("SELECT"))
+    assert "description" not in select_ and "breeds" not in select_
+
+
+@pytest.mark.asyncio(scope="session")
+@pytest.mark.parametrize("fast_json", [True, False])
+async def test_json_bodies_match_dtos(
+        kitten_service: KittenService, monkeypatch, fast_json: bool
+):
+    monkeypatch.setattr(serialization, "FAST_JSON", fast_json)
+    await response_cache.bump(namespace=KITTEN_LISTS)
+    page = await kitten_service.get_all_kittens_json(breed=None)
+    assert page.body == (
+        await kitten_service.get_all_kittens(breed=None)
+    ).model_dump_json().encode()
+
+    await response_cache.invalidate(kitten_cache_key(id=2))
+    kitten = await kitten_service.get_kitten_json(id=2)
+    assert kitten.body == (
+        await kitten_service.get_kitten(id=2)
+    ).model_dump_json().encode()
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_export_kittens(kitten_service: KittenService):
+    chunks = await kitten_service.export_kittens(breed=None, fmt="ndjson")
+    body = b"".join([chunk async for chunk in chunks]).decode()
+    kittens = [
+        ReturnKittenS(**json.loads(line)) for line in body.splitlines()
     ]
+    assert kittens == (await kitten_service.get_all_kittens(breed=None)).items
+
+    chunks = await kitten_service.export_kittens(
+        breed="британский", fmt="json"
+    )
+    body = b"".join([chunk async for chunk in chunks])
+    assert [kitten["id"] for kitten in json.loads(body)] == [1, 3]
+
+    with pytest.raises(EntityNotFoundError):
+        await kitten_service.export_kittens(breed="ssss", fmt="json")
 
 
 async def test_get_kitten_by_breed_error(kitten_service: KittenService):
@@ -214,3 +349,210 @@ async def test_delete_kitten(kitten_service: KittenService):
     with pytest.raises(EntityNotFoundError) as excinfo2:
         _ = await kitten_service.delete_kitten(id=100)
     assert "404: Kitten wasn't found" == str(excinfo2.value)
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_bulk_kittens(kitten_service: KittenService):
+    created = await kitten_service.bulk_create_kittens(create_dtos=[
+        CreateKittenS(color="рыжий", age=1, breed="британский"),
+        CreateKittenS(color="рыжий", age=1, breed="ssss"),
+        CreateKittenS(color="чёрный"),
+        CreateKittenS(color="чёрный", age=3, description="спит"),
+    ])
+    assert len(created.instance_ids) == 2
+    assert created.errors == [
+        BulkItemErrorS(index=1, detail="breed ssss wasn't found"),
+        BulkItemErrorS(index=2, detail="color and age are required"),
+    ]
+    first_id, second_id = created.instance_ids
+    assert (await kitten_service.get_kitten(id=first_id)).breed == \
+           "британский"
+
+    updated = await kitten_service.bulk_update_kittens(update_dtos=[
+        BulkUpdateKittenS(id=first_id, age=2),
+        BulkUpdateKittenS(id=second_id, breed="британский"),
+        BulkUpdateKittenS(id=100, age=2),
+    ])
+    assert updated.instance_ids == [first_id, second_id]
+    assert updated.errors == [
+        BulkItemErrorS(index=2, detail="Kitten wasn't found")
+    ]
+    assert await kitten_service.get_kitten(id=second_id) == ReturnKittenS(
+        id=second_id, color="чёрный", age=3,
+        description="спит", breed="британский"
+    )
+
+    deleted = await kitten_service.bulk_delete_kittens(
+        ids=[first_id, 100, second_id, first_id]
+    )
+    assert deleted.instance_ids == [first_id, second_id]
+    assert deleted.errors == [
+        BulkItemErrorS(index=1, detail="Kitten wasn't found"),
+        BulkItemErrorS(index=3, detail=f"duplicate id {first_id}"),
+    ]
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_bulk_create_is_one_insert(kitten_service: KittenService):
+    dtos = [
+        CreateKittenS(
+            color="серый",
+            age=index,
+            description="спит" if index % 2 else None,
+            breed="британский" if index % 3 else None,
+        )
+        for index in range(12)
+    ]
+    with track_statements() as log:
+        created = await kitten_service.bulk_create_kittens(create_dtos=dtos)
+
+    assert len(created.instance_ids) == 12 and created.errors == []
+    # rows with and without nulls still share the INSERT
+    assert log.by_method()["KittenRepo.bulk_create"] == 1
+    assert (await kitten_service.get_kitten(id=created.instance_ids[1])) \
+        == ReturnKittenS(
+            id=created.instance_ids[1], color="серый", age=1,
+            description="спит", breed="британский",
+        )
+    await kitten_service.bulk_delete_kittens(ids=created.instance_ids)
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_create_kitten_with_breed_round_trips(
+        kitten_service: KittenService,
+        statements: list[str],
+        record_property,
+):
+    started = time.perf_counter()
+    created = await kitten_service.create_kitten(create_dto=CreateKittenS(
+        color="серый", age=1, breed="британский"
+    ))
+    record_property("create_latency_ms", (time.perf_counter() - started) * 1e3)
+
+    assert len(statements) == 2
+    assert statements[0].startswith("INSERT INTO kittens")
+    assert statements[1] == "COMMIT"
+    assert (await kitten_service.get_kitten(id=created.instance_id)).breed \
+           == "британский"
+
+    statements.clear()
+    with pytest.raises(BadRequestError):
+        await kitten_service.create_kitten(create_dto=CreateKittenS(
+            color="серый", age=1, breed="ssss"
+        ))
+    assert len(statements) == 1  # nothing to commit
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_cached_kitten_reads(
+        kitten_service: KittenService,
+        statements: list[str],
+):
+    created = await kitten_service.create_kitten(create_dto=CreateKittenS(
+        color="рыжий", age=4
+    ))
+    id = created.instance_id
+
+    kitten = await kitten_service.get_kitten_json(id=id)
+    page = await kitten_service.get_all_kittens_json(breed=None, limit=1000)
+    statements.clear()
+    assert await kitten_service.get_kitten_json(id=id) == kitten
+    assert await kitten_service.get_all_kittens_json(
+        breed=None, limit=1000
+    ) == page
+    assert statements == []  # both served from the cache
+
+    await kitten_service.update_kitten(
+        instance_id=id, update_dto=UpdateKittenS(age=5)
+    )
+    updated = await kitten_service.get_kitten_json(id=id)
+    assert json.loads(updated.body)["age"] == 5
+    assert updated.etag != kitten.etag
+    page = await kitten_service.get_all_kittens_json(breed=None, limit=1000)
+    assert {"id": id, "color": "рыжий", "age": 5, "description": None,
+            "breed": ""} in json.loads(page.body)["items"]
+
+    await kitten_service.delete_kitten(id=id)
+    with pytest.raises(EntityNotFoundError):
+        await kitten_service.get_kitten_json(id=id)
+
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_cache_load_outlives_the_request_that_started_it(
+        kitten_service: KittenService, uow: UnitOfWork
+):
+    created = await kitten_service.create_kitten(create_dto=CreateKittenS(
+        color="серый", age=6
+    ))
+    await uow.close()
+    checked_out = get_db_client().pool_stats()["checked_out"]
+    first = asyncio.ensure_future(
+        kitten_service.get_kitten_json(id=created.instance_id)
+    )
+    await asyncio.sleep(0)  # loading
+    second = asyncio.ensure_future(
+        kitten_service.get_kitten_json(id=created.instance_id)
+    )
+    await asyncio.sleep(0)  # waiting on the same load
+    first.cancel()  # the client that started it went away
+    await uow.close()  # as get_uow does then
+    kitten = await second
+    assert json.loads(kitten.body)["age"] == 6
+    assert get_db_client().pool_stats()["checked_out"] == checked_out
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_request_uses_one_connection(kitten_service: KittenService):
+    created = await kitten_service.create_kitten(create_dto=CreateKittenS(
+        color="белый", age=1, breed="сиамская"
+    ))
+    before = get_db_client().pool_stats()["checkouts"]
+    await kitten_service.update_kitten(
+        instance_id=created.instance_id,
+        update_dto=UpdateKittenS(age=2, breed="сиамская"),
+    )
+    await kitten_service.get_kitten(id=created.instance_id)
+    assert get_db_client().pool_stats()["checkouts"] - before <= 1
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_patch_with_if_match(kitten_service: KittenService):
+    created = await kitten_service.create_kitten(create_dto=CreateKittenS(
+        color="чёрный", age=1
+    ))
+    url = f"/kittens/{created.instance_id}"
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://t") as c:
+        etag = (await c.get(url)).headers["etag"]
+
+        response = await c.patch(
+            url, json={"age": 2}, headers={"If-Match": etag}
+        )
+        assert response.status_code == 200
+        assert response.json()["age"] == 2
+        new_etag = response.headers["etag"]
+        assert new_etag != etag
+        assert (await c.get(url)).headers["etag"] == new_etag
+
+        # a second editor still holding the first version
+        response = await c.patch(
+            url, json={"age": 3}, headers={"If-Match": etag}
+        )
+        assert response.status_code == 412
+        assert response.headers["etag"] == new_etag
+        assert (await c.get(url)).json()["age"] == 2
+
+        for if_match in (f'"x", {new_etag}', "*"):
+            response = await c.patch(
+                url, json={"age": 4}, headers={"If-Match": if_match}
+            )
+            assert response.status_code == 200
+        assert (await c.patch(url, json={"age": 5})).status_code == 200
+        assert (await c.patch(url, json={})).status_code == 400
+
+        await kitten_service.delete_kitten(id=created.instance_id)
+        response = await c.patch(
+            url, json={"age": 6}, headers={"If-Match": new_etag}
+        )
+        assert response.status_code == 404
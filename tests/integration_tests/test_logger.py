@@ -0,0 +1,57 @@
+import io
+import json
+import re
+from logging import Logger
+from queue import Queue
+
+from common.logger.setup import (
+    BatchingQueueListener,
+    DroppingQueueHandler,
+    json_log_formatter,
+)
+
+
+def test_queue_handler_drops_when_full():
+    handler = DroppingQueueHandler(queue=Queue(maxsize=2))
+    logger = Logger("test_drops")
+    logger.addHandler(handler)
+
+    for i in range(5):
+        logger.error("record %s", i)
+
+    assert handler.dropped == 3
+    assert handler.queue.get_nowait().msg == "record 0"  # args merged
+
+
+def test_listener_writes_a_batch_at_once():
+    class Stream(io.StringIO):
+        writes = 0
+
+        def write(self, s: str) -> int:
+            self.writes += 1
+            return super().write(s)
+
+    stream = Stream()
+    queue = Queue()
+    handler = DroppingQueueHandler(queue=queue)
+    logger = Logger("test_batches")
+    logger.addHandler(handler)
+    for i in range(3):
+        logger.warning("record", extra={"i": i})
+
+    listener = BatchingQueueListener(
+        queue=queue, formatter=json_log_formatter, stream=stream
+    )
+    listener.start()
+    listener.stop()
+
+    assert stream.writes == 1
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(r["level"], r["message"], r["i"]) for r in records] == [
+        ("WARNING", "record", 0),
+        ("WARNING", "record", 1),
+        ("WARNING", "record", 2),
+    ]
+    assert re.fullmatch(
+        r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{6}Z", records[0]["timestamp"]
+    )
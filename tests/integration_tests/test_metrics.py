@@ -0,0 +1,167 @@
+import logging
+import os
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from common.exceptions import EntityNotFoundError
+from internal.metrics import (
+    Registry,
+    StatementBudgetMiddleware,
+    labelled,
+    query_label,
+    track_statements,
+)
+from internal.metrics.statements import normalize_sql
+from internal.repositories import breed_cache
+from internal.run import app
+from internal.schemas import CreateBreedS, CreateKittenS, UpdateKittenS
+from internal.services import BreedService, KittenService
+
+
+def test_registry_renders_exposition_format():
+    registry = Registry()
+    requests = registry.counter("requests_total", "requests", labels=("path",))
+    latency = registry.histogram(
+        "latency_seconds", "latency", buckets=(0.1, 1.0)
+    )
+    registry.gauge("answer", "the answer", callback=lambda: 42)
+
+    requests.inc(path='/a"b')
+    requests.inc(2, path='/a"b')
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value)
+
+    assert registry.render() == "\n".join((
+        "# HELP requests_total requests",
+        "# TYPE requests_total counter",
+        'requests_total{path="/a\\"b"} 3',
+        "# HELP latency_seconds latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1.0"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 3.65",
+        "latency_seconds_count 4",
+        "# HELP answer the answer",
+        "# TYPE answer gauge",
+        "answer 42",
+    )) + "\n"
+
+
+def test_registry_labels_every_sample():
+    registry = Registry(labels={"pid": "7"})
+    registry.counter("requests_total", "requests", labels=("path",)).inc(
+        path="/"
+    )
+    registry.histogram("latency_seconds", "latency", buckets=()).observe(1)
+
+    lines = registry.render().splitlines()
+    assert 'requests_total{pid="7",path="/"} 1' in lines
+    assert 'latency_seconds_bucket{pid="7",le="+Inf"} 1' in lines
+    assert 'latency_seconds_count{pid="7"} 1' in lines
+
+
+async def test_labelled_generator_restores_label():
+    @labelled("Repo.stream")
+    async def stream():
+        for i in range(2):
+            assert query_label.get() == "Repo.stream"
+            yield i
+
+    async for _ in stream():
+        assert query_label.get() == "other"  # consumer isn't labelled
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_metrics_endpoint():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://t") as c:
+        assert (await c.get("/kittens/100000")).status_code == 404
+        response = await c.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    pid = f'pid="{os.getpid()}"'  # the worker that answered
+    assert (f'http_requests_total{{{pid},method="GET",'
+            'route="/kittens/{id}",status="404"} ') in body
+    assert ('db_query_duration_seconds_count'
+            f'{{{pid},repo_method="KittenRepo.get_kitten_by_id"}} ') in body
+    assert f"http_requests_in_flight{{{pid}}} 1" in body  # this request
+    assert f"db_pool_checkouts_total{{{pid}}} " in body
+    assert f"process_start_time_seconds{{{pid}}} " in body
+
+
+def test_normalize_sql():
+    assert normalize_sql(
+        "SELECT kittens.id\n  FROM kittens WHERE kittens.id IN ($1, $2, $3)"
+        " AND color = 'серый' AND age > 2 LIMIT $4"
+    ) == (
+        "SELECT kittens.id FROM kittens WHERE kittens.id IN (?, ...)"
+        " AND color = ? AND age > ? LIMIT ?"
+    )
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_statements_per_service_method(
+        kitten_service: KittenService,
+        breed_service: BreedService,
+):
+    await breed_service.create(create_dto=CreateBreedS(breed_name="сфинкс"))
+    created = await kitten_service.create_kitten(create_dto=CreateKittenS(
+        color="розовый", age=1, breed="сфинкс"
+    ))
+
+    with track_statements() as log:
+        await kitten_service.update_kitten(
+            instance_id=created.instance_id,
+            update_dto=UpdateKittenS(age=2),
+        )
+
+    assert log.by_method() == {"KittenRepo.update": 1}  # UPDATE RETURNING
+    assert log.db_seconds > 0
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_listing_by_uncached_breed_is_one_statement(
+        kitten_service: KittenService,
+        breed_service: BreedService,
+):
+    await breed_service.create(create_dto=CreateBreedS(breed_name="манул"))
+    breed_cache.invalidate()
+
+    with track_statements() as log:
+        page = await kitten_service.get_all_kittens(breed="сфинкс")
+        assert [kitten.color for kitten in page.items] == ["розовый"]
+        assert (await kitten_service.get_all_kittens(breed="манул")).items \
+            == []
+        with pytest.raises(EntityNotFoundError):
+            await kitten_service.get_all_kittens(breed="нет такой")
+
+    assert log.by_method() == {"KittenRepo.find_kittens": 3}
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_statement_budget_middleware(caplog):
+    budgeted = StatementBudgetMiddleware(
+        app, max_statements=0, max_seconds=60, max_repeats=100
+    )
+    transport = ASGITransport(app=budgeted)
+    async with AsyncClient(transport=transport, base_url="http://t") as c:
+        with caplog.at_level(logging.WARNING):
+            response = await c.get("/kittens/100000")
+
+    timing = response.headers["server-timing"]
+    assert timing.startswith('db;dur=') and '"1 statements"' in timing
+    assert "serialize;dur=" in timing and "app;dur=" in timing
+    record = next(
+        r for r in caplog.records if r.msg.startswith("request over budget")
+    )
+    assert record.route == "/kittens/{id}"
+    assert record.statements == [{
+        "sql": record.statements[0]["sql"],
+        "repo_method": "KittenRepo.get_kitten_by_id",
+        "count": 1,
+        "ms": record.statements[0]["ms"],
+    }]
+    assert "WHERE kittens.id = ?" in record.statements[0]["sql"]
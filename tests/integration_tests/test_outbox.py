@@ -0,0 +1,178 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from common.exceptions import DBError
+from internal.orm_models import Base, OutboxEvent
+from internal.outbox import OutboxWorker
+from internal.repositories import BreedRepo, KittenRepo, sqlalchemy_repo
+from internal.storage import PostgresClient, UnitOfWork
+
+TOPICS = ("breed.created", "kitten.created", "kitten.updated", "kitten.deleted")
+
+
+@pytest_asyncio.fixture
+async def sqlite(tmp_path):
+    """opens clients of one sqlite file, a new one is a restart"""
+    clients: list[PostgresClient] = []
+
+    async def open_client() -> PostgresClient:
+        client = PostgresClient(
+            db_url=f"sqlite+aiosqlite:///{tmp_path / 'outbox.db'}", echo=False
+        )
+        clients.append(client)
+        async with client.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        return client
+
+    yield open_client
+    for client in clients:
+        await client.dispose()
+
+
+@pytest.fixture
+def handled_topics(monkeypatch):
+    """the repos write the events of every topic, as if they had handlers"""
+    writer = OutboxWorker()
+    for topic in TOPICS:
+        writer.register(topic, _ignore)
+    monkeypatch.setattr(sqlalchemy_repo, "outbox", writer)
+
+
+async def _ignore(topic: str, payload: dict) -> None:
+    pass
+
+
+async def _write(client: PostgresClient) -> None:
+    uow = UnitOfWork(client=client)
+    kittens, breeds = KittenRepo(uow=uow), BreedRepo(uow=uow)
+    try:
+        breed_id = await breeds.create(data={"name": "сибирская"})
+        id = await kittens.create(data={"color": "серый", "age": 1})
+        await kittens.update(instance_id=id, data={"age": 2})
+        await kittens.bulk_create(rows=[
+            {"color": "белый", "age": 3, "breed_id": breed_id},
+            {"color": "рыжий", "age": 4, "breed_id": None},
+        ])
+        await kittens.delete(id=id)
+        with pytest.raises(DBError):  # rolled back, so no event either
+            await breeds.create(data={"name": "сибирская"})
+    finally:
+        await uow.close()
+
+
+async def test_outbox_events_survive_restarts(sqlite, handled_topics):
+    client = await sqlite()
+    await _write(client)
+    handled: list[tuple[str, dict]] = []
+
+    async def record(topic: str, payload: dict) -> None:
+        handled.append((topic, payload))
+
+    async def crash(topic: str, payload: dict) -> None:
+        raise asyncio.CancelledError  # the process dies mid-batch
+
+    first = OutboxWorker(batch_size=3, lease=0)
+    first.register("kitten.created", record)
+    first.register("kitten.updated", crash)
+    for topic in ("breed.created", "kitten.deleted"):
+        first.register(topic, record)
+    with pytest.raises(asyncio.CancelledError):
+        await first.drain(client=client)
+    await client.dispose()
+
+    client = await sqlite()  # restarted
+    second = OutboxWorker(batch_size=2, backoff=0)
+    flaky = {"kitten.deleted"}
+
+    async def fail_once(topic: str, payload: dict) -> None:
+        if topic in flaky:
+            flaky.remove(topic)
+            raise RuntimeError("webhook timed out")
+        handled.append((topic, payload))
+
+    for topic in TOPICS:
+        second.register(topic, fail_once)
+    await second.start(client=client)
+    second.notify()
+    try:
+        for _ in range(100):
+            if second.handled == 6:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await second.stop()
+
+    # the crashed batch ran again, at least once is all the outbox promises
+    assert [topic for topic, _ in handled] == [
+        "breed.created", "kitten.created",
+        "breed.created", "kitten.created", "kitten.updated",
+        "kitten.created", "kitten.created", "kitten.deleted",
+    ]
+    assert handled[4][1]["age"] == 2 and handled[4][1]["version"] == 2
+    assert handled[5][1]["breed_id"] is not None
+    assert second.failed == 1
+    async with client.session as session:
+        assert (await session.scalars(select(OutboxEvent))).all() == []
+
+
+async def test_outbox_gives_up_after_max_attempts(sqlite, handled_topics):
+    client = await sqlite()
+    await _write(client)
+
+    async def fail(topic: str, payload: dict) -> None:
+        raise RuntimeError("search index is down")
+
+    worker = OutboxWorker(batch_size=10, backoff=0, max_attempts=2)
+    worker.register("kitten.deleted", fail)
+    assert await worker.drain(client=client) == 6
+    assert await worker.drain(client=client) == 1
+    assert await worker.drain(client=client) == 0
+    assert (worker.handled, worker.failed, worker.given_up) == (5, 2, 1)
+    async with client.session as session:
+        left = (await session.scalars(select(OutboxEvent))).one()
+    assert (left.topic, left.attempts) == ("kitten.deleted", 2)
+    assert left.last_error == "search index is down"
+
+
+async def test_outbox_skips_events_without_handlers(sqlite):
+    client = await sqlite()
+    await _write(client)  # nothing in the app handles these yet
+
+    async with client.session as session:
+        assert (await session.scalars(select(OutboxEvent))).all() == []
+
+
+async def test_outbox_worker_outlives_errors(sqlite, handled_topics):
+    client = await sqlite()
+    await _write(client)
+    worker = OutboxWorker(batch_size=10, backoff=0)
+    for topic in TOPICS:
+        worker.register(topic, _ignore)
+    drain, failures = worker.drain, ["bug"]
+
+    async def buggy_drain(client: PostgresClient) -> int:
+        if failures:
+            raise RuntimeError(failures.pop())  # not a database error
+        return await drain(client=client)
+
+    worker.drain = buggy_drain
+    await worker.start(client=client)
+    try:
+        for _ in range(100):
+            if worker.handled == 6:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await worker.stop()
+    assert failures == [] and worker.handled == 6
+
+
+async def test_outbox_worker_without_handlers_doesnt_poll(sqlite):
+    client = await sqlite()
+    worker = OutboxWorker()
+    await worker.start(client=client)
+    assert worker._task is None
+    await worker.stop()
@@ -0,0 +1,95 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from internal.metrics import track_statements
+from internal.run import app
+from internal.schemas import CreateBreedS, CreateKittenS, UpdateKittenS
+from internal.services import (
+    BreedService,
+    KittenService,
+    KittenStats,
+    kitten_stats,
+)
+
+
+async def test_kitten_stats_adjust_and_reconcile():
+    now = [0.0]
+    loads = []
+
+    async def loader():
+        loads.append(now[0])
+        return [
+            ("сфинкс", 1, "серый", 2),
+            (None, 1, "белый", 1),
+            ("сфинкс", 3, "белый", 4),
+        ]
+
+    stats = KittenStats(reconcile_interval=10, clock=lambda: now[0])
+    summary = await stats.summary(loader=loader, top_colors=1)
+    assert summary == {
+        "total": 7,
+        "breeds": [
+            {"breed": "", "count": 1}, {"breed": "сфинкс", "count": 6},
+        ],
+        "ages": [{"age": 1, "count": 3}, {"age": 3, "count": 4}],
+        "top_colors": [{"color": "белый", "count": 5}],
+    }
+
+    stats.add(breed=None, age=2, color="рыжий")
+    stats.remove(breed=None, age=1, color="белый")
+    now[0] = 5
+    summary = await stats.summary(loader=loader, top_colors=3)
+    assert loads == [0.0]  # not due yet
+    assert summary["breeds"][0] == {"breed": "", "count": 1}
+    assert {"age": 2, "count": 1} in summary["ages"]
+    assert {"color": "рыжий", "count": 1} in summary["top_colors"]
+
+    now[0] = 10  # the loader's counts win, the adjustments were drift
+    assert (await stats.summary(loader=loader, top_colors=3))["total"] == 7
+    assert loads == [0.0, 10]
+    assert stats.drift == 4  # 2 ages and 2 colors off by one
+
+    stats.invalidate()
+    await stats.summary(loader=loader, top_colors=3)
+    assert loads == [0.0, 10, 10]
+    assert stats.drift == 0
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_stats_follow_writes(
+        kitten_service: KittenService,
+        breed_service: BreedService,
+):
+    await breed_service.create(create_dto=CreateBreedS(breed_name="рэгдолл"))
+    kitten_stats.invalidate()
+    before = await kitten_service.get_stats(top_colors=100)
+
+    created = await kitten_service.create_kitten(create_dto=CreateKittenS(
+        color="сиреневый", age=30
+    ))
+    await kitten_service.create_kitten(create_dto=CreateKittenS(
+        color="сиреневый", age=31
+    ))
+    await kitten_service.update_kitten(
+        instance_id=created.instance_id,
+        update_dto=UpdateKittenS(age=32, breed="рэгдолл"),
+    )
+    with track_statements() as log:
+        adjusted = await kitten_service.get_stats(top_colors=100)
+    assert log.count == 0
+    assert adjusted.total == before.total + 2
+    assert {"age": 32, "count": 1} in adjusted.model_dump()["ages"]
+
+    kitten_stats.invalidate()
+    recounted = await kitten_service.get_stats(top_colors=100)
+    assert recounted.model_dump() == adjusted.model_dump()
+    assert kitten_stats.drift == 0
+
+    await kitten_service.delete_kitten(id=created.instance_id)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://t") as c:
+        response = await c.get("/kittens/stats", params={"top_colors": 1})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == before.total + 1
+    assert len(body["top_colors"]) == 1
@@ -0,0 +1,119 @@
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from internal.storage import UnitOfWork, get_db_client
+from internal.storage.app import PostgresClient
+
+
+async def test_pool_stats(tmp_path):
+    client = PostgresClient(
+        db_url=f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        echo=False,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    async with client.engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        stats = client.pool_stats()
+        assert stats["checked_out"] == 1
+        assert stats["saturation"] == 1.0
+
+        with pytest.raises(PoolTimeoutError):
+            async with client.engine.connect():
+                pass
+
+    stats = client.pool_stats()
+    assert stats["checked_out"] == 0
+    assert stats["checkouts"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["wait_seconds_max"] >= 0
+    await client.engine.dispose()
+
+    client = PostgresClient(
+        db_url=f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        echo=False,
+        pool_size=1,
+        max_overflow=-1,
+    )
+    async with client.engine.connect(), client.engine.connect():
+        assert client.pool_stats()["saturation"] == 0.0  # no limit
+    await client.engine.dispose()
+
+
+def test_app_pool_is_instrumented():
+    assert get_db_client().pool_stats()["size"] >= 1
+
+
+def test_importing_the_app_creates_no_engine():
+    code = (
+        "import internal.run\n"
+        "from internal.storage import get_db_client\n"
+        "assert get_db_client.cache_info().currsize == 0\n"
+    )
+    subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).parents[2],
+        check=True,
+        timeout=60,
+    )
+
+
+async def _who_am_i(client: PostgresClient) -> str:
+    async with client.read_session() as session:
+        return (await session.execute(text("SELECT name FROM who"))).scalar()
+
+
+async def test_read_replica_routing(tmp_path):
+    urls = {
+        name: f"sqlite+aiosqlite:///{tmp_path / name}.db"
+        for name in ("primary", "replica")
+    }
+    for name, url in urls.items():
+        seed = PostgresClient(db_url=url, echo=False)
+        async with seed.engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE who (name TEXT)"))
+            await conn.execute(text(f"INSERT INTO who VALUES ('{name}')"))
+        await seed.engine.dispose()
+
+    client = PostgresClient(
+        db_url=urls["primary"], echo=False, replica_urls=[urls["replica"]]
+    )
+    assert await _who_am_i(client) == "replica"
+
+    async def read_after_write() -> str:  # runs in its own request context
+        client.mark_written()
+        return await _who_am_i(client)
+
+    assert await asyncio.create_task(read_after_write()) == "primary"
+    assert await _who_am_i(client) == "replica"
+
+    uow = UnitOfWork(client=client, primary_reads=True)  # cache loads
+    session = await uow.read_session()
+    assert (await session.execute(text("SELECT name FROM who"))).scalar() \
+        == "primary"
+    await uow.close()
+    await client.dispose()
+
+
+async def test_read_replica_failover(tmp_path):
+    primary_url = f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}"
+    client = PostgresClient(
+        db_url=primary_url,
+        echo=False,
+        replica_urls=[f"sqlite+aiosqlite:///{tmp_path / 'gone' / 'x.db'}"],
+    )
+    async with client.engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE who (name TEXT)"))
+        await conn.execute(text("INSERT INTO who VALUES ('primary')"))
+
+    assert await _who_am_i(client) == "primary"
+    assert client._replicas[0].down_until > 0  # skipped for a while
+    assert await _who_am_i(client) == "primary"
+    await client.dispose()
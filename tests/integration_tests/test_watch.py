@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+
+from internal.changes import ChangeBus, PostgresRelay, change_bus
+from internal.run import app
+from internal.schemas import CreateKittenS, UpdateKittenS
+from internal.services import KittenService
+from internal.storage import get_db_client
+
+
+async def test_change_bus_replays_and_drops_laggards():
+    bus = ChangeBus(buffer_size=3, queue_size=2)
+    live = bus.subscribe()
+    bus.publish([("created", 1, 1, {"id": 1}), ("updated", 1, 2, None)])
+    assert [change.seq for change in bus.since(0)] == [1, 2]
+
+    bus.publish([("deleted", 1, 3, None)])  # a third is too many for live
+    assert live.closed == "lagged" and bus.subscribers == 0
+    assert [change.seq async for change in live] == [1, 2]
+
+    resumed = bus.subscribe(since=2)
+    assert (await resumed.__anext__()).type == "deleted"
+    bus.publish([("created", 2, 1, None)])  # 1 falls out of the buffer
+    assert bus.since(0) is None and bus.subscribe(since=0) is None
+    assert [change.seq for change in bus.since(1)] == [2, 3, 4]
+
+    assert await bus.wait(since=4, timeout=0.01, limit=10) == []
+    waiting = asyncio.create_task(bus.wait(since=4, timeout=5, limit=10))
+    await asyncio.sleep(0)
+    bus.publish([("deleted", 2, 2, None)])
+    assert [change.id for change in await waiting] == [2]
+
+    bus.reset(horizon=10)
+    assert resumed.closed == "reset"
+    assert bus.last_seq == 10 and bus.since(9) is None
+    bus.publish([("created", 3, 1, None)])
+    assert bus.since(10)[0].seq == 11
+
+    restarted = ChangeBus(buffer_size=3, queue_size=2)  # seqs start over
+    assert restarted.since(11) is None and restarted.subscribe(11) is None
+    assert await restarted.wait(since=11, timeout=5, limit=10) is None
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_writes_reach_the_feed(kitten_service: KittenService):
+    start = change_bus.last_seq
+    events = kitten_service.watch_changes(since=start, keep_alive=5)
+
+    created = await kitten_service.create_kitten(create_dto=CreateKittenS(
+        color="палевый", age=4, description="ленивый"
+    ))
+    id = created.instance_id
+    await kitten_service.update_kitten(
+        instance_id=id, update_dto=UpdateKittenS(age=5)
+    )
+    await kitten_service.delete_kitten(id=id)
+
+    first = await events.__anext__()
+    assert first.startswith(b"id: %d\nevent: created\ndata: " % (start + 1))
+    assert b'"description":"' in first
+    assert b"event: updated" in await events.__anext__()
+    deleted = await events.__anext__()
+    assert b"event: deleted" in deleted and b'"version":3' in deleted
+    await events.aclose()
+    assert change_bus.subscribers == 0
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://t") as c:
+        response = await c.get("/kittens/changes")
+        assert response.json() == {"changes": [], "last_seq": start + 3}
+        response = await c.get(
+            "/kittens/changes", params={"since": start, "limit": 2}
+        )
+        body = response.json()
+        assert [c["type"] for c in body["changes"]] == ["created", "updated"]
+        # what consumers order one kitten's changes by, seqs may not be
+        assert [c["version"] for c in body["changes"]] == [1, 2]
+        assert body["changes"][1]["kitten"]["age"] == 5
+        assert body["last_seq"] == start + 2
+        response = await c.get(
+            "/kittens/changes", params={"since": start + 3, "wait": 0}
+        )
+        assert response.json() == {"changes": [], "last_seq": start + 3}
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_workers_share_changes_in_seq_order():
+    url = get_db_client().engine.url
+    buses = [ChangeBus(buffer_size=100, queue_size=100) for _ in range(2)]
+    relays = [
+        PostgresRelay(bus=bus, url=url, channel="kitten_changes_test")
+        for bus in buses
+    ]
+    for relay in relays:
+        await relay.start()
+    try:
+        subscriptions = [bus.subscribe() for bus in buses]
+        buses[0].publish([("created", 1, 1, {"id": 1, "description": "x"})])
+        buses[1].publish([("deleted", 2, 5, None)])
+        buses[0].publish([("updated", 1, 2, {"description": "я" * 4000})])
+
+        for subscription in subscriptions:
+            changes = [
+                await asyncio.wait_for(subscription.__anext__(), 5)
+                for _ in range(3)
+            ]
+            assert sorted(c.id for c in changes) == [1, 1, 2]
+            assert [c.seq for c in changes] == sorted(c.seq for c in changes)
+            too_big = next(c for c in changes if c.type == "updated")
+            assert too_big.kitten is None  # over the NOTIFY payload limit
+            assert {(c.id, c.version) for c in changes} == {
+                (1, 1), (1, 2), (2, 5)
+            }
+        assert [c.seq for c in buses[0].since(buses[0].last_seq - 3)] == [
+            c.seq for c in buses[1].since(buses[1].last_seq - 3)
+        ]
+    finally:
+        for relay in relays:
+            await relay.stop()
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_relay_stops_on_errors_reconnecting_wont_fix():
+    engine = get_db_client().engine
+    bus = ChangeBus(buffer_size=100, queue_size=100)
+    relay = PostgresRelay(
+        bus=bus, url=engine.url, channel="kitten_changes_test",
+        retry_after=0.01,
+    )
+    await relay.start()
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "ALTER SEQUENCE kitten_changes_seq RENAME TO gone_seq"
+        ))
+    try:
+        last_seq = bus.last_seq
+        bus.publish([("created", 1, 1, None)])
+        for _ in range(500):
+            if bus.relay is None:
+                break
+            await asyncio.sleep(0.01)
+        assert bus.relay is None and relay.dropped == 1
+
+        assert bus.since(last_seq) is None  # its change is lost, resync
+        bus.publish([("deleted", 1, 2, None)])  # numbered by the bus again
+        assert [c.type for c in bus.since(bus.last_seq - 1)] == ["deleted"]
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "ALTER SEQUENCE gone_seq RENAME TO kitten_changes_seq"
+            ))
+        await relay.stop()